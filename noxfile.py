@@ -3,6 +3,7 @@ import nox
 
 PYTHON_FILES = [
     "pypapi",
+    "tests",
     "setup.py",
     "noxfile.py",
     "docs/conf.py",
@@ -16,6 +17,13 @@ def lint(session):
     session.run("black", "--check", "--diff", "--color", *PYTHON_FILES)
 
 
+@nox.session(reuse_venv=True)
+def test(session):
+    session.install("pytest")
+    session.install("-e", ".")
+    session.run("pytest", "tests")
+
+
 @nox.session(reuse_venv=True)
 def black_fix(session):
     session.install("black")
@@ -25,5 +33,5 @@ def black_fix(session):
 @nox.session(reuse_venv=True)
 def gendoc(session):
     session.install("sphinx", "sphinx-rtd-theme")
-    session.install("-e", ".")
+    session.install("-e", ".[numpy]")
     session.run("sphinx-build", "-M", "html", "docs", "build")
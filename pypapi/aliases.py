@@ -0,0 +1,246 @@
+"""
+Portable metric aliases mapped to native events per CPU model.
+
+The ``PAPI_*`` presets only cover some metrics, and the native event names
+differ across CPU vendors and generations. The alias database
+(``metric_aliases.json``, shipped with PyPAPI) maps abstract metrics (e.g.
+``"llc_misses"``, ``"mem_load_stall_cycles"`` or ``"dram_bytes"``) to the
+events to count and a scale factor: the value of a metric is the sum of the
+counts of its events, multiplied by the scale (e.g. 64 bytes per DRAM
+access).
+
+The aliases of a CPU are selected with the vendor string, the CPUID family
+and the CPUID model of :py:func:`~pypapi.papi_low.get_hardware_info` (through
+:py:func:`~pypapi.capabilities.get_capabilities`). Entries of the database
+apply to all CPUs (no ``vendor``), to a vendor, to a family of a vendor, or to
+some models of a family; more specific entries override the less specific
+ones. The database is indexed when it is loaded, and the aliases of the
+machine are resolved once, so looking a metric up is a dict lookup.
+
+The events of different metrics may belong to different PAPI components
+(e.g. ``dram_bytes`` uses uncore memory controller events, while
+``llc_misses`` uses core events), and the events of an event set must all
+belong to the same component. :py:func:`alias_event_groups` groups the events
+by component, with one event set per group (PAPI runs one event set per
+component at a time).
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.aliases import alias_event_groups, compute_alias, get_alias
+
+    papi.library_init()
+
+    metrics = ["instructions", "llc_misses"]
+    eventSets = []
+    for events in alias_event_groups(metrics).values():
+        eventSet = papi.create_eventset()
+        for event in events:
+            papi.add_named_event(eventSet, event)
+        eventSets.append((eventSet, events))
+
+    for eventSet, _ in eventSets:
+        papi.start(eventSet)
+    run()
+    values = {}
+    for eventSet, events in eventSets:
+        values.update(zip(events, papi.stop(eventSet)))
+
+    for metric in metrics:
+        print(metric, compute_alias(get_alias(metric), values))
+
+.. NOTE::
+
+    Uncore events (such as the ones of ``dram_bytes``) count for a whole
+    socket: depending on the component, their event set must also be bound to
+    a CPU and may require privileges (see the PAPI documentation).
+"""
+
+import json
+import os
+from collections import namedtuple
+
+from . import papi_low as papi
+from .capabilities import get_capabilities
+
+
+#: An alias of a metric: the metric name, the names of the events to count,
+#: the factor applied to the sum of their counts, and the description of the
+#: metric.
+MetricAlias = namedtuple("MetricAlias", "metric events scale description")
+
+#: The path of the alias database shipped with PyPAPI
+DEFAULT_DATABASE = os.path.join(os.path.dirname(__file__), "metric_aliases.json")
+
+
+class AliasDatabase:
+    """Metric aliases indexed by CPU.
+
+    :param dict data: The database (see ``metric_aliases.json``): the
+        description of each metric (``metrics``) and the entries (``cpus``),
+        with an optional ``vendor``, ``family`` and list of ``models``, and
+        the ``aliases`` of the matching CPUs (the ``events`` and optional
+        ``scale`` of each metric).
+
+    :raises ValueError: An entry uses an unknown metric, has a family but no
+        vendor, or has models but no family.
+    """
+
+    def __init__(self, data):
+        #: The description of the metrics, indexed by metric name
+        self.metrics = dict(data["metrics"])
+        self._index = {}
+        self._resolved = {}
+        for entry in data["cpus"]:
+            vendor = entry.get("vendor")
+            family = entry.get("family")
+            models = entry.get("models") or [None]
+            if family is not None and vendor is None:
+                raise ValueError("%s: family without a vendor" % entry["name"])
+            if models != [None] and family is None:
+                raise ValueError("%s: models without a family" % entry["name"])
+            aliases = {}
+            for metric, alias in entry["aliases"].items():
+                if metric not in self.metrics:
+                    raise ValueError("%s: unknown metric %s" % (entry["name"], metric))
+                aliases[metric] = MetricAlias(
+                    metric,
+                    tuple(alias["events"]),
+                    alias.get("scale", 1),
+                    self.metrics[metric],
+                )
+            for model in models:
+                self._index.setdefault((vendor, family, model), {}).update(aliases)
+
+    @classmethod
+    def load(cls, path=DEFAULT_DATABASE):
+        """Loads a database from a JSON file.
+
+        :param str path: The path of the file.
+
+        :rtype: AliasDatabase
+        """
+        with open(path, "r") as file_:
+            return cls(json.load(file_))
+
+    def resolve(self, vendor, family, model):
+        """Returns the aliases of a CPU.
+
+        :param str vendor: The vendor string (e.g. ``"GenuineIntel"``).
+        :param int family: The CPUID family.
+        :param int model: The CPUID model.
+
+        :returns: the aliases, indexed by metric name.
+        :rtype: dict(str, MetricAlias)
+        """
+        key = (vendor, family, model)
+        if key not in self._resolved:
+            aliases = {}
+            for entryKey in [
+                (None, None, None),
+                (vendor, None, None),
+                (vendor, family, None),
+                (vendor, family, model),
+            ]:
+                aliases.update(self._index.get(entryKey, {}))
+            self._resolved[key] = aliases
+        return self._resolved[key]
+
+
+_database = None
+_aliases = None
+
+
+def get_aliases(refresh=False):
+    """Returns the aliases of the CPU of the machine, resolved from the
+    default database on the first call.
+
+    :py:func:`~pypapi.papi_low.library_init` must be called first.
+
+    :param bool refresh: Load the database and resolve the aliases again.
+
+    :returns: the aliases, indexed by metric name.
+    :rtype: dict(str, MetricAlias)
+    """
+    global _database, _aliases
+    if _aliases is None or refresh:
+        if _database is None or refresh:
+            _database = AliasDatabase.load()
+        topology = get_capabilities(refresh).topology
+        _aliases = _database.resolve(
+            topology.vendor_string, topology.cpuid_family, topology.cpuid_model
+        )
+    return _aliases
+
+
+def get_alias(metric):
+    """Returns the alias of a metric on the CPU of the machine.
+
+    :param str metric: The name of the metric (e.g. ``"llc_misses"``).
+
+    :rtype: MetricAlias
+
+    :raises KeyError: The metric has no alias on this CPU.
+    """
+    return get_aliases()[metric]
+
+
+def alias_events(metrics):
+    """Returns the events to count to compute some metrics, without
+    duplicates.
+
+    The events may belong to different components, and then cannot be added
+    to the same event set (see :py:func:`alias_event_groups`).
+
+    :param list(str) metrics: The names of the metrics.
+
+    :rtype: list(str)
+
+    :raises KeyError: A metric has no alias on this CPU.
+    """
+    events = []
+    for metric in metrics:
+        for event in get_alias(metric).events:
+            if event not in events:
+                events.append(event)
+    return events
+
+
+def alias_event_groups(metrics):
+    """Returns the events to count to compute some metrics, grouped by PAPI
+    component: the events of a group can be added to the same event set.
+
+    :py:func:`~pypapi.papi_low.library_init` must be called first.
+
+    :param list(str) metrics: The names of the metrics.
+
+    :returns: the events (without duplicates), indexed by component index.
+    :rtype: dict(int, list(str))
+
+    :raises KeyError: A metric has no alias on this CPU.
+    :raises PapiNoEventError: An event does not exist on this machine.
+    """
+    groups = {}
+    for event in alias_events(metrics):
+        component = papi.get_event_component(papi.event_name_to_code(event))
+        groups.setdefault(component, []).append(event)
+    return groups
+
+
+def compute_alias(alias, values):
+    """Computes the value of a metric from event counts.
+
+    :param MetricAlias alias: The alias of the metric.
+    :param dict values: Event counts, indexed by event name.
+
+    :returns: the value of the metric, or ``None`` if one of its events is
+        missing.
+    :rtype: float
+    """
+    total = 0
+    for event in alias.events:
+        value = values.get(event)
+        if value is None:
+            return None
+        total += value
+    return total * alias.scale
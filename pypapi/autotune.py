@@ -0,0 +1,243 @@
+"""
+Counter-guided autotuning of parameterized kernels.
+
+:py:func:`autotune` searches the best parameters (block sizes, chunk sizes,
+number of threads...) of a kernel for an objective expressed with hardware
+counters (e.g. minimize the cycles, or the L2 cache misses per element), which
+converge in far fewer trials than wall time on shared hosts.
+
+The search uses successive halving: all the configurations are measured with
+a few samples, the best ``1 / eta`` are kept and measured again with ``eta``
+times more samples, and so on until one configuration is left. Within a round,
+a configuration is dropped after a single probe sample if it is already much
+worse than the best configuration of the round (early stopping). Samples are
+taken with :py:func:`pypapi.benchmark.measure`.
+
+The best configuration of a named search is stored per machine (see
+:py:func:`~pypapi.capabilities.machine_cache_path`): later searches measure it
+first (so that the early stopping is effective from the start), and
+:py:func:`get_tuned` returns it without searching.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.autotune import autotune, get_tuned, minimize
+
+    papi.library_init()
+
+    def kernel(block):
+        blocked_sum(data, block)
+
+    result = autotune(
+        kernel,
+        {"block": [256, 512, 1024, 2048, 4096]},
+        objective=minimize("PAPI_L2_TCM", per=len(data)),
+        name="blocked_sum",
+    )
+    print(result.params, result.score)
+
+    # Later runs (on the same machine type)
+    params = get_tuned("blocked_sum", default={"block": 1024})
+"""
+
+import itertools
+import json
+import math
+import os
+from collections import namedtuple
+
+from .benchmark import measure
+from .capabilities import machine_cache_path
+
+
+#: An objective: the events to count, and a callable that computes the score
+#: to minimize from the per-call counts (a dict indexed by the events as they
+#: are given, and by event name) and the parameters of the configuration (a
+#: dict).
+Objective = namedtuple("Objective", "events score")
+
+#: A measured configuration: its parameters, the round, the number of samples,
+#: the score, and whether it was dropped after its probe sample.
+Trial = namedtuple("Trial", "params round repeat score pruned")
+
+#: Result of :py:func:`autotune`: the best parameters, their score, and all
+#: the trials.
+TuningResult = namedtuple("TuningResult", "params score trials")
+
+
+def minimize(event, per=None):
+    """Returns an objective that minimizes the per-call count of an event.
+
+    :param event: The event (name or code).
+    :param per: Divide the count by a number (e.g. a number of elements), by
+        the value of a parameter (its name), or by the result of a callable
+        taking the parameters.
+
+    :rtype: Objective
+    """
+
+    def score(counts, params):
+        if per is None:
+            divisor = 1
+        elif isinstance(per, str):
+            divisor = params[per]
+        elif callable(per):
+            divisor = per(params)
+        else:
+            divisor = per
+        return counts[event] / divisor if divisor else float("inf")
+
+    return Objective((event,), score)
+
+
+def _objective(objective):
+    if isinstance(objective, str):
+        return minimize(objective)
+    return objective
+
+
+def _configurations(space):
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*space.values())]
+
+
+def _normalize(params):
+    # The parameters as they are read back from the JSON cache (tuples become
+    # lists), to compare them with the stored ones
+    return json.loads(json.dumps(params))
+
+
+def _load(path):
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, "r") as file_:
+            return json.load(file_)
+    except ValueError:
+        return {}  # Corrupted file: start again
+
+
+def get_tuned(name, default=None):
+    """Returns the best parameters found by a previous :py:func:`autotune`
+    search on this machine type.
+
+    :py:func:`~pypapi.papi_low.library_init` must be called first.
+
+    :param str name: The name of the search.
+    :param dict default: The parameters to return if the search was never
+        run.
+
+    :rtype: dict
+    """
+    entry = _load(machine_cache_path("autotune")).get(name)
+    return entry["params"] if entry else default
+
+
+def _store(name, params, score):
+    path = machine_cache_path("autotune")
+    results = _load(path)
+    results[name] = {"params": params, "score": score}
+    with open(path, "w") as file_:
+        json.dump(results, file_, indent=2)
+
+
+def autotune(
+    fn,
+    space,
+    objective="PAPI_TOT_CYC",
+    name=None,
+    min_repeat=3,
+    eta=3,
+    early_stop=2.0,
+    events=None,
+):
+    """Searches the parameters of a kernel that minimize an objective.
+
+    :param callable fn: The kernel, called with the parameters of a
+        configuration as keyword arguments.
+    :param dict space: The values of each parameter (the configurations are
+        all their combinations).
+    :param objective: The objective: an event name (minimize its per-call
+        count) or an :py:class:`Objective` (see :py:func:`minimize`).
+    :param str name: The name of the search: the best parameters are stored
+        per machine under this name, and measured first by later searches.
+    :param int min_repeat: The number of samples per configuration of the
+        first round.
+    :param int eta: The reduction factor between rounds: ``1 / eta`` of the
+        configurations are kept, and measured with ``eta`` times more samples.
+    :param float early_stop: Drop a configuration after its probe sample if
+        its score is this many times worse than the best score of the round
+        (``None`` to disable).
+    :param list events: Additional events to count (they are available to the
+        score callable of the objective).
+
+    :rtype: TuningResult
+
+    :raises ValueError: The parameter space is empty, ``min_repeat`` is lower
+        than 1, ``eta`` is lower than 2, or ``name`` is given and parameters
+        cannot be stored in JSON.
+    """
+    if min_repeat < 1:
+        raise ValueError("min_repeat must be at least 1")
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+    objective = _objective(objective)
+    configurations = _configurations(space)
+    if not configurations:
+        raise ValueError("empty parameter space")
+    events = list(objective.events) + [
+        event for event in events or () if event not in objective.events
+    ]
+
+    if name is not None:
+        # The best parameters are stored in JSON at the end of the search
+        for params in configurations:
+            try:
+                json.dumps(params)
+            except (TypeError, ValueError):
+                raise ValueError(
+                    "the parameters %r cannot be stored in JSON: use values"
+                    " such as numbers, strings, lists or dicts (or name=None)" % params
+                )
+        known = get_tuned(name)
+        for params in configurations:
+            if _normalize(params) == known:
+                configurations.remove(params)
+                configurations.insert(0, params)
+                break
+
+    def evaluate(params, repeat):
+        result = measure(
+            lambda: fn(**params), events, repeat=repeat, warmup=1 if repeat > 1 else 0
+        )
+        counts = dict(zip(result.names, result.mean))
+        # Also indexed as given (event codes, other names of the events...)
+        counts.update(zip(events, result.mean))
+        return objective.score(counts, params)
+
+    trials = []
+    repeat = min_repeat
+    for round_ in itertools.count():
+        scored = []
+        best = float("inf")
+        for params in configurations:
+            if early_stop is not None and best < float("inf"):
+                score = evaluate(params, 1)
+                if score > early_stop * best:
+                    trials.append(Trial(params, round_, 1, score, True))
+                    continue
+            score = evaluate(params, repeat)
+            trials.append(Trial(params, round_, repeat, score, False))
+            scored.append((score, params))
+            best = min(best, score)
+        scored.sort(key=lambda item: item[0])
+        keep = int(math.ceil(len(scored) / eta))
+        if keep <= 1:
+            break
+        configurations = [params for _, params in scored[:keep]]
+        repeat *= eta
+
+    score, params = scored[0]
+    if name is not None:
+        _store(name, params, score)
+    return TuningResult(params, score, trials)
@@ -0,0 +1,279 @@
+"""
+Microbenchmark harness based on hardware counters.
+
+:py:func:`measure` provides a consistent methodology to measure small
+callables:
+
+1. the number of inner iterations is scaled automatically so that the
+   measurement overhead (see :py:mod:`pypapi.calibration`) is negligible,
+2. warm-up samples are discarded,
+3. the beginning of the steady state is detected and earlier samples are
+   discarded,
+4. outliers are rejected,
+5. per-iteration estimates are returned with their confidence intervals.
+
+Counters are read from a long-lived, always-running event set (one per thread
+and event list) with :py:meth:`~pypapi.reader.EventSetReader.read_into`, so
+taking a sample does not cost a full start/stop of the event set.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.benchmark import measure
+
+    papi.library_init()
+
+    result = measure(lambda: sorted(data), events=["PAPI_TOT_INS", "PAPI_TOT_CYC"])
+
+    for name, mean, low, high in zip(
+        result.names, result.mean, result.ci_low, result.ci_high
+    ):
+        print("%s: %.1f per call [%.1f, %.1f]" % (name, mean, low, high))
+"""
+
+import math
+import statistics
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from . import papi_low as papi
+from .calibration import get_overhead
+from .consts import PAPI_RUNNING
+from .exceptions import PapiIsRunningError
+from .reader import EventSetReader
+
+
+#: Result of :py:func:`measure`. ``mean``, ``ci_low`` and ``ci_high`` are
+#: ``array("d")`` with one per-iteration value per event; ``samples`` is a list
+#: of ``array("d")`` (one per event) holding the retained per-iteration
+#: samples; ``rejected`` is the number of outliers and ``steady`` tells whether
+#: a steady state was detected (samples before it are discarded).
+Measurement = namedtuple(
+    "Measurement",
+    "names inner_loops mean ci_low ci_high samples rejected steady",
+)
+
+DEFAULT_EVENTS = ("PAPI_TOT_INS", "PAPI_TOT_CYC")
+
+#: Inner iterations stop being scaled up once a sample lasts this long (in
+#: seconds), whatever the measurement overhead ratio
+MAX_SAMPLE_TIME = 0.1
+
+_local = threading.local()
+
+
+def _event_code(event):
+    if isinstance(event, str):
+        return papi.event_name_to_code(event)
+    return event
+
+
+def get_eventset(events=DEFAULT_EVENTS):
+    """Returns a running event set counting the given events.
+
+    Event sets are created once per thread and event list, then kept running.
+    As only one event set can run at a time in a thread, the event set
+    previously returned by this function for another event list is stopped
+    (and restarted by the next call that asks for it).
+
+    :param list events: event names or codes.
+
+    :returns: the event set handle and its reader.
+    :rtype: (int, EventSetReader)
+
+    :raises PapiIsRunningError: Another event set, not created by this
+        function, is running in the current thread.
+    """
+    codes = tuple(_event_code(event) for event in events)
+    if not hasattr(_local, "eventsets"):
+        _local.eventsets = {}
+        _local.running = None
+    if codes not in _local.eventsets:
+        eventSet = papi.create_eventset()
+        papi.add_events(eventSet, list(codes))
+        _local.eventsets[codes] = (eventSet, EventSetReader(eventSet))
+    if _local.running is not None:
+        # The event set may have been stopped by someone else
+        running = _local.eventsets[_local.running][0]
+        if not papi.state(running) & PAPI_RUNNING:
+            _local.running = None
+        elif _local.running != codes:
+            papi.stop(running)
+            _local.running = None
+    if _local.running is None:
+        try:
+            papi.start(_local.eventsets[codes][0])
+        except PapiIsRunningError:
+            raise PapiIsRunningError(
+                message="Another event set is running in this thread; stop it"
+                " before using get_eventset()"
+            )
+        _local.running = codes
+    return _local.eventsets[codes]
+
+
+def release_eventsets():
+    """Stops and destroys the event sets created by :py:func:`get_eventset`
+    in the current thread."""
+    eventsets = getattr(_local, "eventsets", {})
+    if getattr(_local, "running", None) is not None:
+        eventSet = eventsets[_local.running][0]
+        if papi.state(eventSet) & PAPI_RUNNING:
+            papi.stop(eventSet)
+    for eventSet, _ in eventsets.values():
+        papi.cleanup_eventset(eventSet)
+        papi.destroy_eventset(eventSet)
+    _local.eventsets = {}
+    _local.running = None
+
+
+def _t_quantile(confidence, df):
+    # Student's t quantile, using the Cornish-Fisher expansion of the normal
+    # quantile (accurate to a few 1e-3 for df >= 3)
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    if df < 1:
+        return float("inf")
+    return (
+        z
+        + (z**3 + z) / (4 * df)
+        + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+        + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3)
+    )
+
+
+def _steady_state_start(values, window, tolerance):
+    # Index of the first window whose coefficient of variation is under the
+    # tolerance, or None if the samples never settle
+    for start in range(len(values) - window + 1):
+        chunk = values[start : start + window]
+        mean = statistics.mean(chunk)
+        if not mean or statistics.pstdev(chunk) / abs(mean) <= tolerance:
+            return start
+    return None
+
+
+def _reject_outliers(values, threshold):
+    # Modified z-score based on the median absolute deviation
+    median = statistics.median(values)
+    deviations = [abs(value - median) for value in values]
+    mad = statistics.median(deviations)
+    if mad:
+        return [0.6745 * deviation / mad <= threshold for deviation in deviations]
+    # More than half of the samples are equal: the score is based on the mean
+    # absolute deviation instead (Iglewicz and Hoaglin)
+    mean_deviation = statistics.mean(deviations)
+    if not mean_deviation:
+        return [True] * len(values)
+    return [
+        deviation / (1.253314 * mean_deviation) <= threshold for deviation in deviations
+    ]
+
+
+def measure(
+    fn,
+    events=DEFAULT_EVENTS,
+    repeat=30,
+    inner_loops=None,
+    warmup=5,
+    confidence=0.95,
+    max_overhead=0.01,
+    steady_window=5,
+    steady_tolerance=0.05,
+    outlier_threshold=3.5,
+):
+    """Measures the per-call event counts of a callable.
+
+    :param callable fn: the function to measure (called without arguments).
+    :param list events: event names or codes (the first one is used to scale
+        the inner iterations, detect the steady state and reject outliers).
+    :param int repeat: number of measured samples (before steady state
+        detection and outlier rejection).
+    :param int inner_loops: number of calls of ``fn`` per sample (default:
+        scaled automatically).
+    :param int warmup: number of discarded samples measured first.
+    :param float confidence: confidence level of the intervals.
+    :param float max_overhead: when scaling the inner iterations, maximum
+        ratio between the measurement overhead and a sample.
+    :param int steady_window: number of samples of the steady state detection
+        window.
+    :param float steady_tolerance: maximum coefficient of variation of a
+        window in the steady state.
+    :param float outlier_threshold: samples whose modified z-score (based on
+        the median absolute deviation) is above this value are rejected.
+
+    :rtype: Measurement
+
+    :raises ValueError: ``repeat`` is lower than 1.
+    """
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+    eventSet, reader = get_eventset(events)
+    overhead = get_overhead(eventSet, "reader").median
+    count = reader.count
+    read_into = reader.read_into
+    before = reader.new_values()
+    after = reader.new_values()
+
+    def sample(loops):
+        iterations = range(loops)
+        read_into(before)
+        for _ in iterations:
+            fn()
+        read_into(after)
+        return [after[i] - before[i] - overhead[i] for i in range(count)]
+
+    if inner_loops is None:
+        inner_loops = 1
+        while True:
+            start_time = time.perf_counter()
+            values = sample(inner_loops)
+            if (
+                overhead[0] <= max_overhead * values[0]
+                or time.perf_counter() - start_time >= MAX_SAMPLE_TIME
+            ):
+                break
+            inner_loops *= 2
+
+    for _ in range(warmup):
+        sample(inner_loops)
+    raw = [sample(inner_loops) for _ in range(repeat)]
+    per_iteration = [[value / inner_loops for value in values] for values in raw]
+
+    primary = [values[0] for values in per_iteration]
+    start = _steady_state_start(primary, min(steady_window, repeat), steady_tolerance)
+    steady = start is not None
+    if steady:
+        per_iteration = per_iteration[start:]
+        primary = primary[start:]
+    kept = _reject_outliers(primary, outlier_threshold)
+    retained = [values for values, keep in zip(per_iteration, kept) if keep]
+
+    samples = [array("d", [values[i] for values in retained]) for i in range(count)]
+    mean = array("d")
+    ci_low = array("d")
+    ci_high = array("d")
+    t = _t_quantile(confidence, len(retained) - 1)
+    for event_samples in samples:
+        event_mean = statistics.mean(event_samples)
+        if len(event_samples) > 1:
+            half_width = (
+                t * statistics.stdev(event_samples) / math.sqrt(len(event_samples))
+            )
+        else:
+            half_width = float("inf")
+        mean.append(event_mean)
+        ci_low.append(event_mean - half_width)
+        ci_high.append(event_mean + half_width)
+
+    return Measurement(
+        reader.names,
+        inner_loops,
+        mean,
+        ci_low,
+        ci_high,
+        samples,
+        repeat - len(retained) - (start or 0),
+        steady,
+    )
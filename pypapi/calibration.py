@@ -0,0 +1,200 @@
+"""
+Measurement overhead calibration.
+
+Every measured region also counts some of the instructions and cycles spent in
+the binding itself (cffi calls, error checking, list building...). For small
+kernels (a few thousand instructions), this overhead is of the same order of
+magnitude as the signal. This module measures empty regions to obtain the
+distribution of the overhead of each event for a given event set configuration
+and API path, so that it can be subtracted from real measurements.
+
+The supported API paths are:
+
+* ``"reader"``: two :py:meth:`~pypapi.reader.EventSetReader.read_into` calls
+  on a running event set (the cheapest path),
+* ``"read"``: two :py:func:`~pypapi.papi_low.read` calls on a running event
+  set,
+* ``"start_stop"``: :py:func:`~pypapi.papi_low.start` followed by
+  :py:func:`~pypapi.papi_low.stop` on a stopped event set.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi import events
+    from pypapi.calibration import calibrate
+
+    papi.library_init()
+
+    evs = papi.create_eventset()
+    papi.add_events(evs, [events.PAPI_TOT_INS, events.PAPI_TOT_CYC])
+
+    overhead = calibrate(evs, path="start_stop")
+
+    papi.start(evs)
+    kernel()
+    values = papi.stop(evs)
+
+    for name, (value, error) in zip(overhead.names, overhead.correct(values)):
+        print("%s: %.0f +- %.0f" % (name, value, error))
+"""
+
+import statistics
+from array import array
+from collections import namedtuple
+
+from . import papi_low as papi
+from .reader import EventSetReader
+
+
+#: A measured value with the overhead subtracted, and its error (the standard
+#: deviation of the overhead).
+Estimate = namedtuple("Estimate", "value error")
+
+#: The supported API paths
+PATHS = ("reader", "read", "start_stop")
+
+_cache = {}
+
+
+class Overhead:
+    """Distribution of the measurement overhead of each event of an event set.
+
+    :param list(str) names: The names of the events.
+    :param str path: The API path that was calibrated.
+    :param list samples: One list of measured overheads per event.
+
+    The statistics (:py:attr:`min`, :py:attr:`median`, :py:attr:`mean` and
+    :py:attr:`stdev`) are computed when the overhead is created.
+    """
+
+    def __init__(self, names, path, samples):
+        #: The names of the events
+        self.names = list(names)
+        #: The calibrated API path
+        self.path = path
+        #: The measured overheads (one ``array("q")`` per event)
+        self.samples = [array("q", event_samples) for event_samples in samples]
+        # The statistics are computed once, as correct() is called on the
+        # measurement path
+        #: Minimum overhead of each event
+        self.min = [min(samples) for samples in self.samples]
+        #: Median overhead of each event (the value that is subtracted)
+        self.median = [statistics.median(samples) for samples in self.samples]
+        #: Mean overhead of each event
+        self.mean = [statistics.mean(samples) for samples in self.samples]
+        #: Standard deviation of the overhead of each event
+        self.stdev = [
+            statistics.stdev(samples) if len(samples) > 1 else 0.0
+            for samples in self.samples
+        ]
+
+    def __repr__(self):
+        return "Overhead(path=%r, %s)" % (
+            self.path,
+            ", ".join(
+                "%s=%g+-%g" % (name, median, stdev)
+                for name, median, stdev in zip(self.names, self.median, self.stdev)
+            ),
+        )
+
+    def subtract(self, values):
+        """Subtracts the median overhead from measured values.
+
+        :param list(int) values: values measured through the calibrated API
+            path.
+
+        :rtype: list(float)
+        """
+        return [value - median for value, median in zip(values, self.median)]
+
+    def correct(self, values):
+        """Subtracts the median overhead from measured values and attaches an
+        error bar to them.
+
+        :param list(int) values: values measured through the calibrated API
+            path.
+
+        :rtype: list(Estimate)
+        """
+        return [
+            Estimate(value - median, stdev)
+            for value, median, stdev in zip(values, self.median, self.stdev)
+        ]
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation of the overhead."""
+        return {
+            "names": self.names,
+            "path": self.path,
+            "samples": [list(samples) for samples in self.samples],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds an overhead from the output of :py:meth:`to_dict`."""
+        return cls(data["names"], data["path"], data["samples"])
+
+
+def calibrate(eventSet, path="reader", samples=1000, warmup=10):
+    """Measures the overhead of empty regions.
+
+    :param int eventSet: An integer handle for a PAPI Event Set as created by
+        :py:func:`~pypapi.papi_low.create_eventset`. It must be running for the
+        ``"reader"`` and ``"read"`` paths, and stopped for the ``"start_stop"``
+        path.
+    :param str path: The API path to calibrate (one of :py:data:`PATHS`).
+    :param int samples: Number of measured empty regions.
+    :param int warmup: Number of discarded empty regions measured first.
+
+    :rtype: Overhead
+
+    :raises ValueError: The API path is unknown.
+    """
+    if path not in PATHS:
+        raise ValueError("unknown API path %r (expected one of %s)" % (path, PATHS))
+
+    reader = EventSetReader(eventSet)
+    count = reader.count
+    distribution = [array("q") for _ in range(count)]
+
+    if path == "reader":
+        read_into = reader.read_into
+        before = reader.new_values()
+        after = reader.new_values()
+        for i in range(warmup + samples):
+            read_into(before)
+            read_into(after)
+            if i >= warmup:
+                for j in range(count):
+                    distribution[j].append(after[j] - before[j])
+    elif path == "read":
+        read = papi.read
+        for i in range(warmup + samples):
+            before = read(eventSet)
+            after = read(eventSet)
+            if i >= warmup:
+                for j in range(count):
+                    distribution[j].append(after[j] - before[j])
+    else:
+        start = papi.start
+        stop = papi.stop
+        for i in range(warmup + samples):
+            start(eventSet)
+            values = stop(eventSet)
+            if i >= warmup:
+                for j in range(count):
+                    distribution[j].append(values[j])
+
+    return Overhead(reader.names, path, distribution)
+
+
+def get_overhead(eventSet, path="reader", samples=1000):
+    """Same as :py:func:`calibrate`, but the result is cached per event list
+    and API path, so that calibration only happens once per configuration.
+
+    :rtype: Overhead
+    """
+    key = (tuple(papi.list_events(eventSet)), path)
+    if key not in _cache:
+        _cache[key] = calibrate(eventSet, path, samples)
+    return _cache[key]
@@ -0,0 +1,333 @@
+"""
+Cached capability snapshot of the machine and of the PAPI components.
+
+The answers of :py:func:`~pypapi.papi_low.get_component_info`,
+:py:func:`~pypapi.papi_low.num_cmp_hwctrs`,
+:py:func:`~pypapi.papi_low.get_hardware_info`... never change during the
+lifetime of the process, but these functions build new Python objects on each
+call. :py:func:`get_capabilities` builds a :py:class:`Capabilities` snapshot
+once (after :py:func:`~pypapi.papi_low.library_init`) and returns the same
+object afterwards, so that it can be queried on hot paths.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.capabilities import get_capabilities
+
+    papi.library_init()
+
+    capabilities = get_capabilities()
+    cpu = capabilities.cpu_component
+    print(cpu.name, cpu.num_cntrs, cpu.fast_counter_read)
+    print(capabilities.topology.totalcpus)
+    for cache in capabilities.caches:
+        print(cache.level, cache.size, cache.line_size)
+
+    # The snapshot can be serialized (e.g. to be stored with benchmark results)
+    data = capabilities.to_dict()
+
+Per-machine results (measured ceilings, tuned parameters...) are stored in
+the directory returned by :py:func:`machine_cache_path`, keyed by
+:py:meth:`Capabilities.fingerprint`.
+"""
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from . import papi_low as papi
+
+
+#: Capabilities of a PAPI component.
+ComponentCapabilities = namedtuple(
+    "ComponentCapabilities",
+    [
+        "index",
+        "name",
+        "short_name",
+        "description",
+        "disabled",
+        "disabled_reason",
+        "num_cntrs",
+        "num_mpx_cntrs",
+        "num_preset_events",
+        "num_native_events",
+        "default_domain",
+        "available_domains",
+        "default_granularity",
+        "available_granularities",
+        "fast_counter_read",
+        "fast_real_timer",
+        "fast_virtual_timer",
+        "kernel_multiplex",
+        "attach",
+        "inherit",
+        "cpu",
+    ],
+)
+
+#: CPU topology and identification.
+Topology = namedtuple(
+    "Topology",
+    [
+        "totalcpus",
+        "sockets",
+        "cores",
+        "threads",
+        "nnodes",
+        "ncpu",
+        "vendor_string",
+        "model_string",
+        "cpuid_family",
+        "cpuid_model",
+        "cpuid_stepping",
+        "cpu_max_mhz",
+        "cpu_min_mhz",
+        "virtualized",
+    ],
+)
+
+#: A cache of the memory hierarchy (``level`` starts at 1, ``size`` and
+#: ``line_size`` are in bytes, ``type`` is PAPI's ``PAPI_MH_TYPE_*`` bit
+#: field).
+CacheInfo = namedtuple("CacheInfo", "level type size line_size num_lines associativity")
+
+#: A TLB of the memory hierarchy (``level`` starts at 1, ``page_size`` is in
+#: bytes, ``type`` is PAPI's ``PAPI_MH_TYPE_*`` bit field).
+TlbInfo = namedtuple("TlbInfo", "level type num_entries page_size associativity")
+
+
+class Capabilities:
+    """Snapshot of the capabilities of the machine and of the PAPI components.
+
+    :param list(ComponentCapabilities) components: The components.
+    :param Topology topology: The CPU topology.
+    :param list(CacheInfo) caches: The caches.
+    :param list(TlbInfo) tlbs: The TLBs.
+    """
+
+    def __init__(self, components, topology, caches, tlbs):
+        #: The components (indexed by component index)
+        self.components = list(components)
+        #: The CPU topology
+        self.topology = topology
+        #: The caches, by level
+        self.caches = list(caches)
+        #: The TLBs, by level
+        self.tlbs = list(tlbs)
+        self._by_name = {}
+        for component in self.components:
+            self._by_name[component.name] = component
+            self._by_name[component.short_name] = component
+
+    def __repr__(self):
+        return "Capabilities(%s, components=[%s])" % (
+            self.topology.model_string,
+            ", ".join(component.name for component in self.components),
+        )
+
+    @property
+    def cpu_component(self):
+        """The CPU component (component 0 by convention).
+
+        :rtype: ComponentCapabilities
+        """
+        return self.components[0] if self.components else None
+
+    def component(self, component):
+        """Returns the capabilities of a component.
+
+        :param component: The index or the name (or short name) of the
+            component.
+
+        :rtype: ComponentCapabilities
+
+        :raises KeyError: The component does not exist.
+        """
+        if isinstance(component, str):
+            return self._by_name[component]
+        if not 0 <= component < len(self.components):
+            raise KeyError(component)
+        return self.components[component]
+
+    def enabled_components(self):
+        """Returns the components that are enabled.
+
+        :rtype: list(ComponentCapabilities)
+        """
+        return [component for component in self.components if not component.disabled]
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation of the snapshot.
+
+        :rtype: dict
+        """
+        return {
+            "components": [component._asdict() for component in self.components],
+            "topology": self.topology._asdict(),
+            "caches": [cache._asdict() for cache in self.caches],
+            "tlbs": [tlb._asdict() for tlb in self.tlbs],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a snapshot from the output of :py:meth:`to_dict`.
+
+        :rtype: Capabilities
+        """
+        return cls(
+            [ComponentCapabilities(**component) for component in data["components"]],
+            Topology(**data["topology"]),
+            [CacheInfo(**cache) for cache in data["caches"]],
+            [TlbInfo(**tlb) for tlb in data["tlbs"]],
+        )
+
+    def fingerprint(self):
+        """Returns a short identifier of the machine type (CPU model,
+        topology, memory hierarchy and components), that can be used as a key
+        to cache per-machine results.
+
+        :rtype: str
+        """
+        key = {
+            "topology": self.topology._asdict(),
+            "caches": [cache._asdict() for cache in self.caches],
+            "components": [
+                [component.name, component.num_cntrs, component.disabled]
+                for component in self.components
+            ],
+        }
+        data = json.dumps(key, sort_keys=True).encode("utf-8")
+        return hashlib.sha1(data).hexdigest()[:16]
+
+
+def _component_capabilities(index):
+    info = papi.get_component_info(index)
+    return ComponentCapabilities(
+        index=index,
+        name=info.name,
+        short_name=info.short_name,
+        description=info.description,
+        disabled=info.disabled,
+        disabled_reason=info.disabled_reason,
+        num_cntrs=info.num_cntrs,
+        num_mpx_cntrs=info.num_mpx_cntrs,
+        num_preset_events=info.num_preset_events,
+        num_native_events=info.num_native_events,
+        default_domain=info.default_domain,
+        available_domains=info.available_domains,
+        default_granularity=info.default_granularity,
+        available_granularities=info.available_granularities,
+        fast_counter_read=bool(info.fast_counter_read),
+        fast_real_timer=bool(info.fast_real_timer),
+        fast_virtual_timer=bool(info.fast_virtual_timer),
+        kernel_multiplex=bool(info.kernel_multiplex),
+        attach=bool(info.attach),
+        inherit=bool(info.inherit),
+        cpu=bool(info.cpu),
+    )
+
+
+def _memory_hierarchy(hardware):
+    caches = []
+    tlbs = []
+    for index, level in enumerate(hardware.mem_hierarchy.level):
+        for cache in level.cache:
+            if cache.type:
+                caches.append(
+                    CacheInfo(
+                        index + 1,
+                        cache.type,
+                        cache.size,
+                        cache.line_size,
+                        cache.num_lines,
+                        cache.associativity,
+                    )
+                )
+        for tlb in level.tlb:
+            if tlb.type:
+                tlbs.append(
+                    TlbInfo(
+                        index + 1,
+                        tlb.type,
+                        tlb.num_entries,
+                        tlb.page_size,
+                        tlb.associativity,
+                    )
+                )
+    return caches, tlbs
+
+
+def snapshot():
+    """Builds a new capability snapshot (see also :py:func:`get_capabilities`).
+
+    :rtype: Capabilities
+    """
+    hardware = papi.get_hardware_info()
+    topology = Topology(
+        totalcpus=hardware.totalcpus,
+        sockets=hardware.sockets,
+        cores=hardware.cores,
+        threads=hardware.threads,
+        nnodes=hardware.nnodes,
+        ncpu=hardware.ncpu,
+        vendor_string=hardware.vendor_string,
+        model_string=hardware.model_string,
+        cpuid_family=hardware.cpuid_family,
+        cpuid_model=hardware.cpuid_model,
+        cpuid_stepping=hardware.cpuid_stepping,
+        cpu_max_mhz=hardware.cpu_max_mhz,
+        cpu_min_mhz=hardware.cpu_min_mhz,
+        virtualized=bool(hardware.virtualized),
+    )
+    components = [_component_capabilities(i) for i in range(papi.num_components())]
+    caches, tlbs = _memory_hierarchy(hardware)
+    return Capabilities(components, topology, caches, tlbs)
+
+
+_capabilities = None
+
+
+def get_capabilities(refresh=False):
+    """Returns the capability snapshot, built on the first call.
+
+    :py:func:`~pypapi.papi_low.library_init` must be called first.
+
+    :param bool refresh: Build a new snapshot.
+
+    :rtype: Capabilities
+    """
+    global _capabilities
+    if _capabilities is None or refresh:
+        _capabilities = snapshot()
+    return _capabilities
+
+
+def cache_directory():
+    """Returns the directory where PyPAPI stores its per-machine results:
+    ``$PYPAPI_CACHE_DIR`` if set, else ``$XDG_CACHE_HOME/pypapi`` (default:
+    ``~/.cache/pypapi``). The directory is not created.
+
+    :rtype: str
+    """
+    if os.environ.get("PYPAPI_CACHE_DIR"):
+        return os.environ["PYPAPI_CACHE_DIR"]
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+    return os.path.join(os.path.expanduser(root), "pypapi")
+
+
+def machine_cache_path(name, capabilities=None):
+    """Returns the path of a per-machine result file
+    (``<cache_directory>/<fingerprint>/<name>.json``), creating its directory.
+
+    :param str name: The name of the result.
+    :param Capabilities capabilities: The capability snapshot (default:
+        :py:func:`get_capabilities`).
+
+    :rtype: str
+    """
+    capabilities = capabilities or get_capabilities()
+    directory = os.path.join(cache_directory(), capabilities.fingerprint())
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, "%s.json" % name)
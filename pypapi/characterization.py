@@ -0,0 +1,378 @@
+"""
+Machine characterization microbenchmarks.
+
+Measures the memory bandwidth and floating point ceilings of the machine with
+NumPy kernels, in bytes and floating point operations per second and per
+cycle (``PAPI_TOT_CYC``), on one core and on the whole node (one process per
+core, all running at the same time):
+
+* ``copy``: ``a[:] = b``, like the STREAM copy kernel (16 bytes per element),
+* ``triad``: ``a = b + s * c``, like the STREAM triad kernel (2 floating
+  point operations per element). NumPy makes two passes over the arrays, so it
+  moves 40 bytes per element instead of 24,
+* ``flops``: ``x += y; x -= y`` on arrays that fit in the L2 cache (2
+  floating point operations per element).
+
+The arrays of the memory kernels are 4 times larger than the last level cache.
+The ``flops`` kernel gives the peak rate attainable with NumPy element-wise
+operations, which is below the peak rate of the CPU (it is bound by the loads
+and stores).
+
+The results only depend on the machine, so :py:func:`get_ceilings` measures
+them once and stores them per machine (see
+:py:func:`~pypapi.capabilities.machine_cache_path`).
+
+.. NOTE::
+
+    This module requires NumPy, which is not a dependency of PyPAPI::
+
+        pip install numpy
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.characterization import get_ceilings
+    from pypapi.roofline import Roofline
+
+    papi.library_init()
+
+    ceilings = get_ceilings()  # measured on the first run only
+    print(ceilings.format())
+
+    roofline = Roofline(ceilings.roof("core"))
+"""
+
+import json
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+
+import numpy
+
+from . import papi_low as papi
+from .capabilities import get_capabilities, machine_cache_path
+from .process_pool import SharedCounters
+from .roofline import Roof
+from .tiling import data_caches, usable_size
+
+
+#: A measured ceiling: the kernel, the scope (``"core"`` or ``"node"``), the
+#: number of processes, and the attained rates.
+Ceiling = namedtuple(
+    "Ceiling",
+    "kernel scope processes bytes_per_cycle flops_per_cycle "
+    "bytes_per_second flops_per_second",
+)
+
+KERNELS = ("copy", "triad", "flops")
+
+#: Array size (in bytes) of the memory kernels when PAPI does not report the
+#: last level cache
+DEFAULT_STREAM_SIZE = 128 * 1024 * 1024
+
+#: Array size (in bytes) of the ``flops`` kernel when PAPI does not report the
+#: L2 cache
+DEFAULT_FLOPS_SIZE = 128 * 1024
+
+#: Number of ``x += y; x -= y`` iterations of one ``flops`` kernel call
+FLOPS_ITERATIONS = 1000
+
+# Kernel state of the current process, set by _prepare()
+_kernel = {}
+
+
+def _stream_elements():
+    caches = data_caches()
+    size = caches[-1].size * 4 if caches else DEFAULT_STREAM_SIZE
+    return max(size, DEFAULT_STREAM_SIZE // 8) // 8
+
+
+def _flops_elements():
+    caches = [cache for cache in data_caches() if cache.level == 2]
+    size = usable_size(caches[0]) if caches else DEFAULT_FLOPS_SIZE
+    return max(size // 16, 1)
+
+
+def _copy(a, b, c):
+    numpy.copyto(a, b)
+
+
+def _triad(a, b, c):
+    numpy.multiply(c, 3.0, out=a)
+    numpy.add(a, b, out=a)
+
+
+def _flops(x, y, _):
+    for _ in range(FLOPS_ITERATIONS):
+        numpy.add(x, y, out=x)
+        numpy.subtract(x, y, out=x)
+
+
+def _prepare(kernel, elements, barrier=None):
+    """Allocates the arrays of a kernel in the current process (the barrier,
+    if any, synchronizes the start of the runs of the processes of the
+    node)."""
+    _kernel["fn"] = {"copy": _copy, "triad": _triad, "flops": _flops}[kernel]
+    _kernel["arrays"] = [numpy.ones(elements) for _ in range(3)]
+    _kernel["fn"](*_kernel["arrays"])  # Touch the pages
+    _kernel["barrier"] = barrier
+
+
+def _work(kernel, elements):
+    """Returns the bytes moved and the floating point operations of one call of
+    a kernel."""
+    if kernel == "copy":
+        return 16 * elements, 0
+    if kernel == "triad":
+        return 40 * elements, 2 * elements
+    # The arrays of the flops kernel stay in the cache: no memory traffic
+    return 0, 2 * elements * FLOPS_ITERATIONS
+
+
+def _run(repeat):
+    fn = _kernel["fn"]
+    arrays = _kernel["arrays"]
+    if _kernel["barrier"] is not None:
+        # A worker waiting here cannot take another run, so each of the
+        # processes runs exactly one of them, at the same time
+        _kernel["barrier"].wait()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(*arrays)
+    return time.perf_counter() - start
+
+
+def _elements(kernel):
+    return _flops_elements() if kernel == "flops" else _stream_elements()
+
+
+def measure_core(kernel, repeat=10):
+    """Measures a kernel on the current core. Each call is measured, and the
+    fastest one is kept.
+
+    :param str kernel: The kernel (see :py:data:`KERNELS`).
+    :param int repeat: The number of calls.
+
+    :rtype: Ceiling
+    """
+    elements = _elements(kernel)
+    nbytes, flops = _work(kernel, elements)
+    _prepare(kernel, elements)
+    eventSet = papi.create_eventset()
+    try:
+        papi.add_named_event(eventSet, "PAPI_TOT_CYC")
+        best = None
+        for _ in range(repeat):
+            papi.start(eventSet)
+            try:
+                seconds = _run(1)
+            finally:
+                (cycles,) = papi.stop(eventSet)
+            if best is None or seconds < best[0]:
+                best = (seconds, cycles)
+    finally:
+        papi.cleanup_eventset(eventSet)
+        papi.destroy_eventset(eventSet)
+        _kernel.clear()
+    seconds, cycles = best
+    return Ceiling(
+        kernel,
+        "core",
+        1,
+        nbytes / cycles if cycles else 0.0,
+        flops / cycles if cycles else 0.0,
+        nbytes / seconds,
+        flops / seconds,
+    )
+
+
+def default_processes():
+    """Returns the number of processes of the node measurements: the number of
+    physical cores reported by PAPI (or the number of CPUs).
+
+    :rtype: int
+    """
+    topology = get_capabilities().topology
+    cores = topology.sockets * topology.cores
+    return cores if cores > 0 else os.cpu_count() or 1
+
+
+def measure_node(kernel, processes=None, repeat=10):
+    """Measures a kernel on the whole node: one process per core runs the
+    kernel at the same time, on its own arrays.
+
+    :param str kernel: The kernel (see :py:data:`KERNELS`).
+    :param int processes: The number of processes (default:
+        :py:func:`default_processes`).
+    :param int repeat: The number of calls per process.
+
+    :returns: the rates of the node (the sum of the processes), per second of
+        the slowest process and per cycle of the process that used the most
+        cycles.
+    :rtype: Ceiling
+    """
+    processes = processes or default_processes()
+    elements = _elements(kernel)
+    nbytes, flops = _work(kernel, elements)
+    context = multiprocessing.get_context()
+    barrier = context.Barrier(processes)
+    with SharedCounters(["PAPI_TOT_CYC"], max_tasks=processes) as counters:
+        kwargs = counters.pool_kwargs(_prepare, (kernel, elements, barrier))
+        with context.Pool(processes, **kwargs) as pool:
+            seconds = max(counters.map(pool, _run, [repeat] * processes))
+        cycles = max(task.values[0] for task in counters.tasks())
+    nbytes *= processes * repeat
+    flops *= processes * repeat
+    return Ceiling(
+        kernel,
+        "node",
+        processes,
+        nbytes / cycles if cycles else 0.0,
+        flops / cycles if cycles else 0.0,
+        nbytes / seconds,
+        flops / seconds,
+    )
+
+
+class MachineCeilings:
+    """Measured ceilings of a machine.
+
+    :param str fingerprint: The fingerprint of the machine (see
+        :py:meth:`~pypapi.capabilities.Capabilities.fingerprint`).
+    :param list(Ceiling) ceilings: The ceilings.
+    """
+
+    def __init__(self, fingerprint, ceilings):
+        #: The fingerprint of the machine
+        self.fingerprint = fingerprint
+        #: The ceilings
+        self.ceilings = list(ceilings)
+
+    def __repr__(self):
+        return "MachineCeilings(%s, %i ceilings)" % (
+            self.fingerprint,
+            len(self.ceilings),
+        )
+
+    def get(self, kernel, scope="core"):
+        """Returns the ceiling of a kernel.
+
+        :param str kernel: The kernel (see :py:data:`KERNELS`).
+        :param str scope: ``"core"`` or ``"node"``.
+
+        :rtype: Ceiling
+
+        :raises KeyError: The kernel was not measured in this scope.
+        """
+        for ceiling in self.ceilings:
+            if ceiling.kernel == kernel and ceiling.scope == scope:
+                return ceiling
+        raise KeyError((kernel, scope))
+
+    def roof(self, scope="core"):
+        """Returns the roofline ceilings of a scope: the ``flops`` rate and the
+        best bandwidth of the memory kernels.
+
+        :param str scope: ``"core"`` or ``"node"``.
+
+        :rtype: ~pypapi.roofline.Roof
+        """
+        bandwidth = max(
+            self.get(kernel, scope).bytes_per_second for kernel in ("copy", "triad")
+        )
+        return Roof(self.get("flops", scope).flops_per_second, bandwidth)
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation of the ceilings.
+
+        :rtype: dict
+        """
+        return {
+            "fingerprint": self.fingerprint,
+            "ceilings": [ceiling._asdict() for ceiling in self.ceilings],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds the ceilings from the output of :py:meth:`to_dict`.
+
+        :rtype: MachineCeilings
+        """
+        return cls(
+            data["fingerprint"],
+            [Ceiling(**ceiling) for ceiling in data["ceilings"]],
+        )
+
+    def format(self):
+        """Formats the ceilings as a text table.
+
+        :rtype: str
+        """
+        lines = [
+            "%-8s %-5s %9s %12s %12s %10s %10s"
+            % (
+                "kernel",
+                "scope",
+                "processes",
+                "bytes/cycle",
+                "FLOP/cycle",
+                "GB/s",
+                "GFLOP/s",
+            )
+        ]
+        for ceiling in self.ceilings:
+            lines.append(
+                "%-8s %-5s %9i %12.3f %12.3f %10.3f %10.3f"
+                % (
+                    ceiling.kernel,
+                    ceiling.scope,
+                    ceiling.processes,
+                    ceiling.bytes_per_cycle,
+                    ceiling.flops_per_cycle,
+                    ceiling.bytes_per_second / 1e9,
+                    ceiling.flops_per_second / 1e9,
+                )
+            )
+        return "\n".join(lines)
+
+
+def characterize(processes=None, repeat=10, node=True):
+    """Measures all the kernels, on one core and on the whole node.
+
+    :param int processes: The number of processes of the node measurements
+        (default: :py:func:`default_processes`).
+    :param int repeat: The number of calls of each kernel.
+    :param bool node: Also measure the whole node.
+
+    :rtype: MachineCeilings
+    """
+    ceilings = [measure_core(kernel, repeat) for kernel in KERNELS]
+    if node:
+        ceilings += [measure_node(kernel, processes, repeat) for kernel in KERNELS]
+    return MachineCeilings(get_capabilities().fingerprint(), ceilings)
+
+
+def get_ceilings(refresh=False, **kwargs):
+    """Returns the ceilings of the machine, measured with
+    :py:func:`characterize` on the first call (on this machine type) and
+    loaded from the per-machine cache afterwards.
+
+    :py:func:`~pypapi.papi_low.library_init` must be called first.
+
+    :param bool refresh: Measure the ceilings again.
+    :param kwargs: The arguments of :py:func:`characterize`.
+
+    :rtype: MachineCeilings
+    """
+    path = machine_cache_path("ceilings")
+    if not refresh and os.path.isfile(path):
+        try:
+            with open(path, "r") as file_:
+                return MachineCeilings.from_dict(json.load(file_))
+        except (ValueError, KeyError, TypeError):
+            pass  # Corrupted or outdated file: measure again
+    ceilings = characterize(**kwargs)
+    with open(path, "w") as file_:
+        json.dump(ceilings.to_dict(), file_, indent=2)
+    return ceilings
@@ -0,0 +1,294 @@
+"""
+Command line interface of PyPAPI.
+
+``stat`` runs a command and counts PAPI events across it (child processes
+included), like ``perf stat`` but with PAPI event names and the derived metrics
+defined in :py:mod:`pypapi.metrics`::
+
+    python -m pypapi stat -e PAPI_TOT_INS,PAPI_TOT_CYC -r 5 -- ./my_program arg
+
+Usage::
+
+    python -m pypapi stat [-h] [-e EVENTS] [-r N] [--no-inherit] [--json]
+                          [-o OUTPUT] -- COMMAND [ARGS...]
+
+* ``-e``, ``--events``: comma-separated list of preset or native event names
+  (can be given several times, default: ``PAPI_TOT_INS,PAPI_TOT_CYC``),
+* ``-r``, ``--repeat``: run the command ``N`` times and report the mean and
+  the run-to-run variation of the counts,
+* ``--no-inherit``: do not count the child processes of the command,
+* ``--json``: output the results as JSON,
+* ``-o``, ``--output``: write the results to a file instead of the standard
+  error output.
+
+The exit status is the one of the (last run of the) command.
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import sys
+import time
+
+from . import papi_low as papi
+from .consts import PAPI_INHERIT_ALL
+from .exceptions import PapiError
+from .metrics import DERIVED_METRICS, compute_metric
+
+
+DEFAULT_EVENTS = "PAPI_TOT_INS,PAPI_TOT_CYC"
+
+
+def _terminate(pid, signum):
+    # Forwards a signal to the command and reaps it (it is killed if the wait
+    # is interrupted again)
+    try:
+        os.kill(pid, signum)
+        os.waitpid(pid, 0)
+    except BaseException:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        raise
+
+
+def _run_counted(command, eventCodes, inherit=True):
+    """Forks and executes the command with the given events counted (the
+    child waits for the counters to be attached and started before calling
+    ``exec``).
+
+    :returns: the counts, the elapsed time in seconds and the exit status.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+
+    if pid == 0:
+        os.close(write_fd)
+        os.read(read_fd, 1)
+        os.close(read_fd)
+        try:
+            os.execvp(command[0], command)
+        except OSError as error:
+            sys.stderr.write("%s: %s\n" % (command[0], error.strerror))
+        os._exit(127)
+
+    os.close(read_fd)
+    eventSet = papi.create_eventset()
+    try:
+        papi.assign_eventset_component(
+            eventSet, papi.get_event_component(eventCodes[0])
+        )
+        if inherit:
+            papi.set_inherit(eventSet, PAPI_INHERIT_ALL)
+        papi.attach(eventSet, pid)
+        papi.add_events(eventSet, eventCodes)
+        papi.start(eventSet)
+    except BaseException:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        papi.cleanup_eventset(eventSet)
+        papi.destroy_eventset(eventSet)
+        raise
+
+    start_time = time.perf_counter()
+    try:
+        os.write(write_fd, b"\0")
+        os.close(write_fd)
+        _, status = os.waitpid(pid, 0)
+    except BaseException as error:
+        # E.g. Ctrl-C: the command must not be left running
+        if isinstance(error, KeyboardInterrupt):
+            _terminate(pid, signal.SIGINT)
+        else:
+            _terminate(pid, signal.SIGKILL)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start_time
+        try:
+            values = papi.stop(eventSet)
+        finally:
+            papi.cleanup_eventset(eventSet)
+            papi.destroy_eventset(eventSet)
+
+    if os.WIFSIGNALED(status):
+        return values, elapsed, 128 + os.WTERMSIG(status)
+    return values, elapsed, os.WEXITSTATUS(status)
+
+
+def _summarize(samples):
+    mean = statistics.mean(samples)
+    stdev = statistics.stdev(samples) if len(samples) > 1 else 0.0
+    return {
+        "values": samples,
+        "mean": mean,
+        "stdev": stdev,
+        "variation": stdev / mean if mean else 0.0,
+    }
+
+
+def stat(command, eventNames, repeat=1, inherit=True):
+    """Counts events across a command.
+
+    :param list(str) command: the command and its arguments.
+    :param list(str) eventNames: names of the preset or native events to
+        count.
+    :param int repeat: number of runs.
+    :param bool inherit: also count the child processes of the command.
+
+    :returns: the results (see the JSON output of the ``stat`` command) and
+        the exit status of the last run.
+    :rtype: (dict, int)
+    """
+    eventCodes = [papi.event_name_to_code(name) for name in eventNames]
+    runs = []
+    times = []
+    for _ in range(repeat):
+        values, elapsed, status = _run_counted(command, eventCodes, inherit)
+        runs.append(values)
+        times.append(elapsed)
+
+    events = {
+        name: _summarize([values[i] for values in runs])
+        for i, name in enumerate(eventNames)
+    }
+    metrics = {}
+    for metric in DERIVED_METRICS:
+        samples = [
+            compute_metric(metric, dict(zip(eventNames, values))) for values in runs
+        ]
+        if None not in samples:
+            metrics[metric.name] = _summarize(samples)
+            metrics[metric.name]["description"] = metric.description
+
+    result = {
+        "command": command,
+        "repeat": repeat,
+        "events": events,
+        "metrics": metrics,
+        "elapsed": _summarize(times),
+        "status": status,
+    }
+    return result, status
+
+
+def _format_variation(summary, repeat):
+    if repeat < 2:
+        return ""
+    return "  ( +- %6.2f%% )" % (summary["variation"] * 100)
+
+
+def format_stat(result):
+    """Formats the results of :py:func:`stat` as a ``perf stat``-like
+    report.
+
+    :rtype: str
+    """
+    repeat = result["repeat"]
+    lines = [
+        "",
+        " Performance counter stats for '%s'%s:"
+        % (" ".join(result["command"]), " (%i runs)" % repeat if repeat > 1 else ""),
+        "",
+    ]
+    for name, summary in result["events"].items():
+        lines.append(
+            "%20s  %-20s%s"
+            % (
+                "{:,.0f}".format(summary["mean"]),
+                name,
+                _format_variation(summary, repeat),
+            )
+        )
+    if result["metrics"]:
+        lines.append("")
+    for name, summary in result["metrics"].items():
+        lines.append(
+            "%20.3f  %-20s%s  # %s"
+            % (
+                summary["mean"],
+                name,
+                _format_variation(summary, repeat),
+                summary["description"],
+            )
+        )
+    lines += [
+        "",
+        "%20.6f  seconds time elapsed%s"
+        % (result["elapsed"]["mean"], _format_variation(result["elapsed"], repeat)),
+        "",
+    ]
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def _stat_command(args):
+    command = args.command
+    if command and command[0] == "--":
+        command = command[1:]
+    if not command:
+        args.parser.error("no command given")
+    if args.repeat < 1:
+        args.parser.error("--repeat must be greater than 0")
+
+    eventNames = [
+        name.strip()
+        for names in (args.events or [DEFAULT_EVENTS])
+        for name in names.split(",")
+        if name.strip()
+    ]
+
+    try:
+        papi.library_init()
+        result, status = stat(command, eventNames, args.repeat, args.inherit)
+    except PapiError as error:
+        sys.stderr.write("pypapi stat: %s\n" % error)
+        return 1
+
+    output = json.dumps(result, indent=2) if args.json else format_stat(result)
+    if args.output:
+        with open(args.output, "w") as file_:
+            file_.write(output + "\n")
+    else:
+        sys.stderr.write(output + "\n")
+    return status
+
+
+def main(argv=None):
+    """Entry point of the ``python -m pypapi`` command.
+
+    :returns: the exit status.
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(prog="python -m pypapi")
+    subparsers = parser.add_subparsers(dest="subcommand")
+    subparsers.required = True
+
+    stat_parser = subparsers.add_parser(
+        "stat", help="count events across a command (like perf stat)"
+    )
+    stat_parser.add_argument(
+        "-e",
+        "--events",
+        action="append",
+        help="comma-separated list of event names (default: %s)" % DEFAULT_EVENTS,
+    )
+    stat_parser.add_argument(
+        "-r", "--repeat", type=int, default=1, help="number of runs (default: 1)"
+    )
+    stat_parser.add_argument(
+        "--no-inherit",
+        dest="inherit",
+        action="store_false",
+        help="do not count the child processes of the command",
+    )
+    stat_parser.add_argument(
+        "--json", action="store_true", help="output the results as JSON"
+    )
+    stat_parser.add_argument(
+        "-o", "--output", help="write the results to a file instead of stderr"
+    )
+    stat_parser.add_argument("command", nargs=argparse.REMAINDER)
+    stat_parser.set_defaults(func=_stat_command, parser=stat_parser)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
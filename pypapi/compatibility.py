@@ -0,0 +1,319 @@
+"""
+Cached event compatibility: which events can be counted together.
+
+Whether a set of events can be counted in the same event set depends on the
+number of counters, on the counters each event can use, and on the
+constraints of the kernel, and is usually found by building a trial event set
+(:py:func:`~pypapi.papi_low.add_event` raises
+:py:class:`~pypapi.exceptions.PapiConflictError` or
+:py:class:`~pypapi.exceptions.PapiCountError`, or
+:py:func:`~pypapi.papi_low.start` fails). :py:class:`EventCompatibility`
+memoizes the results of the trial builds, and deduces the answer without
+building anything whenever it can:
+
+* a set that contains an unavailable event or an incompatible pair cannot be
+  counted,
+* a subset of a set that was counted can be counted.
+
+The results are stored per machine type (see
+:py:func:`~pypapi.capabilities.machine_cache_path`), so that "can I add this
+event?" becomes a lookup for interactive tools and event planners.
+:py:func:`compatibility_matrix` computes (or loads) the pairwise matrix of a
+list of events, greedy maximal groups of events that can be counted together,
+and the counters each native event can use (when the component exposes
+them).
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.compatibility import compatibility_matrix, get_compatibility
+
+    papi.library_init()
+
+    matrix = compatibility_matrix(["PAPI_TOT_INS", "PAPI_TOT_CYC", "PAPI_L2_TCM"])
+    print(matrix.groups)
+
+    compatibility = get_compatibility()
+    if compatibility.can_add("PAPI_L3_TCM", ["PAPI_TOT_INS", "PAPI_TOT_CYC"]):
+        ...
+"""
+
+import json
+import os
+from collections import namedtuple
+
+from . import papi_low as papi
+from .capabilities import machine_cache_path
+from .exceptions import PapiConflictError, PapiCountError, PapiNoEventError
+
+
+#: Result of :py:func:`compatibility_matrix`: the event names, the pairwise
+#: matrix (``pairs[i][j]`` tells whether the events ``i`` and ``j`` can be
+#: counted together, ``pairs[i][i]`` whether the event ``i`` is available),
+#: greedy maximal groups of events that can be counted together (lists of
+#: names, covering the available events), and the counters each event can use
+#: (a dict indexed by event name, with an empty list when unknown).
+CompatibilityMatrix = namedtuple("CompatibilityMatrix", "events pairs groups counters")
+
+
+def _name(event):
+    if isinstance(event, str):
+        return event
+    return papi.event_code_to_name(event)
+
+
+def _key(names):
+    return "|".join(sorted(names))
+
+
+def _can_count(names):
+    # Trial build of an event set with the given events (the other errors,
+    # e.g. a lack of permission, say nothing about the events and must not
+    # be memoized)
+    eventSet = papi.create_eventset()
+    started = False
+    try:
+        for name in names:
+            papi.add_named_event(eventSet, name)
+        papi.start(eventSet)
+        started = True
+        return True
+    except (PapiConflictError, PapiCountError, PapiNoEventError):
+        return False
+    finally:
+        if started:
+            papi.stop(eventSet)
+        papi.cleanup_eventset(eventSet)
+        papi.destroy_eventset(eventSet)
+
+
+def _counters(name):
+    # Registers of a native event, as exposed by its component
+    if name.startswith("PAPI_"):  # Presets list their native events instead
+        return []
+    try:
+        info = papi.get_event_info(papi.event_name_to_code(name))
+    except PapiNoEventError:
+        return []
+    return [register for register in info.name[: info.count] if register]
+
+
+class EventCompatibility:
+    """Memoized answers to "can these events be counted together?".
+
+    :param dict trials: The results of previous trial builds (``bool``
+        indexed by the ``|``-separated sorted event names).
+    :param dict counters: The counters of the events, indexed by event name.
+    """
+
+    def __init__(self, trials=None, counters=None):
+        self._trials = dict(trials or {})
+        self._counters = dict(counters or {})
+        #: Whether new results were added since the object was built or saved
+        self.changed = False
+
+    def __repr__(self):
+        return "EventCompatibility(%i trials)" % len(self._trials)
+
+    def _deduce(self, names):
+        key = _key(names)
+        if key in self._trials:
+            return self._trials[key]
+        for name in names:
+            if self._trials.get(name) is False:
+                return False
+        for i, first in enumerate(names):
+            for second in names[i + 1 :]:
+                if self._trials.get(_key((first, second))) is False:
+                    return False
+        wanted = set(names)
+        for key, countable in self._trials.items():
+            if countable and wanted.issubset(key.split("|")):
+                return True
+        return None
+
+    def can_count(self, events, probe=True):
+        """Tells whether events can be counted in the same event set.
+
+        :param list events: The events (names or codes).
+        :param bool probe: Build a trial event set if the answer cannot be
+            deduced from the previous results.
+
+        :returns: the answer, or ``None`` if it is unknown and ``probe`` is
+            ``False``.
+        :rtype: bool
+        """
+        names = sorted(set(_name(event) for event in events))
+        if not names:
+            return True
+        countable = self._deduce(names)
+        if countable is None and probe:
+            countable = _can_count(names)
+            self._trials[_key(names)] = countable
+            self.changed = True
+        return countable
+
+    def compatible(self, first, second, probe=True):
+        """Tells whether two events can be counted together (see
+        :py:meth:`can_count`).
+
+        :rtype: bool
+        """
+        return self.can_count([first, second], probe)
+
+    def can_add(self, event, events, probe=True):
+        """Tells whether an event can be added to an event set counting some
+        events (see :py:meth:`can_count`).
+
+        :param event: The event to add (name or code).
+        :param list events: The events of the event set (names or codes).
+
+        :rtype: bool
+        """
+        return self.can_count(list(events) + [event], probe)
+
+    def counters(self, event):
+        """Returns the counters (registers) a native event can use, when its
+        component exposes them.
+
+        :param event: The event (name or code).
+
+        :returns: the counter names (empty if unknown).
+        :rtype: list(str)
+        """
+        name = _name(event)
+        if name not in self._counters:
+            self._counters[name] = _counters(name)
+            self.changed = True
+        return self._counters[name]
+
+    def pairs(self, events):
+        """Returns the pairwise compatibility matrix of events.
+
+        :param list events: The events (names or codes).
+
+        :returns: ``pairs[i][j]`` tells whether the events ``i`` and ``j`` can
+            be counted together (``pairs[i][i]``: whether the event ``i`` is
+            available).
+        :rtype: list(list(bool))
+        """
+        names = [_name(event) for event in events]
+        available = [self.can_count([name]) for name in names]
+        pairs = [[False] * len(names) for _ in names]
+        for i, first in enumerate(names):
+            pairs[i][i] = available[i]
+            for j in range(i + 1, len(names)):
+                if available[i] and available[j]:
+                    countable = self.can_count([first, names[j]])
+                    pairs[i][j] = pairs[j][i] = countable
+        return pairs
+
+    def groups(self, events):
+        """Returns greedy maximal groups of events that can be counted
+        together: each group starts with the first event not yet in a group,
+        and the other events are added in order when the group stays
+        countable. Every available event is in at least one group.
+
+        :param list events: The events (names or codes).
+
+        :rtype: list(list(str))
+        """
+        names = [_name(event) for event in events]
+        names = [name for name in names if self.can_count([name])]
+        groups = []
+        grouped = set()
+        for seed in names:
+            if seed in grouped:
+                continue
+            group = [seed]
+            for name in names:
+                if name not in group and self.can_count(group + [name]):
+                    group.append(name)
+            groups.append(group)
+            grouped.update(group)
+        return groups
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation of the results.
+
+        :rtype: dict
+        """
+        return {"trials": dict(self._trials), "counters": dict(self._counters)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds an object from the output of :py:meth:`to_dict`.
+
+        :rtype: EventCompatibility
+        """
+        return cls(data["trials"], data["counters"])
+
+    def save(self, path=None):
+        """Stores the results (if they changed).
+
+        :param str path: The path of the file (default: the per-machine
+            cache, see :py:func:`get_compatibility`).
+        """
+        if not self.changed:
+            return
+        path = path or machine_cache_path("compatibility")
+        with open(path, "w") as file_:
+            json.dump(self.to_dict(), file_, indent=2, sort_keys=True)
+        self.changed = False
+
+
+_compatibility = None
+
+
+def get_compatibility(refresh=False):
+    """Returns the event compatibility results of the machine, loaded from
+    the per-machine cache on the first call.
+
+    :py:func:`~pypapi.papi_low.library_init` must be called first.
+
+    :param bool refresh: Forget the cached results.
+
+    :rtype: EventCompatibility
+    """
+    global _compatibility
+    if _compatibility is not None and not refresh:
+        return _compatibility
+    _compatibility = EventCompatibility()
+    path = machine_cache_path("compatibility")
+    if not refresh and os.path.isfile(path):
+        try:
+            with open(path, "r") as file_:
+                _compatibility = EventCompatibility.from_dict(json.load(file_))
+        except (ValueError, KeyError, TypeError):
+            pass  # Corrupted or outdated file: probe again
+    return _compatibility
+
+
+def _available_presets():
+    return [info.symbol for info in papi.enum_cmp_event(0)["preset"]]
+
+
+def compatibility_matrix(events=None, save=True):
+    """Computes the pairwise compatibility matrix, the greedy maximal groups
+    and the counters of events. The results are memoized in
+    :py:func:`get_compatibility`, so only the unknown combinations are
+    probed.
+
+    :py:func:`~pypapi.papi_low.library_init` must be called first.
+
+    :param list events: The events (names or codes, default: the available
+        presets of the CPU component).
+    :param bool save: Store the new results in the per-machine cache.
+
+    :rtype: CompatibilityMatrix
+    """
+    if events is None:
+        events = _available_presets()
+    names = [_name(event) for event in events]
+    compatibility = get_compatibility()
+    pairs = compatibility.pairs(names)
+    groups = compatibility.groups(names)
+    counters = {name: compatibility.counters(name) for name in names}
+    if save:
+        compatibility.save()
+    return CompatibilityMatrix(names, pairs, groups, counters)
@@ -79,6 +79,24 @@ PAPI_NATIVE_MASK = c_int(lib.PAPI_NATIVE_MASK).value
 PAPI_PRESET_MASK = c_int(lib.PAPI_PRESET_MASK).value
 
 
+# PAPI Event Enumeration
+
+#: Enumerate all the events
+PAPI_ENUM_EVENTS = lib.PAPI_ENUM_EVENTS
+
+#: Enumerate the first event (preset or native)
+PAPI_ENUM_FIRST = lib.PAPI_ENUM_FIRST
+
+#: Enumerate the preset events that exist on the hardware
+PAPI_PRESET_ENUM_AVAIL = lib.PAPI_PRESET_ENUM_AVAIL
+
+#: Enumerate the unit masks and qualifiers of a native event
+PAPI_NTV_ENUM_UMASKS = lib.PAPI_NTV_ENUM_UMASKS
+
+#: Enumerate all the combinations of unit masks of a native event
+PAPI_NTV_ENUM_UMASK_COMBOS = lib.PAPI_NTV_ENUM_UMASK_COMBOS
+
+
 # PAPI Option
 
 #: For small strings, like names & stuff
@@ -97,6 +115,21 @@ PAPI_HUGE_STR_LEN = lib.PAPI_HUGE_STR_LEN
 PAPI_MAX_INFO_TERMS = lib.PAPI_MAX_INFO_TERMS
 
 
+# PAPI Option Codes
+
+#: Option to set counter inheritance flag
+PAPI_INHERIT = lib.PAPI_INHERIT
+
+
+# PAPI Inheritance
+
+#: Inherit the counters of all children
+PAPI_INHERIT_ALL = lib.PAPI_INHERIT_ALL
+
+#: Inherit none of the children's counters
+PAPI_INHERIT_NONE = lib.PAPI_INHERIT_NONE
+
+
 # PAPI Error
 
 #: Option to turn off automatic reporting of return codes < 0 to stderr.
@@ -206,6 +239,54 @@ PAPI_SP_OPS = lib.PAPI_SP_OPS | PAPI_PRESET_MASK
 PAPI_DP_OPS = lib.PAPI_DP_OPS | PAPI_PRESET_MASK
 
 
+# PAPI Memory Hierarchy
+
+#: Maximum number of TLB or cache descriptors per level
+PAPI_MH_MAX_LEVELS = lib.PAPI_MH_MAX_LEVELS
+
+#: Maximum number of levels of the memory hierarchy
+PAPI_MAX_MEM_HIERARCHY_LEVELS = lib.PAPI_MAX_MEM_HIERARCHY_LEVELS
+
+#: Empty descriptor
+PAPI_MH_TYPE_EMPTY = lib.PAPI_MH_TYPE_EMPTY
+
+#: Instruction cache or TLB
+PAPI_MH_TYPE_INST = lib.PAPI_MH_TYPE_INST
+
+#: Data cache or TLB
+PAPI_MH_TYPE_DATA = lib.PAPI_MH_TYPE_DATA
+
+#: Vector cache
+PAPI_MH_TYPE_VECTOR = lib.PAPI_MH_TYPE_VECTOR
+
+#: Trace cache
+PAPI_MH_TYPE_TRACE = lib.PAPI_MH_TYPE_TRACE
+
+#: Unified (instruction and data) cache or TLB
+PAPI_MH_TYPE_UNIFIED = lib.PAPI_MH_TYPE_UNIFIED
+
+#: Write-through cache
+PAPI_MH_TYPE_WT = lib.PAPI_MH_TYPE_WT
+
+#: Write-back cache
+PAPI_MH_TYPE_WB = lib.PAPI_MH_TYPE_WB
+
+#: Unknown replacement policy
+PAPI_MH_TYPE_UNKNOWN = lib.PAPI_MH_TYPE_UNKNOWN
+
+#: LRU replacement policy
+PAPI_MH_TYPE_LRU = lib.PAPI_MH_TYPE_LRU
+
+#: Pseudo-LRU replacement policy
+PAPI_MH_TYPE_PSEUDO_LRU = lib.PAPI_MH_TYPE_PSEUDO_LRU
+
+#: TLB (not a memory cache)
+PAPI_MH_TYPE_TLB = lib.PAPI_MH_TYPE_TLB
+
+#: Prefetch buffer
+PAPI_MH_TYPE_PREF = lib.PAPI_MH_TYPE_PREF
+
+
 # Others
 
 #: A nonexistent hardware event used as a placeholder
@@ -0,0 +1,356 @@
+"""
+Energy measurement of code regions.
+
+:py:class:`EnergyMeter` measures the energy (in joules) and the average power
+(in watts) of code regions, alongside core counters, from one of these
+sources:
+
+* :py:class:`PapiEnergySource`: the energy events of the ``powercap`` or
+  ``rapl`` PAPI component (PAPI must be built with these components, e.g.
+  ``PAPI_COMPONENTS="powercap" pip install python_papi``). The events are
+  found in the event catalog of the component, and their values are scaled
+  according to their units (``nJ``, ``uJ``...),
+* :py:class:`SysfsEnergySource`: the ``energy_uj`` files of the Linux
+  powercap sysfs tree (``/sys/class/powercap`` by default, the root can be
+  changed, e.g. to use a fake tree in tests). The wraparound of the energy
+  counters is handled with ``max_energy_range_uj``.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.energy import EnergyMeter
+
+    papi.library_init()
+
+    with EnergyMeter() as meter:
+        for request in requests:
+            with meter.region("request") as region:
+                handle(request)
+            print(region.result.joules, region.result.watts)
+
+    print(meter.totals())
+
+.. NOTE::
+
+    RAPL energy counters are updated about every millisecond, and cover the
+    whole package (all the processes running on it), so the energy of short
+    regions is not meaningful.
+"""
+
+import os
+import time
+from collections import namedtuple
+
+from . import papi_low as papi
+from .exceptions import PapiError, PapiNoComponentError
+from .reader import EventSetReader
+
+
+#: An energy domain: its name, the number of joules per unit of its raw value,
+#: and the range of its raw value (the value wraps around to zero after it,
+#: ``0`` if it does not wrap).
+EnergyDomain = namedtuple("EnergyDomain", "name scale max_range")
+
+#: Measurement of a region: its name, its duration (seconds), the energy
+#: (joules) and the average power (watts) of each domain (dicts indexed by
+#: domain name), and the core counters (a dict indexed by event name).
+EnergyRegion = namedtuple("EnergyRegion", "name seconds joules watts counters")
+
+#: Scale (joules per unit) of the energy units used by PAPI components
+ENERGY_UNITS = {"nJ": 1e-9, "uJ": 1e-6, "mJ": 1e-3, "J": 1.0}
+
+#: The energy components, by order of preference
+ENERGY_COMPONENTS = ("powercap", "rapl")
+
+#: The default root of the powercap sysfs tree
+DEFAULT_POWERCAP_ROOT = "/sys/class/powercap"
+
+DEFAULT_EVENTS = ("PAPI_TOT_INS", "PAPI_TOT_CYC")
+
+# Energy events also have power limits, ranges and raw counts, with the same
+# units
+_IGNORED_EVENTS = ("MAX_", "LIMIT", "_CNT")
+
+
+def _energy_scale(info):
+    if any(word in info.symbol for word in _IGNORED_EVENTS):
+        return None
+    return ENERGY_UNITS.get(info.units.strip())
+
+
+class PapiEnergySource:
+    """Energy events of a PAPI component. The values are counts since the
+    start of the event set, as returned by the component: their wraparound is
+    not corrected (the ``max_range`` of the domains is ``0``), so long
+    measurements should use :py:class:`SysfsEnergySource` if the component
+    does not extend the hardware counters.
+
+    :param str component: The name of the component (default: the first
+        enabled component of :py:data:`ENERGY_COMPONENTS`).
+
+    :raises PapiNoComponentError: The component does not exist, or has no
+        energy event.
+    """
+
+    def __init__(self, component=None):
+        if component is None:
+            component = _find_component()
+        cidx = papi.get_component_index(component)
+        infos = papi.enum_cmp_event(cidx)["native"]
+        events = [(info, _energy_scale(info)) for info in infos]
+        events = [(info, scale) for info, scale in events if scale]
+        if not events:
+            raise PapiNoComponentError(
+                "the %s component has no energy event" % component
+            )
+        #: The name of the component
+        self.component = component
+        #: The energy domains
+        self.domains = [EnergyDomain(info.symbol, scale, 0) for info, scale in events]
+        self.eventSet = papi.create_eventset()
+        try:
+            papi.add_events(self.eventSet, [info.event_code for info, _ in events])
+            papi.start(self.eventSet)
+        except PapiError:
+            papi.cleanup_eventset(self.eventSet)
+            papi.destroy_eventset(self.eventSet)
+            raise
+        self._reader = EventSetReader(self.eventSet)
+
+    def read(self):
+        """Returns the raw value of each domain.
+
+        :rtype: list(int)
+        """
+        return self._reader.read()
+
+    def close(self):
+        """Stops and releases the event set."""
+        if self.eventSet is None:
+            return
+        papi.stop(self.eventSet)
+        papi.cleanup_eventset(self.eventSet)
+        papi.destroy_eventset(self.eventSet)
+        self.eventSet = None
+
+
+def _find_component():
+    for component in ENERGY_COMPONENTS:
+        try:
+            cidx = papi.get_component_index(component)
+        except PapiError:
+            continue
+        if not papi.get_component_info(cidx).disabled:
+            return component
+    raise PapiNoComponentError("no enabled energy component (powercap, rapl)")
+
+
+def _read_file(path):
+    with open(path, "r") as file_:
+        return file_.read().strip()
+
+
+class SysfsEnergySource:
+    """Energy counters of the Linux powercap sysfs tree (one domain per zone
+    with an ``energy_uj`` file, e.g. ``package-0`` or ``package-0/dram``).
+
+    :param str root: The root of the powercap tree.
+
+    :raises PapiNoComponentError: No readable energy counter was found.
+    """
+
+    def __init__(self, root=DEFAULT_POWERCAP_ROOT):
+        zones = {}
+        if os.path.isdir(root):
+            for entry in sorted(os.listdir(root)):
+                path = os.path.join(root, entry)
+                if os.access(os.path.join(path, "energy_uj"), os.R_OK):
+                    zones[entry] = path
+        #: The root of the powercap tree
+        self.root = root
+        #: The energy domains
+        self.domains = []
+        self._fds = []
+        for entry, path in zones.items():
+            name = self._zone_name(zones, entry)
+            rangePath = os.path.join(path, "max_energy_range_uj")
+            maxRange = int(_read_file(rangePath)) if os.path.isfile(rangePath) else 0
+            self.domains.append(EnergyDomain(name, 1e-6, maxRange))
+            self._fds.append(os.open(os.path.join(path, "energy_uj"), os.O_RDONLY))
+        if not self.domains:
+            raise PapiNoComponentError("no readable energy counter in %s" % root)
+
+    def _zone_name(self, zones, entry):
+        # Subzones (e.g. "intel-rapl:0:1") are prefixed with their parent zone
+        namePath = os.path.join(zones[entry], "name")
+        name = _read_file(namePath) if os.path.isfile(namePath) else entry
+        parent = entry.rsplit(":", 1)[0]
+        if parent != entry and parent in zones:
+            return "%s/%s" % (self._zone_name(zones, parent), name)
+        return name
+
+    def read(self):
+        """Returns the raw value of each domain (in microjoules).
+
+        :rtype: list(int)
+        """
+        return [int(os.pread(fd, 32, 0)) for fd in self._fds]
+
+    def close(self):
+        """Closes the energy counter files."""
+        for fd in self._fds:
+            os.close(fd)
+        self._fds = []
+
+
+def find_energy_source(root=None):
+    """Returns the energy source: the energy events of a PAPI component, or
+    the powercap sysfs tree if no energy component is available.
+
+    :param str root: Use the powercap sysfs tree with this root (instead of a
+        PAPI component).
+
+    :rtype: PapiEnergySource or SysfsEnergySource
+
+    :raises PapiNoComponentError: No energy source was found.
+    """
+    if root is not None:
+        return SysfsEnergySource(root)
+    try:
+        return PapiEnergySource()
+    except PapiError:
+        return SysfsEnergySource()
+
+
+class Region:
+    """A region being measured (see :py:meth:`EnergyMeter.region`)."""
+
+    def __init__(self, meter, name):
+        self._meter = meter
+        #: The name of the region
+        self.name = name
+        #: The measurement, available when the region is left
+        self.result = None
+
+    def __enter__(self):
+        meter = self._meter
+        self._counters = meter._reader.read() if meter._reader else []
+        self._energy = meter.source.read()
+        self._time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        meter = self._meter
+        seconds = time.perf_counter() - self._time
+        energy = meter.source.read()
+        counters = meter._reader.read() if meter._reader else []
+        joules = {}
+        watts = {}
+        for domain, before, after in zip(meter.source.domains, self._energy, energy):
+            delta = after - before
+            if delta < 0 and domain.max_range:
+                delta += domain.max_range
+            joules[domain.name] = delta * domain.scale
+            watts[domain.name] = joules[domain.name] / seconds if seconds else 0.0
+        self.result = EnergyRegion(
+            self.name,
+            seconds,
+            joules,
+            watts,
+            {
+                name: after - before
+                for name, before, after in zip(meter.names, self._counters, counters)
+            },
+        )
+        meter.regions.append(self.result)
+
+
+class EnergyMeter:
+    """Measures the energy and the core counters of code regions.
+
+    :param list events: The core events to count (event names or codes, may be
+        empty).
+    :param source: The energy source (default: :py:func:`find_energy_source`).
+    :param str root: The root of the powercap sysfs tree, if ``source`` is not
+        given (see :py:func:`find_energy_source`).
+
+    :raises PapiNoComponentError: No energy source was found.
+    """
+
+    def __init__(self, events=DEFAULT_EVENTS, source=None, root=None):
+        #: The energy source
+        self.source = source or find_energy_source(root)
+        #: The measured regions
+        self.regions = []
+        self.eventSet = None
+        self._reader = None
+        #: The names of the core events
+        self.names = []
+        if events:
+            self.eventSet = papi.create_eventset()
+            for event in events:
+                if isinstance(event, str):
+                    papi.add_named_event(self.eventSet, event)
+                else:
+                    papi.add_event(self.eventSet, event)
+            papi.start(self.eventSet)
+            self._reader = EventSetReader(self.eventSet)
+            self.names = self._reader.names
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def region(self, name):
+        """Returns a context manager that measures a region. Regions can be
+        nested.
+
+        :param str name: The name of the region.
+
+        :rtype: Region
+        """
+        return Region(self, name)
+
+    def totals(self):
+        """Returns the sums of the measurements of the regions with the same
+        name.
+
+        :returns: the summed measurements, indexed by region name.
+        :rtype: dict(str, EnergyRegion)
+        """
+        totals = {}
+        for region in self.regions:
+            total = totals.get(region.name)
+            if total is None:
+                totals[region.name] = region
+                continue
+            seconds = total.seconds + region.seconds
+            joules = {
+                domain: value + region.joules[domain]
+                for domain, value in total.joules.items()
+            }
+            totals[region.name] = EnergyRegion(
+                region.name,
+                seconds,
+                joules,
+                {
+                    domain: value / seconds if seconds else 0.0
+                    for domain, value in joules.items()
+                },
+                {
+                    name: value + region.counters[name]
+                    for name, value in total.counters.items()
+                },
+            )
+        return totals
+
+    def close(self):
+        """Stops and releases the core event set and the energy source."""
+        if self.eventSet is not None:
+            papi.stop(self.eventSet)
+            papi.cleanup_eventset(self.eventSet)
+            papi.destroy_eventset(self.eventSet)
+            self.eventSet = None
+        self.source.close()
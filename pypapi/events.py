@@ -358,3 +358,285 @@ PAPI_REF_CYC = 0x6B | PAPI_PRESET_MASK
 
 #: This should always be last!
 PAPI_END = 0x6C | PAPI_PRESET_MASK
+
+# Names of the preset events, indexed by ``code & PAPI_PRESET_AND_MASK``
+_PRESET_NAMES = (
+    "PAPI_L1_DCM",
+    "PAPI_L1_ICM",
+    "PAPI_L2_DCM",
+    "PAPI_L2_ICM",
+    "PAPI_L3_DCM",
+    "PAPI_L3_ICM",
+    "PAPI_L1_TCM",
+    "PAPI_L2_TCM",
+    "PAPI_L3_TCM",
+    "PAPI_CA_SNP",
+    "PAPI_CA_SHR",
+    "PAPI_CA_CLN",
+    "PAPI_CA_INV",
+    "PAPI_CA_ITV",
+    "PAPI_L3_LDM",
+    "PAPI_L3_STM",
+    "PAPI_BRU_IDL",
+    "PAPI_FXU_IDL",
+    "PAPI_FPU_IDL",
+    "PAPI_LSU_IDL",
+    "PAPI_TLB_DM",
+    "PAPI_TLB_IM",
+    "PAPI_TLB_TL",
+    "PAPI_L1_LDM",
+    "PAPI_L1_STM",
+    "PAPI_L2_LDM",
+    "PAPI_L2_STM",
+    "PAPI_BTAC_M",
+    "PAPI_PRF_DM",
+    "PAPI_L3_DCH",
+    "PAPI_TLB_SD",
+    "PAPI_CSR_FAL",
+    "PAPI_CSR_SUC",
+    "PAPI_CSR_TOT",
+    "PAPI_MEM_SCY",
+    "PAPI_MEM_RCY",
+    "PAPI_MEM_WCY",
+    "PAPI_STL_ICY",
+    "PAPI_FUL_ICY",
+    "PAPI_STL_CCY",
+    "PAPI_FUL_CCY",
+    "PAPI_HW_INT",
+    "PAPI_BR_UCN",
+    "PAPI_BR_CN",
+    "PAPI_BR_TKN",
+    "PAPI_BR_NTK",
+    "PAPI_BR_MSP",
+    "PAPI_BR_PRC",
+    "PAPI_FMA_INS",
+    "PAPI_TOT_IIS",
+    "PAPI_TOT_INS",
+    "PAPI_INT_INS",
+    "PAPI_FP_INS",
+    "PAPI_LD_INS",
+    "PAPI_SR_INS",
+    "PAPI_BR_INS",
+    "PAPI_VEC_INS",
+    "PAPI_RES_STL",
+    "PAPI_FP_STAL",
+    "PAPI_TOT_CYC",
+    "PAPI_LST_INS",
+    "PAPI_SYC_INS",
+    "PAPI_L1_DCH",
+    "PAPI_L2_DCH",
+    "PAPI_L1_DCA",
+    "PAPI_L2_DCA",
+    "PAPI_L3_DCA",
+    "PAPI_L1_DCR",
+    "PAPI_L2_DCR",
+    "PAPI_L3_DCR",
+    "PAPI_L1_DCW",
+    "PAPI_L2_DCW",
+    "PAPI_L3_DCW",
+    "PAPI_L1_ICH",
+    "PAPI_L2_ICH",
+    "PAPI_L3_ICH",
+    "PAPI_L1_ICA",
+    "PAPI_L2_ICA",
+    "PAPI_L3_ICA",
+    "PAPI_L1_ICR",
+    "PAPI_L2_ICR",
+    "PAPI_L3_ICR",
+    "PAPI_L1_ICW",
+    "PAPI_L2_ICW",
+    "PAPI_L3_ICW",
+    "PAPI_L1_TCH",
+    "PAPI_L2_TCH",
+    "PAPI_L3_TCH",
+    "PAPI_L1_TCA",
+    "PAPI_L2_TCA",
+    "PAPI_L3_TCA",
+    "PAPI_L1_TCR",
+    "PAPI_L2_TCR",
+    "PAPI_L3_TCR",
+    "PAPI_L1_TCW",
+    "PAPI_L2_TCW",
+    "PAPI_L3_TCW",
+    "PAPI_FML_INS",
+    "PAPI_FAD_INS",
+    "PAPI_FDV_INS",
+    "PAPI_FSQ_INS",
+    "PAPI_FNV_INS",
+    "PAPI_FP_OPS",
+    "PAPI_SP_OPS",
+    "PAPI_DP_OPS",
+    "PAPI_VEC_SP",
+    "PAPI_VEC_DP",
+    "PAPI_REF_CYC",
+)
+
+# Descriptions of the preset events, indexed by ``code & PAPI_PRESET_AND_MASK``
+_PRESET_DESCRIPTIONS = (
+    "Level 1 data cache misses",
+    "Level 1 instruction cache misses",
+    "Level 2 data cache misses",
+    "Level 2 instruction cache misses",
+    "Level 3 data cache misses",
+    "Level 3 instruction cache misses",
+    "Level 1 total cache misses",
+    "Level 2 total cache misses",
+    "Level 3 total cache misses",
+    "Snoops",
+    "Request for shared cache line (SMP)",
+    "Request for clean cache line (SMP)",
+    "Request for cache line Invalidation (SMP)",
+    "Request for cache line Intervention (SMP)",
+    "Level 3 load misses",
+    "Level 3 store misses",
+    "Cycles branch units are idle",
+    "Cycles integer units are idle",
+    "Cycles floating point units are idle",
+    "Cycles load/store units are idle",
+    "Data translation lookaside buffer misses",
+    "Instr translation lookaside buffer misses",
+    "Total translation lookaside buffer misses",
+    "Level 1 load misses",
+    "Level 1 store misses",
+    "Level 2 load misses",
+    "Level 2 store misses",
+    "BTAC miss",
+    "Prefetch data instruction caused a miss",
+    "Level 3 Data Cache Hit",
+    "Xlation lookaside buffer shootdowns (SMP)",
+    "Failed store conditional instructions",
+    "Successful store conditional instructions",
+    "Total store conditional instructions",
+    "Cycles Stalled Waiting for Memory Access",
+    "Cycles Stalled Waiting for Memory Read",
+    "Cycles Stalled Waiting for Memory Write",
+    "Cycles with No Instruction Issue",
+    "Cycles with Maximum Instruction Issue",
+    "Cycles with No Instruction Completion",
+    "Cycles with Maximum Instruction Completion",
+    "Hardware interrupts",
+    "Unconditional branch instructions executed",
+    "Conditional branch instructions executed",
+    "Conditional branch instructions taken",
+    "Conditional branch instructions not taken",
+    "Conditional branch instructions mispred",
+    "Conditional branch instructions corr. pred",
+    "FMA instructions completed",
+    "Total instructions issued",
+    "Total instructions executed",
+    "Integer instructions executed",
+    "Floating point instructions executed",
+    "Load instructions executed",
+    "Store instructions executed",
+    "Total branch instructions executed",
+    "Vector/SIMD instructions executed (could include integer)",
+    "Cycles processor is stalled on resource",
+    "Cycles any FP units are stalled",
+    "Total cycles executed",
+    "Total load/store inst. executed",
+    "Sync. inst. executed",
+    "L1 D Cache Hit",
+    "L2 D Cache Hit",
+    "L1 D Cache Access",
+    "L2 D Cache Access",
+    "L3 D Cache Access",
+    "L1 D Cache Read",
+    "L2 D Cache Read",
+    "L3 D Cache Read",
+    "L1 D Cache Write",
+    "L2 D Cache Write",
+    "L3 D Cache Write",
+    "L1 instruction cache hits",
+    "L2 instruction cache hits",
+    "L3 instruction cache hits",
+    "L1 instruction cache accesses",
+    "L2 instruction cache accesses",
+    "L3 instruction cache accesses",
+    "L1 instruction cache reads",
+    "L2 instruction cache reads",
+    "L3 instruction cache reads",
+    "L1 instruction cache writes",
+    "L2 instruction cache writes",
+    "L3 instruction cache writes",
+    "L1 total cache hits",
+    "L2 total cache hits",
+    "L3 total cache hits",
+    "L1 total cache accesses",
+    "L2 total cache accesses",
+    "L3 total cache accesses",
+    "L1 total cache reads",
+    "L2 total cache reads",
+    "L3 total cache reads",
+    "L1 total cache writes",
+    "L2 total cache writes",
+    "L3 total cache writes",
+    "FM ins",
+    "FA ins",
+    "FD ins",
+    "FSq ins",
+    "Finv ins",
+    "Floating point operations executed",
+    "Floating point operations executed; optimized to count scaled single precision vector operations",
+    "Floating point operations executed; optimized to count scaled double precision vector operations",
+    "Single precision vector/SIMD instructions",
+    "Double precision vector/SIMD instructions",
+    "Reference clock cycles",
+)
+
+
+def preset_name(code):
+    """Returns the name of a preset event from its code, without calling PAPI.
+
+    :param int code: The event code.
+
+    :returns: the name, or ``None`` if the code is not a known preset event.
+    :rtype: str
+    """
+    code &= 0xFFFFFFFF
+    if code & 0xC0000000 != 0x80000000:
+        return None
+    index = code & PAPI_PRESET_AND_MASK
+    return _PRESET_NAMES[index] if index < len(_PRESET_NAMES) else None
+
+
+def preset_description(code):
+    """Returns the description of a preset event from its code, without
+    calling PAPI.
+
+    :param int code: The event code.
+
+    :returns: the description, or ``None`` if the code is not a known preset
+        event.
+    :rtype: str
+    """
+    code &= 0xFFFFFFFF
+    if code & 0xC0000000 != 0x80000000:
+        return None
+    index = code & PAPI_PRESET_AND_MASK
+    return _PRESET_DESCRIPTIONS[index] if index < len(_PRESET_DESCRIPTIONS) else None
+
+
+def _preset_event_enum():
+    import enum
+
+    class _PresetEvent(enum.IntEnum):
+        @property
+        def description(self):
+            """The description of the preset event."""
+            return preset_description(self)
+
+    return _PresetEvent(
+        "PresetEvent",
+        [(name, globals()[name]) for name in _PRESET_NAMES if name],
+        module=__name__,
+    )
+
+
+def __getattr__(name):
+    # The PresetEvent IntEnum (members with a description attribute) is only
+    # built when it is first used
+    if name == "PresetEvent":
+        global PresetEvent
+        PresetEvent = _preset_event_enum()
+        return PresetEvent
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
@@ -183,6 +183,19 @@ class PapiCombinationError(PapiError):
     c_value = lib.PAPI_ECOMBO
 
 
+class PapiForkedEventSetError(PapiNoEventSetError):
+    """The EventSet was inherited from the parent process by fork() and cannot
+    be used in the child process."""
+
+
+def raise_papi_error(rcode):
+    """Raise the PAPI exception matching the given (negative) return code."""
+    for name, object_ in globals().items():
+        if object_ and hasattr(object_, "c_value") and object_.c_value == rcode:
+            raise object_()
+    raise PapiMiscellaneousError()
+
+
 def papi_error(function):
     """Decorator to raise PAPI errors."""
 
@@ -190,12 +203,7 @@ def papi_error(function):
     def papi_error_wrapper(*args, **kwargs):
         rcode, rvalue = function(*args, **kwargs)
         if rcode < 0:
-            for name, object_ in globals().items():
-                if (
-                    object_ and hasattr(object_, "c_value") and object_.c_value == rcode
-                ):  # noqa
-                    raise object_()
-            raise PapiMiscellaneousError()
+            raise_papi_error(rcode)
         return rvalue
 
     return papi_error_wrapper
@@ -0,0 +1,224 @@
+"""
+Bounded-memory histograms of counter values.
+
+A :py:class:`Histogram` counts non-negative integers (e.g. the cycles of a
+request) in HDR-style log-linear buckets: each power of two is divided into
+``2 ** (precision - 1)`` buckets of equal width, so percentiles are estimated
+with a bounded relative error (at most 6.25% with the default precision),
+whatever the magnitude of the values. Recording a value is O(1), the memory
+used does not depend on the number of values, and histograms can be merged
+(e.g. across threads, or across processes with
+:py:meth:`~Histogram.to_dict`).
+
+Example::
+
+    from pypapi.histogram import Histogram
+
+    histogram = Histogram()
+    for value in values:
+        histogram.record(value)
+
+    p50, p99, p999 = histogram.percentiles([50, 99, 99.9])
+    print(histogram.count, histogram.mean, p50, p99, p999)
+
+See also :py:class:`pypapi.profiler.RegionProfiler`, which can record the
+counts of each call of a region in histograms.
+"""
+
+from array import array
+
+
+#: Default number of significant bits of the buckets
+DEFAULT_PRECISION = 5
+
+
+class Histogram:
+    """Histogram of non-negative integers, with log-linear buckets. Negative
+    values are recorded as zero.
+
+    Values below ``2 ** precision`` have their own bucket; larger values
+    share a bucket with the values that have the same ``precision`` most
+    significant bits.
+
+    :param int precision: The number of significant bits of the buckets
+        (between 1 and 16). The relative width of the buckets is at most
+        ``2 ** (1 - precision)``.
+
+    :raises ValueError: The precision is out of range.
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 1 <= precision <= 16:
+            raise ValueError("precision must be between 1 and 16")
+        #: The number of significant bits of the buckets
+        self.precision = precision
+        #: The number of values per bucket (grown when needed)
+        self.buckets = array("q")
+        #: The number of recorded values
+        self.count = 0
+        #: The sum of the recorded values
+        self.total = 0
+        #: The smallest recorded value (``None`` if empty)
+        self.min = None
+        #: The largest recorded value (``None`` if empty)
+        self.max = None
+        self._linear = 1 << precision
+        self._half = self._linear >> 1
+
+    def __repr__(self):
+        return "Histogram(count=%i, min=%s, max=%s)" % (self.count, self.min, self.max)
+
+    def _index(self, value):
+        if value < self._linear:
+            return value
+        shift = value.bit_length() - self.precision
+        return self._linear + (shift - 1) * self._half + (value >> shift) - self._half
+
+    def _bounds(self, index):
+        # Lowest and highest values of a bucket
+        if index < self._linear:
+            return index, index
+        shift, sub = divmod(index - self._linear, self._half)
+        shift += 1
+        low = (sub + self._half) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, value, count=1):
+        """Records a value.
+
+        :param int value: The value.
+        :param int count: The number of times the value is recorded.
+        """
+        value = max(int(value), 0)
+        index = self._index(value)
+        buckets = self.buckets
+        if index >= len(buckets):
+            buckets.extend([0] * (index + 1 - len(buckets)))
+        buckets[index] += count
+        self.count += count
+        self.total += value * count
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        """The mean of the recorded values (``None`` if empty)."""
+        return self.total / self.count if self.count else None
+
+    def percentiles(self, percentiles):
+        """Estimates several percentiles of the recorded values (in one pass
+        over the buckets): the highest value of the bucket that contains each
+        of them (within the recorded minimum and maximum).
+
+        :param list(float) percentiles: The percentiles (between 0 and 100,
+            e.g. ``[50, 99, 99.9]``).
+
+        :returns: the estimates (``None`` if empty), in the same order.
+        :rtype: list(int)
+        """
+        if not self.count:
+            return [None] * len(percentiles)
+        ranks = sorted(
+            (max(percentile / 100 * self.count, 1), position)
+            for position, percentile in enumerate(percentiles)
+        )
+        results = [self.max] * len(percentiles)
+        seen = 0
+        index = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            while index < len(ranks) and seen >= ranks[index][0]:
+                high = self._bounds(bucket)[1]
+                results[ranks[index][1]] = max(min(high, self.max), self.min)
+                index += 1
+            if index == len(ranks):
+                break
+        return results
+
+    def percentile(self, percentile):
+        """Estimates a percentile of the recorded values (see
+        :py:meth:`percentiles`).
+
+        :param float percentile: The percentile (between 0 and 100).
+
+        :returns: the estimate (``None`` if empty).
+        :rtype: int
+        """
+        return self.percentiles([percentile])[0]
+
+    def merge(self, other):
+        """Adds the values of another histogram to this one.
+
+        :param Histogram other: The other histogram.
+
+        :raises ValueError: The histograms have different precisions.
+        """
+        if other.precision != self.precision:
+            raise ValueError("cannot merge histograms of different precisions")
+        if not other.count:
+            return
+        buckets = self.buckets
+        if len(other.buckets) > len(buckets):
+            buckets.extend([0] * (len(other.buckets) - len(buckets)))
+        for index, count in enumerate(other.buckets):
+            buckets[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def copy(self):
+        """Returns a copy of the histogram.
+
+        :rtype: Histogram
+        """
+        histogram = Histogram(self.precision)
+        histogram.merge(self)
+        return histogram
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation of the histogram.
+
+        :rtype: dict
+        """
+        return {
+            "precision": self.precision,
+            "buckets": self.buckets.tolist(),
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a histogram from the output of :py:meth:`to_dict`.
+
+        :rtype: Histogram
+        """
+        histogram = cls(data["precision"])
+        histogram.buckets = array("q", data["buckets"])
+        histogram.count = data["count"]
+        histogram.total = data["total"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        return histogram
+
+
+def merge(histograms):
+    """Merges histograms (e.g. the histograms of the same region in several
+    threads or processes) into a new histogram.
+
+    :param list(Histogram) histograms: The histograms (at least one).
+
+    :rtype: Histogram
+
+    :raises ValueError: The histograms have different precisions.
+    """
+    histograms = list(histograms)
+    merged = Histogram(histograms[0].precision)
+    for histogram in histograms:
+        merged.merge(histogram)
+    return merged
@@ -0,0 +1,244 @@
+"""
+NumPy counter matrices.
+
+A :py:class:`CounterMatrix` stores counter samples as the rows of a
+``numpy.int64`` matrix (one column per event). Samples are appended in
+amortized constant time (the storage doubles when it is full) and can be read
+from PAPI directly into the next row, so no Python object is created per
+sample.
+
+.. NOTE::
+
+    This module requires NumPy, which is not a dependency of PyPAPI::
+
+        pip install numpy
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi import events
+    from pypapi.matrix import CounterMatrix
+
+    papi.library_init()
+
+    evs = papi.create_eventset()
+    papi.add_events(evs, [events.PAPI_TOT_INS, events.PAPI_TOT_CYC])
+    papi.start(evs)
+
+    matrix = CounterMatrix.from_eventset(evs)
+    for chunk in chunks:
+        process(chunk)
+        matrix.read(evs)
+
+    papi.stop(evs)
+
+    print(matrix.names)
+    print(matrix.diff())  # counts per chunk
+    print(matrix.rates())  # counts per second
+    print(matrix.rates(per="PAPI_TOT_CYC"))  # counts per cycle
+
+See also the ``numpy`` argument of :py:func:`~pypapi.papi_low.read`,
+:py:func:`~pypapi.papi_low.stop` and :py:func:`~pypapi.papi_low.accum` to get
+their results as NumPy arrays.
+"""
+
+import time
+
+import numpy
+
+from ._papi import lib, ffi
+from .exceptions import raise_papi_error
+from .papi_low import list_events, num_events, event_code_to_name, _check_eventset
+
+
+class CounterMatrix:
+    """Growable matrix of counter samples.
+
+    :param list events: The events of the columns (event codes or names).
+    :param int capacity: The initial number of rows.
+    """
+
+    def __init__(self, events, capacity=1024):
+        #: The names of the events (the labels of the columns)
+        self.names = [
+            event if isinstance(event, str) else event_code_to_name(event)
+            for event in events
+        ]
+        self._data = numpy.zeros((max(capacity, 1), len(self.names)), numpy.int64)
+        self._timestamps = numpy.zeros(max(capacity, 1), numpy.float64)
+        self._size = 0
+        self._pointer = ffi.cast("long long *", ffi.from_buffer(self._data))
+
+    @classmethod
+    def from_eventset(cls, eventSet, capacity=1024):
+        """Creates an empty matrix with one column per event of an event set.
+
+        :param int eventSet: An integer handle for a PAPI Event Set as created
+            by :py:func:`~pypapi.papi_low.create_eventset`.
+        :param int capacity: The initial number of rows.
+
+        :rtype: CounterMatrix
+        """
+        return cls(list_events(eventSet), capacity)
+
+    def __len__(self):
+        return self._size
+
+    def _check_columns(self, eventSet):
+        # PAPI writes one value per event of the event set into the row
+        count = num_events(eventSet)
+        if count != len(self.names):
+            raise ValueError(
+                "The event set has %i events but the matrix has %i columns"
+                % (count, len(self.names))
+            )
+
+    def __repr__(self):
+        return "CounterMatrix(%s, rows=%i)" % (", ".join(self.names), self._size)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.data
+        return self.data.astype(dtype)
+
+    @property
+    def data(self):
+        """The samples (a view of the ``(rows, events)`` matrix).
+
+        :rtype: numpy.ndarray
+        """
+        return self._data[: self._size]
+
+    @property
+    def timestamps(self):
+        """The time (in seconds, from :py:func:`time.perf_counter`) at which
+        each sample was appended.
+
+        :rtype: numpy.ndarray
+        """
+        return self._timestamps[: self._size]
+
+    def column(self, name):
+        """Returns the samples of an event.
+
+        :param str name: The name of the event.
+
+        :rtype: numpy.ndarray
+
+        :raises KeyError: There is no column for this event.
+        """
+        if name not in self.names:
+            raise KeyError(name)
+        return self.data[:, self.names.index(name)]
+
+    def _reserve(self, rows):
+        capacity = len(self._data)
+        if self._size + rows <= capacity:
+            return
+        while capacity < self._size + rows:
+            capacity *= 2
+        data = numpy.zeros((capacity, len(self.names)), numpy.int64)
+        data[: self._size] = self.data
+        timestamps = numpy.zeros(capacity, numpy.float64)
+        timestamps[: self._size] = self.timestamps
+        self._data = data
+        self._timestamps = timestamps
+        self._pointer = ffi.cast("long long *", ffi.from_buffer(self._data))
+
+    def append(self, values, timestamp=None):
+        """Appends a sample.
+
+        :param list(int) values: One value per event.
+        :param float timestamp: The time of the sample in seconds (default:
+            now).
+        """
+        self._reserve(1)
+        self._data[self._size] = values
+        self._timestamps[self._size] = (
+            time.perf_counter() if timestamp is None else timestamp
+        )
+        self._size += 1
+
+    def extend(self, rows, timestamps=None):
+        """Appends several samples.
+
+        :param rows: A ``(n, events)`` array-like of samples.
+        :param timestamps: The times of the samples in seconds (default:
+            now).
+        """
+        rows = numpy.asarray(rows, numpy.int64).reshape(-1, len(self.names))
+        self._reserve(len(rows))
+        end = self._size + len(rows)
+        self._data[self._size : end] = rows
+        self._timestamps[self._size : end] = (
+            time.perf_counter() if timestamps is None else timestamps
+        )
+        self._size = end
+
+    def read(self, eventSet):
+        """Reads the counters of a running event set into a new row.
+
+        :param int eventSet: An integer handle for a PAPI Event Set as created
+            by :py:func:`~pypapi.papi_low.create_eventset`, with the events of
+            the columns.
+
+        :raises ValueError: The event set does not have one event per column.
+        """
+        _check_eventset(eventSet)
+        self._check_columns(eventSet)
+        self._reserve(1)
+        rcode = lib.PAPI_read(eventSet, self._pointer + self._size * len(self.names))
+        if rcode < 0:
+            raise_papi_error(rcode)
+        self._timestamps[self._size] = time.perf_counter()
+        self._size += 1
+
+    def accum(self, eventSet):
+        """Appends a row with the counts since the last call (or since the
+        event set was started or reset) and resets the counters.
+
+        :param int eventSet: An integer handle for a PAPI Event Set as created
+            by :py:func:`~pypapi.papi_low.create_eventset`, with the events of
+            the columns.
+
+        :raises ValueError: The event set does not have one event per column.
+        """
+        _check_eventset(eventSet)
+        self._check_columns(eventSet)
+        self._reserve(1)
+        self._data[self._size] = 0
+        rcode = lib.PAPI_accum(eventSet, self._pointer + self._size * len(self.names))
+        if rcode < 0:
+            raise_papi_error(rcode)
+        self._timestamps[self._size] = time.perf_counter()
+        self._size += 1
+
+    def clear(self):
+        """Removes all the samples (the storage is kept)."""
+        self._size = 0
+
+    def diff(self):
+        """Returns the differences between consecutive samples (the counts
+        between two reads).
+
+        :rtype: numpy.ndarray
+        """
+        return numpy.diff(self.data, axis=0)
+
+    def rates(self, per=None):
+        """Returns the rate of each event between consecutive samples.
+
+        :param str per: The name of the event to divide by (e.g.
+            ``"PAPI_TOT_CYC"`` to get counts per cycle). By default, the
+            counts are divided by the elapsed time (counts per second).
+
+        :rtype: numpy.ndarray (of floats, ``nan`` where the divisor is zero)
+        """
+        if per is None:
+            divisor = numpy.diff(self.timestamps)
+        else:
+            divisor = numpy.diff(self.column(per))
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            rates = self.diff() / divisor[:, numpy.newaxis]
+        rates[divisor == 0] = numpy.nan
+        return rates
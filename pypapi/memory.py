@@ -0,0 +1,225 @@
+"""
+Lightweight memory usage tracking.
+
+:py:func:`~pypapi.papi_low.get_dmem_info` converts the 12 fields of the
+``PAPI_dmem_info_t`` structure to Python on each call. A
+:py:class:`MemoryTracker` only reads the requested fields (e.g. the resident
+set size, its high water mark and the heap size) from a buffer allocated once,
+so it can sample the memory usage at a high frequency:
+
+* samples are stored in a ring buffer (the most recent ``capacity`` samples
+  are kept), either on demand (:py:meth:`~MemoryTracker.sample`) or by a
+  background thread (:py:meth:`~MemoryTracker.start`),
+* regions (:py:meth:`~MemoryTracker.region`) get the memory usage delta
+  between their start and their end, and the peak usage over the samples taken
+  meanwhile.
+
+The values are in kilobytes, as reported by PAPI (except ``pagesize``, in
+bytes, and ``pte``).
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.memory import MemoryTracker
+
+    papi.library_init()
+
+    tracker = MemoryTracker(["resident", "heap"])
+    tracker.start(interval=0.001)  # background sampling every millisecond
+
+    with tracker.region("load") as region:
+        data = load()
+    print(region.result.delta["resident"], region.result.peak["resident"])
+
+    tracker.stop()
+    for sample in tracker.samples():
+        print(sample.timestamp, sample.values)
+"""
+
+import threading
+import time
+from array import array
+from collections import namedtuple
+
+from ._papi import lib
+from .exceptions import raise_papi_error
+from .structs import DMEM_info
+
+
+#: A sample: its time (in seconds, from :py:func:`time.perf_counter`) and the
+#: values of the tracked fields (a tuple, in the order of
+#: :py:attr:`MemoryTracker.fields`).
+MemorySample = namedtuple("MemorySample", "timestamp values")
+
+#: Memory usage of a region: its name, its duration (seconds), and the
+#: values at its start and end, their difference, and the peak values over the
+#: samples taken during the region (dicts indexed by field name).
+MemoryRegion = namedtuple("MemoryRegion", "name seconds start end delta peak")
+
+#: The fields of ``PAPI_dmem_info_t``
+FIELDS = tuple(DMEM_info.fields)
+
+DEFAULT_FIELDS = ("resident", "high_water_mark", "heap")
+
+
+class Region:
+    """A region being tracked (see :py:meth:`MemoryTracker.region`)."""
+
+    def __init__(self, tracker, name):
+        self._tracker = tracker
+        #: The name of the region
+        self.name = name
+        #: The memory usage of the region, available when it is left
+        self.result = None
+
+    def __enter__(self):
+        self._first = self._tracker._count
+        self._start = self._tracker.sample()
+        return self
+
+    def __exit__(self, *exc_info):
+        tracker = self._tracker
+        end = tracker.sample()
+        peak = list(self._start.values)
+        for sample in tracker._samples_since(self._first):
+            peak = [max(a, b) for a, b in zip(peak, sample.values)]
+        fields = tracker.fields
+        self.result = MemoryRegion(
+            self.name,
+            end.timestamp - self._start.timestamp,
+            dict(zip(fields, self._start.values)),
+            dict(zip(fields, end.values)),
+            {
+                field: after - before
+                for field, before, after in zip(fields, self._start.values, end.values)
+            },
+            dict(zip(fields, peak)),
+        )
+        tracker.regions.append(self.result)
+
+
+class MemoryTracker:
+    """Samples some fields of the dynamic memory usage information of PAPI
+    into a ring buffer.
+
+    :param list(str) fields: The fields to track (see :py:data:`FIELDS`).
+    :param int capacity: The number of samples kept in the ring buffer.
+
+    :raises ValueError: A field does not exist.
+    """
+
+    def __init__(self, fields=DEFAULT_FIELDS, capacity=4096):
+        for field in fields:
+            if field not in FIELDS:
+                raise ValueError("unknown PAPI_dmem_info_t field: %s" % field)
+        #: The tracked fields
+        self.fields = tuple(fields)
+        #: The number of samples kept in the ring buffer
+        self.capacity = max(capacity, 1)
+        #: The tracked regions
+        self.regions = []
+        self._info = DMEM_info.alloc_empty()
+        self._width = len(self.fields)
+        self._values = array("q", bytes(8 * self.capacity * self._width))
+        self._timestamps = array("d", bytes(8 * self.capacity))
+        self._count = 0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def read(self):
+        """Reads the tracked fields (without storing a sample).
+
+        :returns: the values, in the order of :py:attr:`fields`.
+        :rtype: tuple(int)
+
+        :raises PapiComponentError: The function is not implemented for the
+            current component.
+        :raises PapiSystemError: A system error occurred.
+        """
+        rcode = lib.PAPI_get_dmem_info(self._info)
+        if rcode < 0:
+            raise_papi_error(rcode)
+        info = self._info
+        return tuple(getattr(info, field) for field in self.fields)
+
+    def sample(self):
+        """Reads the tracked fields and stores them in the ring buffer.
+
+        :rtype: MemorySample
+        """
+        with self._lock:
+            values = self.read()
+            timestamp = time.perf_counter()
+            index = self._count % self.capacity
+            offset = index * self._width
+            self._values[offset : offset + self._width] = array("q", values)
+            self._timestamps[index] = timestamp
+            self._count += 1
+        return MemorySample(timestamp, values)
+
+    def _sample_at(self, count):
+        index = count % self.capacity
+        offset = index * self._width
+        return MemorySample(
+            self._timestamps[index],
+            tuple(self._values[offset : offset + self._width]),
+        )
+
+    def _samples_since(self, first):
+        with self._lock:
+            first = max(first, self._count - self.capacity)
+            return [self._sample_at(count) for count in range(first, self._count)]
+
+    def samples(self):
+        """Returns the samples of the ring buffer, oldest first.
+
+        :rtype: list(MemorySample)
+        """
+        return self._samples_since(0)
+
+    def clear(self):
+        """Removes all the samples and regions."""
+        with self._lock:
+            self._count = 0
+        self.regions = []
+
+    def region(self, name):
+        """Returns a context manager that tracks the memory usage of a region.
+        Regions can be nested.
+
+        :param str name: The name of the region.
+
+        :rtype: Region
+        """
+        return Region(self, name)
+
+    def _run(self, interval):
+        while not self._stopping.wait(interval):
+            self.sample()
+
+    def start(self, interval=0.01):
+        """Starts sampling in a background thread.
+
+        :param float interval: The time between two samples, in seconds.
+
+        :raises RuntimeError: The background sampling is already running.
+        """
+        if self._thread is not None:
+            raise RuntimeError("the background sampling is already running")
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), name="pypapi-memory", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stops the background sampling."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join()
+        self._thread = None
@@ -0,0 +1,127 @@
+"""
+Derived metrics computed from PAPI preset events.
+
+A derived metric is a ratio of two event counts (optionally scaled), like the
+number of instructions per cycle (``PAPI_TOT_INS / PAPI_TOT_CYC``). Defining
+them here ensures that every tool built on PyPAPI (the command line interface,
+the profilers, the pytest plugin...) uses the same definitions.
+
+Example::
+
+    from pypapi import metrics
+
+    values = {"PAPI_TOT_INS": 2000000, "PAPI_TOT_CYC": 1000000}
+    print(metrics.compute_metrics(values))  # {'IPC': 2.0}
+"""
+
+from collections import namedtuple
+
+
+#: A derived metric: ``scale * numerator / denominator``, where ``numerator``
+#: and ``denominator`` are event names.
+DerivedMetric = namedtuple(
+    "DerivedMetric", "name numerator denominator scale description"
+)
+
+#: All the derived metrics known by PyPAPI.
+DERIVED_METRICS = [
+    DerivedMetric("IPC", "PAPI_TOT_INS", "PAPI_TOT_CYC", 1, "instructions per cycle"),
+    DerivedMetric("CPI", "PAPI_TOT_CYC", "PAPI_TOT_INS", 1, "cycles per instruction"),
+    DerivedMetric(
+        "BR_MSP_RATIO",
+        "PAPI_BR_MSP",
+        "PAPI_BR_CN",
+        1,
+        "mispredicted conditional branches ratio",
+    ),
+    DerivedMetric(
+        "L1_DCM_RATIO",
+        "PAPI_L1_DCM",
+        "PAPI_L1_DCA",
+        1,
+        "level 1 data cache miss ratio",
+    ),
+    DerivedMetric(
+        "L2_TCM_RATIO",
+        "PAPI_L2_TCM",
+        "PAPI_L2_TCA",
+        1,
+        "level 2 cache miss ratio",
+    ),
+    DerivedMetric(
+        "L3_TCM_RATIO",
+        "PAPI_L3_TCM",
+        "PAPI_L3_TCA",
+        1,
+        "level 3 cache miss ratio",
+    ),
+    DerivedMetric(
+        "L1_DCM_PKI",
+        "PAPI_L1_DCM",
+        "PAPI_TOT_INS",
+        1000,
+        "level 1 data cache misses per thousand instructions",
+    ),
+    DerivedMetric(
+        "L2_TCM_PKI",
+        "PAPI_L2_TCM",
+        "PAPI_TOT_INS",
+        1000,
+        "level 2 cache misses per thousand instructions",
+    ),
+    DerivedMetric(
+        "L3_TCM_PKI",
+        "PAPI_L3_TCM",
+        "PAPI_TOT_INS",
+        1000,
+        "level 3 cache misses per thousand instructions",
+    ),
+    DerivedMetric(
+        "FLOPS_PER_CYCLE",
+        "PAPI_FP_OPS",
+        "PAPI_TOT_CYC",
+        1,
+        "floating point operations per cycle",
+    ),
+    DerivedMetric(
+        "STALL_RATIO",
+        "PAPI_RES_STL",
+        "PAPI_TOT_CYC",
+        1,
+        "ratio of cycles stalled on any resource",
+    ),
+]
+
+
+def compute_metric(metric, values):
+    """Computes a derived metric.
+
+    :param DerivedMetric metric: the metric to compute.
+    :param dict values: event counts, indexed by event name.
+
+    :returns: the value of the metric, or ``None`` if one of the required
+        events is missing or if the denominator is zero.
+    :rtype: float
+    """
+    numerator = values.get(metric.numerator)
+    denominator = values.get(metric.denominator)
+    if numerator is None or not denominator:
+        return None
+    return metric.scale * numerator / denominator
+
+
+def compute_metrics(values):
+    """Computes all the derived metrics that can be computed from the given
+    event counts.
+
+    :param dict values: event counts, indexed by event name.
+
+    :returns: the metric values, indexed by metric name.
+    :rtype: dict
+    """
+    result = {}
+    for metric in DERIVED_METRICS:
+        value = compute_metric(metric, values)
+        if value is not None:
+            result[metric.name] = value
+    return result
@@ -0,0 +1,495 @@
+"""
+Per-request hardware counters for WSGI and ASGI applications.
+
+:py:class:`WSGIMiddleware` and :py:class:`ASGIMiddleware` count the events of
+each request (instructions, cycles and cache misses by default) and aggregate
+them per route in bounded-memory histograms (see :py:mod:`pypapi.histogram`),
+to find the endpoints that are CPU-inefficient rather than just slow.
+
+* The counters are read from a long-lived, always-running event set per
+  thread (see :py:func:`pypapi.benchmark.get_eventset`), at the start and at
+  the end of the request. The event set is acquired again for each measured
+  request, as other users of :py:func:`~pypapi.benchmark.get_eventset` in the
+  thread (e.g. :py:func:`pypapi.benchmark.measure` in a handler) stop it; a
+  request during which it was stopped is counted but not measured.
+* With ASGI, several requests run concurrently in the thread of the event
+  loop, so only the steps of the request's own task are counted (the counters
+  are read around each step of the application coroutine, not while it
+  awaits). Work offloaded to other threads (synchronous endpoints run in a
+  thread pool, ``run_in_executor()``...) is not counted.
+* Only one request in ``sample_rate`` is measured, to keep the overhead
+  controllable.
+* The events are checked when the middleware is created. Counter failures
+  while serving never fail a request: the request is then counted but not
+  measured.
+* Requests are aggregated by route. By default, the route template of the
+  framework is used when the application exposes it (``scope["route"]`` in
+  Starlette and FastAPI), and the identifier-like segments of the path
+  (numbers, UUIDs, long hexadecimal strings) are replaced by ``{id}``
+  otherwise (see :py:func:`default_route`). A ``route`` callable should be
+  given for other URL schemes.
+* The number of routes is bounded (``max_routes``): the requests of new routes
+  beyond this limit are aggregated in the ``"<other>"`` route.
+
+The summaries are available through :py:meth:`CounterStats.summary`, and can
+be exported in the Prometheus text format by the middleware itself (on
+``metrics_path``) or with :py:meth:`CounterStats.to_prometheus`.
+
+Example with a WSGI application::
+
+    from pypapi import papi_low as papi
+    from pypapi.middleware import WSGIMiddleware
+
+    papi.library_init()
+
+    app = WSGIMiddleware(app, sample_rate=10, metrics_path="/papi-metrics")
+
+    # Later
+    for route, summary in app.stats.summary().items():
+        print(route, summary["events"]["PAPI_TOT_CYC"]["p99"])
+
+Example with an ASGI application::
+
+    from pypapi.middleware import ASGIMiddleware
+
+    app = ASGIMiddleware(app, events=["PAPI_TOT_INS", "PAPI_TOT_CYC"])
+
+.. NOTE::
+
+    PAPI thread support is initialized with
+    :py:func:`~pypapi.papi_low.init_thread_support` when the first middleware
+    is created, so :py:func:`~pypapi.papi_low.library_init` must be called
+    first.
+"""
+
+import itertools
+import re
+import threading
+
+from . import papi_low as papi
+from .benchmark import get_eventset
+from .consts import PAPI_RUNNING
+from .exceptions import PapiError
+from .histogram import Histogram
+
+
+DEFAULT_EVENTS = ("PAPI_TOT_INS", "PAPI_TOT_CYC", "PAPI_L3_TCM")
+
+#: Percentiles of the summaries
+PERCENTILES = (50, 90, 99, 99.9)
+
+#: Route of the requests beyond ``max_routes``
+OTHER_ROUTE = "<other>"
+
+_ID_SEGMENT = re.compile(
+    r"^([0-9]+|[0-9a-fA-F]{16,}|"
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})$"
+)
+
+
+def default_route(method, path):
+    """Returns the route of a request: its method and path, where the
+    identifier-like segments (numbers, UUIDs and hexadecimal strings of 16
+    digits or more) are replaced by ``{id}`` (e.g. ``"GET /users/{id}"`` for
+    ``/users/42``).
+
+    :rtype: str
+    """
+    segments = [
+        "{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/")
+    ]
+    return "%s %s" % (method, "/".join(segments))
+
+
+def _route_template(scope):
+    # Route template of the matched route in Starlette and FastAPI (set in the
+    # scope by their router)
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None)
+
+
+class CounterStats:
+    """Counter histograms per route and event.
+
+    :param list(str) names: The names of the events.
+    :param int max_routes: The maximum number of routes.
+    """
+
+    def __init__(self, names, max_routes=1000):
+        #: The names of the events
+        self.names = list(names)
+        #: The maximum number of routes
+        self.max_routes = max_routes
+        self._routes = {}
+        self._requests = {}
+        self._lock = threading.Lock()
+
+    def _histograms(self, route):
+        histograms = self._routes.get(route)
+        if histograms is None:
+            if len(self._routes) >= self.max_routes:
+                route = OTHER_ROUTE
+                histograms = self._routes.get(route)
+            if histograms is None:
+                histograms = [Histogram() for _ in self.names]
+                self._routes[route] = histograms
+                self._requests[route] = 0
+        return route, histograms
+
+    def count_request(self, route):
+        """Counts a request that is not measured (not sampled)."""
+        with self._lock:
+            route, _ = self._histograms(route)
+            self._requests[route] += 1
+
+    def record(self, route, values):
+        """Records the counts of a measured request.
+
+        :param str route: The route of the request.
+        :param list(int) values: One count per event.
+        """
+        with self._lock:
+            route, histograms = self._histograms(route)
+            self._requests[route] += 1
+            for histogram, value in zip(histograms, values):
+                histogram.record(value)
+
+    def histograms(self):
+        """Returns a copy of the histograms.
+
+        :returns: one histogram per event (in the order of :py:attr:`names`),
+            indexed by route.
+        :rtype: dict(str, list(Histogram))
+        """
+        with self._lock:
+            return {
+                route: [histogram.copy() for histogram in histograms]
+                for route, histograms in self._routes.items()
+            }
+
+    def summary(self):
+        """Returns the summary of each route: the number of requests, the
+        number of measured requests, and the mean, percentiles (see
+        :py:data:`PERCENTILES`) and maximum of each event.
+
+        :rtype: dict
+        """
+        with self._lock:
+            requests = dict(self._requests)
+        summary = {}
+        for route, histograms in self.histograms().items():
+            events = {}
+            for name, histogram in zip(self.names, histograms):
+                events[name] = {"mean": histogram.mean, "max": histogram.max}
+                values = histogram.percentiles(PERCENTILES)
+                for percentile, value in zip(PERCENTILES, values):
+                    events[name]["p%g" % percentile] = value
+            summary[route] = {
+                "requests": requests[route],
+                "measured": histograms[0].count if histograms else 0,
+                "events": events,
+            }
+        return summary
+
+    def to_prometheus(self, prefix="papi"):
+        """Formats the summaries in the Prometheus text exposition format (one
+        ``summary`` metric per event, labelled by route).
+
+        :param str prefix: The prefix of the metric names.
+
+        :rtype: str
+        """
+        lines = []
+        histograms = self.histograms()
+        for index, name in enumerate(self.names):
+            event = re.sub("[^a-z0-9_]+", "_", name.lower())
+            if event.startswith("papi_"):
+                event = event[len("papi_") :]
+            metric = "%s_%s" % (prefix, event)
+            lines.append("# TYPE %s summary" % metric)
+            for route, route_histograms in sorted(histograms.items()):
+                histogram = route_histograms[index]
+                label = route.replace("\\", "\\\\").replace('"', '\\"')
+                values = histogram.percentiles(PERCENTILES)
+                for percentile, value in zip(PERCENTILES, values):
+                    lines.append(
+                        '%s{route="%s",quantile="%g"} %i'
+                        % (metric, label, percentile / 100, value or 0)
+                    )
+                lines.append('%s_sum{route="%s"} %i' % (metric, label, histogram.total))
+                lines.append(
+                    '%s_count{route="%s"} %i' % (metric, label, histogram.count)
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _check_events(eventCodes):
+    # Trial event set, so that unavailable or conflicting events are reported
+    # when the middleware is created rather than in a request
+    eventSet = papi.create_eventset()
+    try:
+        papi.add_events(eventSet, eventCodes)
+    finally:
+        papi.cleanup_eventset(eventSet)
+        papi.destroy_eventset(eventSet)
+
+
+def _read(reader, values):
+    # Reads the counters, and returns whether it succeeded (a counter failure
+    # must not fail the request, and the event set may have been stopped by
+    # another user of get_eventset() in the thread)
+    try:
+        reader.read_into(values)
+        return bool(papi.state(reader.eventSet) & PAPI_RUNNING)
+    except PapiError:
+        return False
+
+
+class _Middleware:
+    def __init__(self, app, events, sample_rate, route, max_routes, metrics_path):
+        papi.init_thread_support()
+        self.app = app
+        self.eventCodes = [
+            papi.event_name_to_code(event) if isinstance(event, str) else event
+            for event in events
+        ]
+        _check_events(self.eventCodes)
+        self.sample_rate = max(int(sample_rate), 1)
+        self.route = route or default_route
+        self.metrics_path = metrics_path
+        self._requests = itertools.count()
+        self._local = threading.local()
+        names = [papi.event_code_to_name(code) for code in self.eventCodes]
+        #: The counter histograms (see :py:class:`CounterStats`)
+        self.stats = CounterStats(names, max_routes)
+
+    def _buffers(self):
+        # Running event set of the current thread and its read buffers, or
+        # (None, None) if the event set cannot be started in this thread. The
+        # event set is shared with the other get_eventset() users of the
+        # thread, which may have stopped it: get_eventset() restarts it
+        try:
+            _, reader = get_eventset(self.eventCodes)
+        except PapiError:
+            return None, None
+        local = self._local
+        if not hasattr(local, "buffers"):
+            local.buffers = [reader.new_values() for _ in range(2)]
+        return reader, local.buffers
+
+    def _sampled(self):
+        return next(self._requests) % self.sample_rate == 0
+
+
+class _WSGIResponse:
+    # Response iterable: the request is measured until the response is closed
+
+    def __init__(self, result, finish):
+        self._result = result
+        self._finish = finish
+
+    def __iter__(self):
+        return iter(self._result)
+
+    def close(self):
+        try:
+            if hasattr(self._result, "close"):
+                self._result.close()
+        finally:
+            self._finish()
+
+
+class WSGIMiddleware(_Middleware):
+    """WSGI middleware counting the events of each request.
+
+    :param app: The WSGI application.
+    :param list events: The events to count (event names or codes).
+    :param int sample_rate: Measure one request out of ``sample_rate``.
+    :param callable route: Returns the route of a request from its method and
+        path (default: :py:func:`default_route`).
+    :param int max_routes: The maximum number of routes.
+    :param str metrics_path: If given, requests to this path get the
+        summaries in the Prometheus text format (see
+        :py:meth:`CounterStats.to_prometheus`).
+    """
+
+    def __init__(
+        self,
+        app,
+        events=DEFAULT_EVENTS,
+        sample_rate=1,
+        route=None,
+        max_routes=1000,
+        metrics_path=None,
+    ):
+        _Middleware.__init__(
+            self, app, events, sample_rate, route, max_routes, metrics_path
+        )
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if self.metrics_path is not None and path == self.metrics_path:
+            body = self.stats.to_prometheus().encode("utf-8")
+            start_response(
+                "200 OK",
+                [
+                    ("Content-Type", "text/plain; version=0.0.4"),
+                    ("Content-Length", str(len(body))),
+                ],
+            )
+            return [body]
+        route = self.route(environ.get("REQUEST_METHOD", ""), path)
+        reader, buffers = self._buffers() if self._sampled() else (None, None)
+        if reader is None or not _read(reader, buffers[0]):
+            self.stats.count_request(route)
+            return self.app(environ, start_response)
+
+        before, after = buffers
+        finished = []
+
+        def finish():
+            if not finished:
+                finished.append(True)
+                if _read(reader, after):
+                    self.stats.record(route, reader.delta(before, after))
+                else:
+                    self.stats.count_request(route)
+
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            finish()
+            raise
+        return _WSGIResponse(result, finish)
+
+
+class _CountedCoroutine:
+    # Runs a coroutine and accumulates the counter deltas of each of its steps
+
+    def __init__(self, coroutine, reader, values):
+        self._coroutine = coroutine
+        self._reader = reader
+        self._values = values
+        # Whether a read failed (the counts are then incomplete)
+        self.failed = False
+
+    def _read(self, values):
+        if not self.failed:
+            self.failed = not _read(self._reader, values)
+
+    def _step(self, before, after):
+        self._read(after)
+        if self.failed:
+            return
+        values = self._values
+        for i in range(len(values)):
+            values[i] += after[i] - before[i]
+
+    def __await__(self):
+        iterator = self._coroutine.__await__()
+        reader = self._reader
+        before = reader.new_values()
+        after = reader.new_values()
+        value = None
+        error = None
+        while True:
+            self._read(before)
+            try:
+                if error is not None:
+                    yielded = iterator.throw(error)
+                else:
+                    yielded = iterator.send(value)
+            except StopIteration as stop:
+                self._step(before, after)
+                return stop.value
+            except BaseException:
+                self._step(before, after)
+                raise
+            self._step(before, after)
+            try:
+                value = yield yielded
+                error = None
+            except GeneratorExit:
+                iterator.close()
+                raise
+            except BaseException as exception:
+                value = None
+                error = exception
+
+
+class ASGIMiddleware(_Middleware):
+    """ASGI middleware counting the events of each HTTP request.
+
+    :param app: The ASGI application.
+    :param list events: The events to count (event names or codes).
+    :param int sample_rate: Measure one request out of ``sample_rate``.
+    :param callable route: Returns the route of a request from its method and
+        path, or from its method and the route template of the framework when
+        there is one (default: :py:func:`default_route`).
+    :param int max_routes: The maximum number of routes.
+    :param str metrics_path: If given, requests to this path get the
+        summaries in the Prometheus text format (see
+        :py:meth:`CounterStats.to_prometheus`).
+
+    .. NOTE::
+
+        Only the work done in the thread of the event loop is counted: the
+        work offloaded to other threads (synchronous endpoints run in a
+        thread pool, ``run_in_executor()``...) is not.
+    """
+
+    def __init__(
+        self,
+        app,
+        events=DEFAULT_EVENTS,
+        sample_rate=1,
+        route=None,
+        max_routes=1000,
+        metrics_path=None,
+    ):
+        _Middleware.__init__(
+            self, app, events, sample_rate, route, max_routes, metrics_path
+        )
+
+    def _route(self, scope):
+        # Called once the application has run, so that the router of the
+        # framework has set the route template
+        path = _route_template(scope) or scope.get("path", "")
+        return self.route(scope.get("method", ""), path)
+
+    async def _metrics(self, send):
+        body = self.stats.to_prometheus().encode("utf-8")
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; version=0.0.4"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope.get("path", "")
+        if self.metrics_path is not None and path == self.metrics_path:
+            return await self._metrics(send)
+        reader, _ = self._buffers() if self._sampled() else (None, None)
+        if reader is None:
+            try:
+                return await self.app(scope, receive, send)
+            finally:
+                self.stats.count_request(self._route(scope))
+
+        values = [0] * reader.count
+        counted = _CountedCoroutine(self.app(scope, receive, send), reader, values)
+        try:
+            return await counted
+        finally:
+            if counted.failed:
+                self.stats.count_request(self._route(scope))
+            else:
+                self.stats.record(self._route(scope), values)
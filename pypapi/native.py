@@ -0,0 +1,252 @@
+"""
+Lazy tree of the native events, with their unit masks and qualifiers.
+
+:py:func:`~pypapi.papi_low.enum_cmp_event` only enumerates the native events
+themselves, and fetches the full information of each of them.
+:py:class:`NativeEventTree` enumerates the events of a component on demand,
+and expands the unit masks (e.g. ``INST_RETIRED:ANY_P``) and the qualifiers
+(e.g. ``INST_RETIRED:u=0``) of an event only when they are requested (see
+:py:func:`~pypapi.papi_low.enum_umasks`). The information of a node
+(description, units...) is also fetched on demand.
+
+The fully qualified names of the enumerated and expanded nodes are indexed as
+they are found, so nodes can be looked up (:py:meth:`NativeEventTree.lookup`)
+and searched (:py:meth:`NativeEventTree.search`) without running
+``papi_native_avail`` and parsing its output: only the first search calls
+PAPI, the next ones only match the names already found.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.native import NativeEventTree
+
+    papi.library_init()
+
+    tree = NativeEventTree()
+    for event in tree:
+        print(event.name)
+
+    event = tree.lookup("INST_RETIRED")
+    for umask in event.umasks:
+        print(umask.name, umask.description)
+    print([qualifier.short_name for qualifier in event.qualifiers])
+
+    for node in tree.search("CACHE.*MISS"):
+        print(node.name)
+"""
+
+import re
+
+from . import papi_low as papi
+from ._papi import ffi, lib
+from .consts import PAPI_ENUM_EVENTS, PAPI_ENUM_FIRST, PAPI_NATIVE_MASK
+
+
+class NativeEvent:
+    """A node of the tree: a native event, or a native event with a unit mask
+    or a qualifier.
+
+    :param NativeEventTree tree: The tree.
+    :param int code: The event code.
+    :param str name: The fully qualified name.
+    :param NativeEvent parent: The event of a unit mask or qualifier.
+    """
+
+    def __init__(self, tree, code, name, parent=None):
+        self._tree = tree
+        #: The event code
+        self.code = code
+        #: The fully qualified name (e.g. ``"INST_RETIRED:ANY_P"``)
+        self.name = name
+        #: The event of a unit mask or qualifier (``None`` for an event)
+        self.parent = parent
+        self._info = None
+        self._umasks = None
+        self._qualifiers = None
+
+    def __repr__(self):
+        return "NativeEvent(%s)" % self.name
+
+    @property
+    def short_name(self):
+        """The name of the node, without the name of its event (e.g.
+        ``"ANY_P"`` or ``"u=0"``)."""
+        if self.parent is None:
+            return self.name
+        return self.name[len(self.parent.name) + 1 :]
+
+    @property
+    def is_qualifier(self):
+        """Whether the node is a qualifier (``name=value``)."""
+        return self.parent is not None and "=" in self.short_name
+
+    @property
+    def info(self):
+        """The information of the node, fetched on first access.
+
+        :rtype: pypapi.structs.EVENT_info
+        """
+        if self._info is None:
+            self._info = papi.get_event_info(self.code)
+        return self._info
+
+    @property
+    def description(self):
+        """The description of the node."""
+        return self.info.long_descr
+
+    def _expand(self):
+        umasks = []
+        qualifiers = []
+        for code in papi.enum_umasks(self.code, self._tree.component):
+            name = papi.event_code_to_name(code)
+            if not name.startswith(self.name + ":"):
+                continue  # Not a suffix of this event (should not happen)
+            node = NativeEvent(self._tree, code, name, self)
+            (qualifiers if node.is_qualifier else umasks).append(node)
+            self._tree._index[name] = node
+        self._umasks = umasks
+        self._qualifiers = qualifiers
+
+    @property
+    def expanded(self):
+        """Whether the unit masks and qualifiers were enumerated."""
+        return self.parent is not None or self._umasks is not None
+
+    @property
+    def umasks(self):
+        """The unit masks of an event, enumerated on first access (empty for
+        a unit mask or a qualifier).
+
+        :rtype: list(NativeEvent)
+        """
+        if self.parent is not None:
+            return []
+        if self._umasks is None:
+            self._expand()
+        return self._umasks
+
+    @property
+    def qualifiers(self):
+        """The qualifiers that apply to the node (the qualifiers of its event
+        for a unit mask), enumerated on first access.
+
+        :rtype: list(NativeEvent)
+        """
+        if self.parent is not None:
+            return [] if self.is_qualifier else self.parent.qualifiers
+        if self._qualifiers is None:
+            self._expand()
+        return self._qualifiers
+
+    def children(self):
+        """Returns the unit masks and the qualifiers of an event.
+
+        :rtype: list(NativeEvent)
+        """
+        return self.umasks + self.qualifiers
+
+
+class NativeEventTree:
+    """The native events of a component, enumerated and expanded on demand.
+
+    :param int component: The index of the component.
+    """
+
+    def __init__(self, component=0):
+        #: The index of the component
+        self.component = component
+        self._events = []
+        self._index = {}
+        self._code_p = None
+        self._complete = False
+
+    def __repr__(self):
+        return "NativeEventTree(component=%i, %i nodes indexed)" % (
+            self.component,
+            len(self._index),
+        )
+
+    def _next_event(self):
+        # Enumerates the next event of the component (None at the end)
+        if self._complete:
+            return None
+        if self._code_p is None:
+            self._code_p = ffi.new("int*", 0 | PAPI_NATIVE_MASK)
+            modifier = PAPI_ENUM_FIRST
+        else:
+            modifier = PAPI_ENUM_EVENTS
+        if lib.PAPI_enum_cmp_event(self._code_p, modifier, self.component) != 0:
+            self._complete = True
+            return None
+        code = self._code_p[0]
+        event = NativeEvent(self, code, papi.event_code_to_name(code))
+        self._events.append(event)
+        self._index[event.name] = event
+        return event
+
+    def __iter__(self):
+        index = 0
+        while True:
+            if index == len(self._events) and self._next_event() is None:
+                return
+            yield self._events[index]
+            index += 1
+
+    def lookup(self, name):
+        """Returns a node from its fully qualified name. The events are only
+        enumerated up to its event, and only the events whose name is a prefix
+        of the name are expanded.
+
+        :param str name: The name (e.g. ``"INST_RETIRED"`` or
+            ``"INST_RETIRED:ANY_P"``).
+
+        :rtype: NativeEvent
+
+        :raises KeyError: The node does not exist.
+        """
+        if name in self._index:
+            return self._index[name]
+        for event in self:
+            if event.name == name:
+                return event
+            if name.startswith(event.name + ":") and not event.expanded:
+                event.children()
+                if name in self._index:
+                    return self._index[name]
+        raise KeyError(name)
+
+    def search(self, pattern, expand=True):
+        """Searches the nodes whose fully qualified name matches a regular
+        expression (case-insensitive). The events are enumerated, and
+        expanded if needed, while the results are iterated.
+
+        :param str pattern: The regular expression (searched anywhere in the
+            names).
+        :param bool expand: Also search the unit masks and qualifiers.
+
+        :returns: the matching nodes, event by event.
+        :rtype: generator(NativeEvent)
+        """
+        regex = re.compile(pattern, re.IGNORECASE)
+        for event in self:
+            if regex.search(event.name):
+                yield event
+            if expand:
+                for node in event.children():
+                    if regex.search(node.name):
+                        yield node
+
+    def names(self, expand=True):
+        """Returns the fully qualified names of the nodes.
+
+        :param bool expand: Also include the unit masks and qualifiers.
+
+        :rtype: list(str)
+        """
+        names = []
+        for event in self:
+            names.append(event.name)
+            if expand:
+                names.extend(node.name for node in event.children())
+        return names
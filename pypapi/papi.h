@@ -60,6 +60,14 @@
 #define PAPI_NATIVE_MASK     0x40000000
 #define PAPI_PRESET_MASK     0x80000000
 
+// Event enumeration modifiers (definitions from papi.h)
+
+#define PAPI_ENUM_EVENTS            0   /**< Always enumerate all events */
+#define PAPI_ENUM_FIRST             1   /**< Enumerate first event (preset or native) */
+#define PAPI_PRESET_ENUM_AVAIL      2   /**< Enumerate events that exist here */
+#define PAPI_NTV_ENUM_UMASKS       15   /**< all individual bits for given group */
+#define PAPI_NTV_ENUM_UMASK_COMBOS 16   /**< all combinations of mask bits for given group */
+
 // Option definitions
 
 #define PAPI_MIN_STR_LEN        64      /* For small strings, like names & stuff */
@@ -76,6 +84,30 @@
 #define PAPI_MH_MAX_LEVELS    6		   /* # descriptors for each TLB or cache level */
 #define PAPI_MAX_MEM_HIERARCHY_LEVELS 	  4
 
+#define PAPI_MH_TYPE_EMPTY    0x0
+#define PAPI_MH_TYPE_INST     0x1
+#define PAPI_MH_TYPE_DATA     0x2
+#define PAPI_MH_TYPE_VECTOR   0x4
+#define PAPI_MH_TYPE_TRACE    0x8
+#define PAPI_MH_TYPE_UNIFIED  0x3   /* (PAPI_MH_TYPE_INST|PAPI_MH_TYPE_DATA) */
+#define PAPI_MH_TYPE_WT       0x00	   /* write-through cache */
+#define PAPI_MH_TYPE_WB       0x10	   /* write-back cache */
+#define PAPI_MH_TYPE_UNKNOWN  0x000
+#define PAPI_MH_TYPE_LRU      0x100
+#define PAPI_MH_TYPE_PSEUDO_LRU 0x200
+#define PAPI_MH_TYPE_TLB      0x1000  /* tlb, not memory cache */
+#define PAPI_MH_TYPE_PREF     0x2000  /* prefetch buffer */
+
+
+// Option codes (for PAPI_set_opt)
+
+#define PAPI_INHERIT      28    /**< Option to set counter inheritance flag */
+
+// Inheritance definitions
+
+#define PAPI_INHERIT_ALL  1     /**< The flag to this to inherit all children's counters */
+#define PAPI_INHERIT_NONE 0     /**< The flag to this to inherit none of the children's counters */
+
 
 // Debug levels
 
@@ -330,6 +362,17 @@ typedef struct _papi_shared_lib_info {
     int count;
 } PAPI_shlib_info_t;
 
+typedef struct _papi_inherit_option {
+    int eventset;
+    int inherit;
+} PAPI_inherit_option_t;
+
+// (only the bound members of the PAPI_option_t union are declared: PAPI only
+// reads the member matching the option)
+typedef union {
+    PAPI_inherit_option_t inherit;
+} PAPI_option_t;
+
 // PAPI HIGH (definitions from papi.h)
 
 int PAPI_hl_region_begin(const char* region); /**< read performance events at the beginning of a region */
@@ -397,7 +440,7 @@ int PAPI_set_domain(int domain); /**< set the default execution domain for new e
 int PAPI_set_cmp_granularity(int granularity, int cidx); /**< set the component specific default granularity for new event sets */
 int PAPI_set_granularity(int granularity); /**<set the default granularity for new event sets */
 int PAPI_set_multiplex(int EventSet); /**< convert a standard event set to a multiplexed event set */
-// int PAPI_set_opt(int option, PAPI_option_t * ptr); /**< change the option settings of the PAPI library or a specific event set */
+int PAPI_set_opt(int option, PAPI_option_t * ptr); /**< change the option settings of the PAPI library or a specific event set */
 // int PAPI_set_thr_specific(int tag, void *ptr); /**< save a pointer as a thread specific stored data structure */
 void PAPI_shutdown(void); /**< finish using PAPI and free all related resources */
 // int PAPI_sprofil(PAPI_sprofil_t * prof, int profcnt, int EventSet, int EventCode, int threshold, int flags); /**< generate hardware counter profiles from multiple code regions */
@@ -406,7 +449,7 @@ int PAPI_state(int EventSet, int *status); /**< return the counting state of an
 int PAPI_stop(int EventSet, long long * values); /**< stop counting hardware events in an event set and return current events */
 char *PAPI_strerror(int); /**< return a pointer to the error name corresponding to a specified error code */
 unsigned long PAPI_thread_id(void); /**< get the thread identifier of the current thread */
-// int PAPI_thread_init(unsigned long (*id_fn) (void)); /**< initialize thread support in the PAPI library */
+int PAPI_thread_init(unsigned long (*id_fn) (void)); /**< initialize thread support in the PAPI library */
 int PAPI_unlock(int); /**< unlock one of two PAPI internal user mutex variables */
 int PAPI_unregister_thread(void); /**< inform PAPI that a previously registered thread is disappearing */
 int PAPI_write(int EventSet, long long * values); /**< write counter values into counters */
@@ -422,3 +465,9 @@ int PAPI_flops_rate(int event, float *rtime, float *ptime, long long * flpops, f
 int PAPI_ipc(float *rtime, float *ptime, long long * ins, float *ipc); /**< gets instructions per cycle, real and processor time */
 int PAPI_epc(int event, float *rtime, float *ptime, long long *ref, long long *core, long long *evt, float *epc); /**< gets (named) events per cycle, real and processor time, reference and core cycles */
 int PAPI_rate_stop(); /**< stops a running event set of a rate function */
+
+// PTHREAD (definitions from pthread.h)
+
+// Thread identifier function given to PAPI_thread_init() (pthread_t is an
+// unsigned long on Linux)
+unsigned long pthread_self(void);
@@ -32,16 +32,29 @@ Simple example::
     <https://github.com/flozz/pypapi/issues>`_.
 """
 
+import os
+import threading
 from ctypes import c_longlong, c_ulonglong
 
 from ._papi import lib, ffi
-from .exceptions import papi_error, PapiError, PapiInvalidValueError
+from .exceptions import (
+    papi_error,
+    PapiError,
+    PapiInvalidValueError,
+    PapiForkedEventSetError,
+)
 from .consts import (
     PAPI_VER_CURRENT,
     PAPI_NULL,
     PAPI_PRESET_MASK,
     PAPI_NATIVE_MASK,
+    PAPI_ENUM_EVENTS,
+    PAPI_ENUM_FIRST,
+    PAPI_NTV_ENUM_UMASKS,
     PAPI_MAX_STR_LEN,
+    PAPI_INHERIT,
+    PAPI_INHERIT_ALL,
+    PAPI_RUNNING,
 )
 from .structs import (
     EVENT_info,
@@ -57,9 +70,133 @@ from .structs import (
 )
 
 
+#: Fork policies (see :py:func:`set_fork_policy`)
+FORK_POLICIES = ("invalidate", "rebuild")
+
+_fork_policy = "invalidate"
+
+# Event sets created by create_eventset() and not destroyed yet
+_eventsets = set()
+
+# Event sets inherited from the parent process that must not be used anymore
+_forked_eventsets = set()
+
+# Whether an event set was running in the forking thread of the parent
+_running_at_fork = False
+
+
+def set_fork_policy(policy):
+    """Sets what happens to the event sets of a process in its children created
+    by ``os.fork()``.
+
+    In the child process, the event sets still refer to the performance
+    counters of the parent process: reading them returns the counts of the
+    parent, and stopping them stops the counters of the parent. PyPAPI
+    registers an ``os.register_at_fork()`` handler that makes the event sets
+    safe in the child:
+
+    * ``"invalidate"`` (default): all the event sets created before the fork
+      are invalid in the child, and using them raises
+      :py:class:`~pypapi.exceptions.PapiForkedEventSetError`. The event sets
+      that were not running are released.
+    * ``"rebuild"``: the event sets that were not running are rebuilt in the
+      child with the same events (and the same handles), so they count the
+      events of the child process. The event sets that were running are
+      invalid, as stopping them would stop the counters of the parent.
+
+    .. WARNING::
+
+        Whatever the policy, an event set that is running when ``fork()`` is
+        called cannot be released in the child: PAPI still considers it as
+        running in the thread that forked, and stopping it (or shutting PAPI
+        down) would stop the counters of the parent process. Starting another
+        event set in that thread of the child then raises
+        :py:class:`~pypapi.exceptions.PapiForkedEventSetError`. To count
+        events in child processes (e.g. pre-forked server workers), stop the
+        event sets of the parent before forking.
+
+    :param str policy: One of :py:data:`FORK_POLICIES`.
+
+    :raises ValueError: The policy is unknown.
+    """
+    global _fork_policy
+    if policy not in FORK_POLICIES:
+        raise ValueError(
+            "unknown fork policy %r (expected one of %s)" % (policy, FORK_POLICIES)
+        )
+    _fork_policy = policy
+
+
+def _rebuild_eventset(eventSet):
+    # Re-adds the events of a stopped event set, returns False on failure
+    count_p = ffi.new("int*", 0)
+    if lib.PAPI_list_events(eventSet, ffi.NULL, count_p) < 0:
+        return False
+    events_p = ffi.new("int[]", max(count_p[0], 1))
+    if lib.PAPI_list_events(eventSet, events_p, count_p) < 0:
+        return False
+    if lib.PAPI_cleanup_eventset(eventSet) < 0:
+        return False
+    return lib.PAPI_add_events(eventSet, events_p, count_p[0]) >= 0
+
+
+def _after_fork_in_child():
+    # Must not raise, and must not stop running event sets (their counters are
+    # shared with the parent process)
+    global _running_at_fork
+    for eventSet in list(_eventsets):
+        state_p = ffi.new("int*", 0)
+        if lib.PAPI_state(eventSet, state_p) < 0:
+            _eventsets.discard(eventSet)
+            continue
+        if state_p[0] & PAPI_RUNNING:
+            _forked_eventsets.add(eventSet)
+            _running_at_fork = True
+            continue
+        if _fork_policy == "rebuild" and _rebuild_eventset(eventSet):
+            continue
+        _forked_eventsets.add(eventSet)
+        _eventsets.discard(eventSet)
+        eventSet_p = ffi.new("int*", eventSet)
+        if lib.PAPI_cleanup_eventset(eventSet) >= 0:
+            lib.PAPI_destroy_eventset(eventSet_p)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _is_running(eventSet):
+    state_p = ffi.new("int*", 0)
+    return lib.PAPI_state(eventSet, state_p) >= 0 and bool(state_p[0] & PAPI_RUNNING)
+
+
+def _check_eventset(eventSet):
+    if eventSet in _forked_eventsets:
+        raise PapiForkedEventSetError(
+            "the event set %i was created before fork() in the parent process"
+            % eventSet
+        )
+
+
+def _values_buffer(eventCount, values=None, numpy=False):
+    # Returns the C array to pass to PAPI and a function returning it as a
+    # list or as a NumPy array (PAPI then writes directly into the array)
+    if not numpy:
+        values_p = ffi.new("long long[]", eventCount if values is None else values)
+        return values_p, lambda: ffi.unpack(values_p, eventCount)
+    from numpy import array, int64, zeros
+
+    if values is None:
+        values_array = zeros(eventCount, dtype=int64)
+    else:
+        values_array = array(values, dtype=int64)
+    return ffi.from_buffer("long long[]", values_array), lambda: values_array
+
+
 # int PAPI_accum(int EventSet, long long * values);
 @papi_error
-def accum(eventSet, values):
+def accum(eventSet, values, numpy=False):
     """Adds the counters of the indicated event set into the array values. The
     counters are zeroed and continue counting after the operation.
 
@@ -67,14 +204,19 @@ def accum(eventSet, values):
         :py:func:`create_eventset`.
     :param list(int) values: A list to hold the counter values of the counting
         events.
+    :param bool numpy: Return a ``numpy.int64`` array instead of a list
+        (PAPI writes directly into the array).
 
-    :rtype: list(int)
+    :rtype: list(int) (or ``numpy.ndarray``)
 
     :raises PapiInvalidValueError: One or more of the arguments is invalid.
     :raises PapiSystemError: A system or C library call failed inside PAPI, see
         the errno variable.
     :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     eventCount_p = ffi.new("int*", 0)
     rcode = lib.PAPI_list_events(eventSet, ffi.NULL, eventCount_p)
 
@@ -90,11 +232,11 @@ def accum(eventSet, values):
             "the event set (%i)" % (len(values), eventCount)
         )
 
-    values = ffi.new("long long[]", values)
+    values_p, result = _values_buffer(eventCount, values, numpy)
 
-    rcode = lib.PAPI_accum(eventSet, values)
+    rcode = lib.PAPI_accum(eventSet, values_p)
 
-    return rcode, ffi.unpack(values, eventCount)
+    return rcode, result()
 
 
 # int PAPI_add_event(int EventSet, int Event);
@@ -117,6 +259,7 @@ def add_event(eventSet, eventCode):
         hardware.
     :raises PapiBugError: Internal error, please send mail to the developers.
     """
+    _check_eventset(eventSet)
     rcode = lib.PAPI_add_event(eventSet, eventCode)
 
     if rcode > 0:
@@ -148,6 +291,7 @@ def add_named_event(eventSet, eventName):
         hardware.
     :raises PapiBugError: Internal error, please send mail to the developers.
     """
+    _check_eventset(eventSet)
     eventName_p = ffi.new("char[]", eventName.encode("ascii"))
     rcode = lib.PAPI_add_named_event(eventSet, eventName_p)
 
@@ -173,6 +317,7 @@ def add_events(eventSet, eventCodes):
         hardware.
     :raises PapiBugError: Internal error, please send mail to the developers.
     """
+    _check_eventset(eventSet)
     number = len(eventCodes)
     eventCodes_p = ffi.new("int[]", eventCodes)
     rcode = lib.PAPI_add_events(eventSet, eventCodes_p, number)
@@ -219,7 +364,10 @@ def attach(eventSet, pid):
     :raises PapiInvalidValueError: One or more of the arguments is invalid.
     :raises PapiNoEventSetError: The event set specified does not exist.
     :raises PapiIsRunningError: The event set is currently counting events.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     rcode = lib.PAPI_attach(eventSet, pid)
     return rcode, None
 
@@ -246,6 +394,7 @@ def cleanup_eventset(eventSet):
         user should turn off profiling on the Events before destroying the
         EventSet to prevent this behavior.
     """
+    _check_eventset(eventSet)
     rcode = lib.PAPI_cleanup_eventset(eventSet)
     return rcode, None
 
@@ -272,9 +421,13 @@ def create_eventset():
         :py:func:`assign_eventset_component` or implicitly by calling
         :py:func:`add_event` or similar routines.
     """
-    eventSet = ffi.new("int*", PAPI_NULL)
-    rcode = lib.PAPI_create_eventset(eventSet)
-    return rcode, ffi.unpack(eventSet, 1)[0]
+    eventSet_p = ffi.new("int*", PAPI_NULL)
+    rcode = lib.PAPI_create_eventset(eventSet_p)
+    eventSet = ffi.unpack(eventSet_p, 1)[0]
+    if rcode >= 0:
+        _eventsets.add(eventSet)
+        _forked_eventsets.discard(eventSet)
+    return rcode, eventSet
 
 
 # int PAPI_detach(int EventSet);
@@ -317,8 +470,11 @@ def destroy_eventset(eventSet):
         user should turn off profiling on the Events before destroying the
         EventSet to prevent this behavior.
     """
+    _check_eventset(eventSet)
     eventSet_p = ffi.new("int*", eventSet)
     rcode = lib.PAPI_destroy_eventset(eventSet_p)
+    if rcode >= 0:
+        _eventsets.discard(eventSet)
     return rcode, None
 
 
@@ -345,26 +501,46 @@ def enum_cmp_event(component):
     events = {"native": [], "preset": []}
 
     eventCode_p = ffi.new("int*", 0 | PAPI_NATIVE_MASK)
-    rcode = lib.PAPI_enum_cmp_event(eventCode_p, 1, component)
+    rcode = lib.PAPI_enum_cmp_event(eventCode_p, PAPI_ENUM_FIRST, component)
     if rcode == 0:
         info = get_event_info(ffi.unpack(eventCode_p, 1)[0])
         events["native"].append(info)
-        while lib.PAPI_enum_cmp_event(eventCode_p, 0, component) == 0:
+        while lib.PAPI_enum_cmp_event(eventCode_p, PAPI_ENUM_EVENTS, component) == 0:
             info = get_event_info(ffi.unpack(eventCode_p, 1)[0])
             events["native"].append(info)
 
     eventCode_p = ffi.new("int*", 0 | PAPI_PRESET_MASK)
-    rcode = lib.PAPI_enum_cmp_event(eventCode_p, 1, component)
+    rcode = lib.PAPI_enum_cmp_event(eventCode_p, PAPI_ENUM_FIRST, component)
     if rcode == 0:
         info = get_event_info(ffi.unpack(eventCode_p, 1)[0])
         events["preset"].append(info)
-        while lib.PAPI_enum_cmp_event(eventCode_p, 0, component) == 0:
+        while lib.PAPI_enum_cmp_event(eventCode_p, PAPI_ENUM_EVENTS, component) == 0:
             info = get_event_info(ffi.unpack(eventCode_p, 1)[0])
             events["preset"].append(info)
 
     return events
 
 
+# int PAPI_enum_cmp_event(int *EventCode, int modifier, int cidx) with PAPI_NTV_ENUM_UMASKS
+def enum_umasks(eventCode, component=0):
+    """Enumerate the unit masks and qualifiers of a native event.
+
+    :param int eventCode: The code of the native event.
+    :param int component: The component of the event.
+
+    :returns: the codes of the event with each of its unit masks and
+        qualifiers (e.g. ``INST_RETIRED:ANY_P`` or ``INST_RETIRED:u=0``), in
+        the order of the component (empty if the component does not
+        enumerate them).
+    :rtype: list(int)
+    """
+    codes = []
+    eventCode_p = ffi.new("int*", eventCode)
+    while lib.PAPI_enum_cmp_event(eventCode_p, PAPI_NTV_ENUM_UMASKS, component) == 0:
+        codes.append(eventCode_p[0])
+    return codes
+
+
 # int PAPI_event_code_to_name(int EventCode, char *out); /**< translate an integer PAPI event code into an ASCII PAPI preset or native name */
 @papi_error
 def event_code_to_name(eventCode):
@@ -426,10 +602,12 @@ def get_dmem_info():
 
 # int PAPI_get_event_info(int EventCode, PAPI_event_info_t * info);
 @papi_error
-def get_event_info(eventCode):
+def get_event_info(eventCode, numpy=False):
     """Get the event's name and description info.
 
     :param int eventCode: event code (preset or native).
+    :param bool numpy: Return the ``code`` and ``name`` arrays as NumPy
+        arrays (see :py:func:`pypapi.structs.to_numpy`).
 
     :returns: event information
     :rtype: EVENT_info
@@ -445,7 +623,7 @@ def get_event_info(eventCode):
     info_p = EVENT_info.alloc_empty()
     rcode = lib.PAPI_get_event_info(eventCode, info_p)
 
-    return rcode, EVENT_info(info_p)
+    return rcode, EVENT_info(info_p, numpy)
 
 
 # const PAPI_exe_info_t *PAPI_get_executable_info(void);
@@ -463,12 +641,15 @@ def get_executable_info():
 
 
 # const PAPI_hw_info_t *PAPI_get_hardware_info(void);
-def get_hardware_info():
+def get_hardware_info(numpy=False):
     """Get information about the system hardware.
     In C, this function returns a pointer to a structure containing information about
     the hardware on which the program runs.
     In Fortran, the values of the structure are returned explicitly.
 
+    :param bool numpy: Return the memory hierarchy levels as a NumPy
+        structured array (see :py:func:`pypapi.structs.to_numpy`).
+
     :returns: hardware information
     :rtype: HARDWARE_info
 
@@ -476,7 +657,7 @@ def get_hardware_info():
     """
     info_p = lib.PAPI_get_hardware_info()
 
-    return None if info_p == ffi.NULL else HARDWARE_info(info_p)
+    return None if info_p == ffi.NULL else HARDWARE_info(info_p, numpy)
 
 
 # const PAPI_component_info_t *PAPI_get_component_info(int cidx);
@@ -536,18 +717,23 @@ def get_real_usec():
 
 
 # const PAPI_shlib_info_t *PAPI_get_shared_lib_info(void);
-def get_shared_lib_info():
+def get_shared_lib_info(numpy=False):
     """Get address info about the shared libraries used by the process.
     In C, this function returns a pointer to a structure containing
     information about the shared library used by the program.
     There is no Fortran equivalent call.
 
+    :param bool numpy: Return the address maps as a NumPy structured array,
+        copied at once, with the library names left undecoded (see
+        :py:func:`pypapi.structs.to_numpy`). This is much faster for processes
+        with many shared libraries.
+
     :returns: shared libraries information
     :rtype: SHARED_LIB_info
     """
     info_p = lib.PAPI_get_shared_lib_info()
 
-    return None if info_p == ffi.NULL else SHARED_LIB_info(info_p)
+    return None if info_p == ffi.NULL else SHARED_LIB_info(info_p, numpy)
 
 
 # int PAPI_get_thr_specific(int tag, void **ptr); /**< return a pointer to a thread specific stored data structure */
@@ -635,7 +821,10 @@ def list_events(eventSet):
 
     :raises PapiInvalidValueError: One or more of the arguments is invalid.
     :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     number = ffi.new("int*", 0)
 
     rcode = lib.PAPI_list_events(eventSet, ffi.NULL, number)
@@ -776,7 +965,10 @@ def num_events(eventSet):
 
     :raises PapiInvalidValueError: The event count is zero; only if code is compiled with debug enabled.
     :raises PapiNoEventSetError: The EventSet specified does not exist.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     rcode = lib.PAPI_num_events(eventSet)
 
     return rcode, rcode
@@ -840,20 +1032,25 @@ def query_named_event(eventName):
 
 # int PAPI_read(int EventSet, long long * values);
 @papi_error
-def read(eventSet):
+def read(eventSet, numpy=False):
     """Copies the counters of the indicated event set into the provided array.
     The counters continue counting after the read and are not reseted.
 
     :param int eventSet: An integer handle for a PAPI Event Set as created by
         :py:func:`create_eventset`.
+    :param bool numpy: Return a ``numpy.int64`` array instead of a list
+        (PAPI writes directly into the array).
 
-    :rtype: list(int)
+    :rtype: list(int) (or ``numpy.ndarray``)
 
     :raises PapiInvalidValueError: One or more of the arguments is invalid.
     :raises PapiSystemError: A system or C library call failed inside PAPI, see
         the errno variable.
     :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     eventCount_p = ffi.new("int*", 0)
     rcode = lib.PAPI_list_events(eventSet, ffi.NULL, eventCount_p)
 
@@ -861,11 +1058,11 @@ def read(eventSet):
         return rcode, None
 
     eventCount = ffi.unpack(eventCount_p, 1)[0]
-    values = ffi.new("long long[]", eventCount)
+    values_p, result = _values_buffer(eventCount, numpy=numpy)
 
-    rcode = lib.PAPI_read(eventSet, values)
+    rcode = lib.PAPI_read(eventSet, values_p)
 
-    return rcode, ffi.unpack(values, eventCount)
+    return rcode, result()
 
 
 # int PAPI_read_ts(int EventSet, long long * values, long long *cyc);
@@ -910,7 +1107,10 @@ def remove_named_event(eventSet, eventName):
         this event and other events in the event set simultaneously.
     :raises PapiNoEventError: The PAPI preset is not available on the underlying
         hardware.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
 
     name_p = ffi.new("char[]", eventName.encode("ascii"))
     rcode = lib.PAPI_remove_named_event(eventSet, name_p)
@@ -936,7 +1136,10 @@ def remove_event(eventSet, eventCode):
         this event and other events in the event set simultaneously.
     :raises PapiNoEventError: The PAPI preset is not available on the underlying
         hardware.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     rcode = lib.PAPI_remove_event(eventSet, eventCode)
     return rcode, None
 
@@ -957,7 +1160,10 @@ def remove_events(eventSet, eventCodes):
         this event and other events in the event set simultaneously.
     :raises PapiNoEventError: The PAPI preset is not available on the underlying
         hardware.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     number = len(eventCodes)
     eventCodes_p = ffi.new("int[]", eventCodes)
     rcode = lib.PAPI_remove_events(eventSet, eventCodes_p, number)
@@ -982,6 +1188,7 @@ def reset(eventSet):
     :raises PapiNoEventSetError: The event set specified does not exist.
     :raises PapiSystemError: A system or C library call failed inside PAPI, see the errno variable.
     """
+    _check_eventset(eventSet)
     rcode = lib.PAPI_reset(eventSet)
 
     return rcode, None
@@ -1178,14 +1385,52 @@ def set_multiplex(eventSet):
 
 
 # int PAPI_set_opt(int option, PAPI_option_t * ptr);
-def set_opt(*args):
+@papi_error
+def set_opt(option, ptr):
+    """Set PAPI library or event set specific options.
+
+    This is the generic setter: the option value is passed as a
+    ``PAPI_option_t`` union allocated with ``ffi.new("PAPI_option_t *")``.
+    Only the members of the union bound in the Python bindings can be
+    filled (see :py:func:`set_inherit` for a higher level helper).
+
+    :param int option: the option to set (e.g.
+        :py:const:`~pypapi.consts.PAPI_INHERIT`).
+    :param ptr: a pointer to the ``PAPI_option_t`` union holding the value
+        of the option.
+
+    :raises PapiInvalidValueError: One or more of the arguments is invalid.
+    :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiIsRunningError: The event set is currently counting events.
+    :raises PapiComponentError: The option is not supported by the component.
     """
-    .. WARNING::
+    rcode = lib.PAPI_set_opt(option, ptr)
+    return rcode, None
+
+
+def set_inherit(eventSet, inherit=PAPI_INHERIT_ALL):
+    """Sets the inheritance flag of an event set (the
+    :py:const:`~pypapi.consts.PAPI_INHERIT` option of :py:func:`set_opt`):
+    when set, the counts of the child processes and threads created by the
+    monitored process are added to its own counts.
+
+    The event set must be bound to a component (see
+    :py:func:`assign_eventset_component`) and must not be running.
+
+    :param int eventSet: An integer handle for a PAPI Event Set as created by
+        :py:func:`create_eventset`.
+    :param int inherit: :py:const:`~pypapi.consts.PAPI_INHERIT_ALL` (default)
+        or :py:const:`~pypapi.consts.PAPI_INHERIT_NONE`.
 
-        Not implemented in the Python bindings. Will raise ``NotImplementedError``.
+    :raises PapiInvalidValueError: One or more of the arguments is invalid.
+    :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiIsRunningError: The event set is currently counting events.
+    :raises PapiComponentError: Inheritance is not supported by the component.
     """
-    # XXX Function defined for doc reference.
-    raise NotImplementedError()  # TODO
+    option_p = ffi.new("PAPI_option_t *")
+    option_p.inherit.eventset = eventSet
+    option_p.inherit.inherit = inherit
+    return set_opt(PAPI_INHERIT, option_p)
 
 
 # int PAPI_set_thr_specific(int tag, void *ptr);
@@ -1214,13 +1459,24 @@ def start(eventSet):
     :raises PapiSystemError: A system or C library call failed inside PAPI, see
         the errno variable.
     :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process, or an event set was running when the
+        process was forked (see :py:func:`set_fork_policy`).
     :raises PapiIsRunningError: The event set is currently counting events.
     :raises PapiConflictError: The underlying counter hardware can not count
         this event and other events in the event set simultaneously.
     :raises PapiNoEventError: The PAPI preset is not available on the underlying
         hardware.
     """
+    _check_eventset(eventSet)
     rcode = lib.PAPI_start(eventSet)
+    if rcode == lib.PAPI_EISRUN and _running_at_fork and not _is_running(eventSet):
+        raise PapiForkedEventSetError(
+            "an event set was running when the process was forked: it cannot be"
+            " stopped in the child without stopping the counters of the parent,"
+            " so no other event set can be started; stop the event sets before"
+            " fork()"
+        )
     return rcode, None
 
 
@@ -1238,7 +1494,10 @@ def state(eventSet):
 
     :raises PapiInvalidValueError: One or more of the arguments is invalid.
     :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     """
+    _check_eventset(eventSet)
     status = ffi.new("int*", 0)
     rcode = lib.PAPI_state(eventSet, status)
     return rcode, ffi.unpack(status, 1)[0]
@@ -1246,21 +1505,26 @@ def state(eventSet):
 
 # int PAPI_stop(int EventSet, long long * values);
 @papi_error
-def stop(eventSet):
+def stop(eventSet, numpy=False):
     """Stops counting hardware events in an event set and return current
     values.
 
     :param int eventSet: An integer handle for a PAPI Event Set as created by
         :py:func:`create_eventset`.
+    :param bool numpy: Return a ``numpy.int64`` array instead of a list
+        (PAPI writes directly into the array).
 
-    :rtype: list(int)
+    :rtype: list(int) (or ``numpy.ndarray``)
 
     :raises PapiInvalidValueError: One or more of the arguments is invalid.
     :raises PapiSystemError: A system or C library call failed inside PAPI, see
         the errno variable.
     :raises PapiNoEventSetError: The event set specified does not exist.
+    :raises PapiForkedEventSetError: The event set was created before
+        ``fork()`` in the parent process (see :py:func:`set_fork_policy`).
     :raises PapiNotRunningError: The EventSet is currently not running.
     """
+    _check_eventset(eventSet)
     eventCount_p = ffi.new("int*", 0)
     rcode = lib.PAPI_list_events(eventSet, ffi.NULL, eventCount_p)
 
@@ -1268,11 +1532,11 @@ def stop(eventSet):
         return rcode, None
 
     eventCount = ffi.unpack(eventCount_p, 1)[0]
-    values = ffi.new("long long[]", eventCount)
+    values_p, result = _values_buffer(eventCount, numpy=numpy)
 
-    rcode = lib.PAPI_stop(eventSet, values)
+    rcode = lib.PAPI_stop(eventSet, values_p)
 
-    return rcode, ffi.unpack(values, eventCount)
+    return rcode, result()
 
 
 # char *PAPI_strerror(int);
@@ -1303,6 +1567,36 @@ def thread_id():
 
 
 # int PAPI_thread_init(unsigned long (*id_fn) (void));
+@papi_error
+def thread_init():
+    """Initializes thread support in the PAPI library, with ``pthread_self()``
+    as thread identifier function. It must be called once, after
+    :py:func:`library_init` and before event sets are used in several threads.
+
+    :raises PapiInvalidValueError: The thread identifier function is invalid.
+    :raises PapiComponentError: Hardware counters for this thread could not be
+        initialized.
+    """
+    rcode = lib.PAPI_thread_init(ffi.addressof(lib, "pthread_self"))
+
+    return rcode, None
+
+
+_thread_support_lock = threading.Lock()
+_thread_support = False
+
+
+def init_thread_support():
+    """Initializes thread support in the PAPI library with
+    :py:func:`thread_init`, unless it was already initialized by this
+    function: it can be called by every component that uses event sets in
+    several threads.
+    """
+    global _thread_support
+    with _thread_support_lock:
+        if not _thread_support:
+            thread_init()
+            _thread_support = True
 
 
 # int PAPI_unlock(int);
@@ -1353,6 +1647,7 @@ def write(eventSet):
         operation is not permitted by all components and may result in a
         run-time error.
     """
+    _check_eventset(eventSet)
 
     return None, None
 
@@ -0,0 +1,239 @@
+"""
+Hardware counters in process pools.
+
+:py:class:`SharedCounters` initializes PAPI in each worker of a
+:py:class:`multiprocessing.pool.Pool` or of a
+:py:class:`concurrent.futures.ProcessPoolExecutor` (whatever the start method:
+fork, spawn or forkserver), gives each worker its own event set, and counts the
+events of each submitted task. The event codes are resolved once in the parent
+process.
+
+The counts are written by the workers into a
+:py:mod:`multiprocessing.shared_memory` matrix (one row per task), so they are
+aggregated by the parent process without going through the result queue of
+the pool.
+
+Example::
+
+    from concurrent.futures import ProcessPoolExecutor
+    from pypapi.process_pool import SharedCounters
+
+    with SharedCounters(["PAPI_TOT_INS", "PAPI_TOT_CYC"], max_tasks=100) as counters:
+        with ProcessPoolExecutor(4, **counters.pool_kwargs()) as executor:
+            futures = [executor.submit(counters.wrap(work, item)) for item in items]
+            results = [future.result() for future in futures]
+
+        print(counters.totals())
+        for task in counters.tasks():
+            print(task.index, task.pid, task.values)
+
+With a :py:class:`multiprocessing.pool.Pool`::
+
+    with SharedCounters(["PAPI_TOT_INS"], max_tasks=len(items)) as counters:
+        with multiprocessing.Pool(4, **counters.pool_kwargs()) as pool:
+            results = counters.map(pool, work, items)
+"""
+
+import functools
+import os
+from array import array
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+from . import papi_low as papi
+
+
+#: Counts of a finished task: the index of the task (in submission order), the
+#: PID of the worker that ran it, whether it raised an exception, and one value
+#: per event.
+TaskCounts = namedtuple("TaskCounts", "index pid failed values")
+
+# Row layout: state, pid, then one value per event
+_STATE_PENDING = 0
+_STATE_DONE = 1
+_STATE_FAILED = 2
+_HEADER = 2
+
+# Worker state, set by _init_worker()
+_worker = {}
+
+
+def _init_worker(shmName, eventCodes, initializer, initargs):
+    papi.library_init()
+    eventSet = papi.create_eventset()
+    papi.add_events(eventSet, list(eventCodes))
+    shm = shared_memory.SharedMemory(name=shmName)
+    _worker["shm"] = shm
+    _worker["matrix"] = shm.buf.cast("q")
+    _worker["eventSet"] = eventSet
+    _worker["width"] = _HEADER + len(eventCodes)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_task(index, fn, *args, **kwargs):
+    matrix = _worker["matrix"]
+    width = _worker["width"]
+    offset = index * width
+    state = _STATE_FAILED
+    papi.start(_worker["eventSet"])
+    try:
+        result = fn(*args, **kwargs)
+        state = _STATE_DONE
+    finally:
+        values = papi.stop(_worker["eventSet"])
+        matrix[offset + _HEADER : offset + width] = array("q", values)
+        matrix[offset + 1] = os.getpid()
+        matrix[offset] = state
+    return result
+
+
+def _run_indexed(fn, base, item):
+    index, arg = item
+    return _run_task(base + index, fn, arg)
+
+
+class SharedCounters:
+    """Per-task hardware counters of a process pool, aggregated through shared
+    memory.
+
+    :param list events: The events to count (event names or codes).
+    :param int max_tasks: The maximum number of tasks (the number of rows of
+        the shared matrix).
+    """
+
+    def __init__(self, events, max_tasks=1024):
+        self.eventCodes = [
+            papi.event_name_to_code(event) if isinstance(event, str) else event
+            for event in events
+        ]
+        #: The names of the events
+        self.names = [papi.event_code_to_name(code) for code in self.eventCodes]
+        #: The maximum number of tasks
+        self.max_tasks = max_tasks
+        self._width = _HEADER + len(self.eventCodes)
+        self._shm = shared_memory.SharedMemory(
+            create=True, size=max(max_tasks * self._width, 1) * 8
+        )
+        self._matrix = self._shm.buf.cast("q")
+        self._next = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Releases the shared memory. The pool must not run any task
+        anymore."""
+        if self._shm is None:
+            return
+        self._matrix.release()
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def pool_kwargs(self, initializer=None, initargs=()):
+        """Returns the ``initializer`` and ``initargs`` keyword arguments to
+        give to the pool or executor constructor.
+
+        :param callable initializer: An additional initializer to call in each
+            worker.
+        :param tuple initargs: The arguments of ``initializer``.
+
+        :rtype: dict
+        """
+        return {
+            "initializer": _init_worker,
+            "initargs": (self._shm.name, self.eventCodes, initializer, initargs),
+        }
+
+    def _reserve(self, count):
+        if self._next + count > self.max_tasks:
+            raise ValueError(
+                "too many tasks (max_tasks=%i), increase max_tasks" % self.max_tasks
+            )
+        base = self._next
+        self._next += count
+        return base
+
+    def wrap(self, fn, *args, **kwargs):
+        """Returns a callable (to submit to the pool) that calls ``fn`` with
+        the given arguments and counts its events.
+
+        :raises ValueError: ``max_tasks`` tasks were already wrapped.
+        """
+        return functools.partial(_run_task, self._reserve(1), fn, *args, **kwargs)
+
+    def map(self, pool, fn, iterable):
+        """Calls ``fn`` on each item of ``iterable`` with the ``map()`` method of
+        the pool or executor and counts the events of each call.
+
+        :returns: the results of the calls.
+        :rtype: list
+
+        :raises ValueError: Not enough tasks are left (see ``max_tasks``).
+        """
+        items = list(iterable)
+        base = self._reserve(len(items))
+        return list(
+            pool.map(functools.partial(_run_indexed, fn, base), enumerate(items))
+        )
+
+    def _row(self, index):
+        offset = index * self._width
+        return self._matrix[offset : offset + self._width]
+
+    def tasks(self):
+        """Returns the counts of the finished tasks.
+
+        :rtype: list(TaskCounts)
+        """
+        tasks = []
+        for index in range(self._next):
+            row = self._row(index)
+            if row[0] != _STATE_PENDING:
+                tasks.append(
+                    TaskCounts(
+                        index, row[1], row[0] == _STATE_FAILED, row[_HEADER:].tolist()
+                    )
+                )
+        return tasks
+
+    def totals(self):
+        """Returns the sum of the counts of all the finished tasks (one value
+        per event).
+
+        :rtype: list(int)
+        """
+        totals = [0] * len(self.eventCodes)
+        for task in self.tasks():
+            totals = [total + value for total, value in zip(totals, task.values)]
+        return totals
+
+    def per_worker(self):
+        """Returns the sum of the counts of the finished tasks of each worker.
+
+        :returns: the counts, indexed by worker PID.
+        :rtype: dict
+        """
+        workers = {}
+        for task in self.tasks():
+            totals = workers.get(task.pid, [0] * len(self.eventCodes))
+            workers[task.pid] = [
+                total + value for total, value in zip(totals, task.values)
+            ]
+        return workers
+
+    def to_array(self):
+        """Returns the counts of all the wrapped tasks as a ``(tasks, events)``
+        NumPy array (rows of unfinished tasks are zeros). Requires NumPy.
+
+        :rtype: numpy.ndarray
+        """
+        import numpy
+
+        matrix = numpy.frombuffer(self._shm.buf, numpy.int64)
+        matrix = matrix[: self.max_tasks * self._width].reshape(-1, self._width)
+        return matrix[: self._next, _HEADER:].copy()
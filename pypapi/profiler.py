@@ -0,0 +1,761 @@
+"""
+Hardware counter profilers for Python functions and lines.
+
+Like :py:mod:`cProfile`, but instead of time, the counter deltas of a running
+event set are attributed to the Python functions being executed. Each function
+gets *inclusive* counts (everything that happened between its start and its
+return, callees included) and *exclusive* counts (callees excluded).
+
+On Python 3.12+ the profiler relies on :py:mod:`sys.monitoring` (PEP 669)
+``PY_START`` / ``PY_RETURN`` events; on older interpreters it falls back to
+:py:func:`sys.setprofile`. Either way, exactly one PAPI read is made per event.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi import events
+    from pypapi.profiler import FunctionProfiler
+
+    papi.library_init()
+
+    evs = papi.create_eventset()
+    papi.add_events(evs, [
+        events.PAPI_TOT_INS,
+        events.PAPI_TOT_CYC,
+        events.PAPI_L2_TCM,
+    ])
+    papi.start(evs)
+
+    with FunctionProfiler(evs) as profiler:
+        main()
+
+    profiler.print_stats(sort="PAPI_L2_TCM")
+
+    papi.stop(evs)
+
+:py:class:`LineProfiler` works like `line_profiler
+<https://github.com/pyutils/line_profiler>`_: the counter deltas between two
+consecutive lines of some selected functions are accumulated per line::
+
+    from pypapi.profiler import LineProfiler
+
+    profiler = LineProfiler(evs, [kernel])
+    profiler.runcall(kernel, data)
+    profiler.print_stats()
+
+:py:class:`RegionProfiler` attributes the counters to explicitly delimited
+(and possibly nested) code regions, and builds a call tree of the regions::
+
+    from pypapi.profiler import RegionProfiler
+
+    profiler = RegionProfiler(evs)
+    for batch in batches:
+        with profiler.region("batch"):
+            with profiler.region("parse"):
+                parse(batch)
+            with profiler.region("compute"):
+                compute(batch)
+    profiler.print_stats()
+
+.. NOTE::
+
+    Counters only count the thread that started the event set, so only the
+    functions executed by the thread that enabled the profiler are recorded.
+"""
+
+import dis
+import linecache
+import sys
+import threading
+from array import array
+from collections import namedtuple
+
+from ._papi import ffi
+from .histogram import DEFAULT_PRECISION, Histogram
+from .reader import EventSetReader
+
+
+#: Per-function profiling results. ``inclusive`` and ``exclusive`` are lists
+#: of counts, in the same order as :py:attr:`FunctionProfiler.names`.
+FunctionStats = namedtuple(
+    "FunctionStats", "name filename lineno calls inclusive exclusive"
+)
+
+#: Per-line profiling results. ``counts`` is a list of counts, in the same
+#: order as :py:attr:`LineProfiler.names`.
+LineStats = namedtuple("LineStats", "filename lineno function hits counts")
+
+#: Per-region profiling results. ``path`` is the list of the names of the
+#: enclosing regions and of the region itself; ``inclusive`` and ``exclusive``
+#: are lists of counts, in the same order as :py:attr:`RegionProfiler.names`.
+RegionStats = namedtuple("RegionStats", "path calls inclusive exclusive")
+
+_HAS_MONITORING = hasattr(sys, "monitoring")
+
+
+class FunctionProfiler:
+    """Attributes the counters of a running event set to Python functions.
+
+    :param int eventSet: An integer handle for a **running** PAPI Event Set
+        (see :py:func:`~pypapi.papi_low.start`).
+    :param bool use_monitoring: Use :py:mod:`sys.monitoring` (default: only
+        if available, i.e. on Python 3.12+). If ``False``,
+        :py:func:`sys.setprofile` is used.
+    """
+
+    def __init__(self, eventSet, use_monitoring=None):
+        self._reader = EventSetReader(eventSet)
+        self._read_into = self._reader.read_into
+        self._count = self._reader.count
+        self._size = ffi.sizeof("long long") * self._count
+        if use_monitoring is None:
+            use_monitoring = _HAS_MONITORING
+        self._use_monitoring = use_monitoring
+        self._thread_id = None
+        self._stack = []
+        self._free = []
+        self._last = self._reader.new_values()
+        self._scratch = self._reader.new_values()
+        self._stats = {}
+        self._recursion = {}
+
+    @property
+    def names(self):
+        """Names of the events of the event set."""
+        return self._reader.names
+
+    def _enter(self, code, offset=None, arg=None):
+        if threading.get_ident() != self._thread_id:
+            return
+        now = self._scratch
+        self._read_into(now)
+        stack = self._stack
+        if stack:
+            exclusive = self._stats[stack[-1][0]][2]
+            last = self._last
+            for i in range(self._count):
+                exclusive[i] += now[i] - last[i]
+        if code not in self._stats:
+            self._stats[code] = [0, [0] * self._count, [0] * self._count]
+        self._recursion[code] = self._recursion.get(code, 0) + 1
+        start = self._free.pop() if self._free else self._reader.new_values()
+        ffi.memmove(start, now, self._size)
+        stack.append((code, start))
+        self._scratch, self._last = self._last, now
+
+    def _leave(self, code, offset=None, arg=None, count_call=True):
+        if threading.get_ident() != self._thread_id:
+            return
+        now = self._scratch
+        self._read_into(now)
+        if not self._recursion.get(code):
+            # Returning from a function entered before the profiler was enabled
+            self._scratch, self._last = self._last, now
+            return
+        # The frames above the returning one were left without a return event
+        # (e.g. exceptions, generators or coroutines): they end now too
+        stack = self._stack
+        last = self._last
+        while True:
+            top, start = stack.pop()
+            stats = self._stats[top]
+            exclusive = stats[2]
+            for i in range(self._count):
+                exclusive[i] += now[i] - last[i]
+            last = now
+            self._recursion[top] -= 1
+            if not self._recursion[top]:
+                inclusive = stats[1]
+                for i in range(self._count):
+                    inclusive[i] += now[i] - start[i]
+            if count_call:
+                stats[0] += 1
+            self._free.append(start)
+            if top is code:
+                break
+        self._scratch, self._last = self._last, now
+
+    def _profile(self, frame, event, arg):
+        if event == "call":
+            self._enter(frame.f_code)
+        elif event == "return":
+            self._leave(frame.f_code)
+
+    def enable(self):
+        """Start collecting profiling data.
+
+        :raises ValueError: Another tool already uses the
+            :py:mod:`sys.monitoring` profiler slot.
+        """
+        self._thread_id = threading.get_ident()
+        self._stack = []
+        self._read_into(self._last)
+        if self._use_monitoring:
+            monitoring = sys.monitoring
+            tool = monitoring.PROFILER_ID
+            ev = monitoring.events
+            monitoring.use_tool_id(tool, "pypapi")
+            for event in (ev.PY_START, ev.PY_RESUME, ev.PY_THROW):
+                monitoring.register_callback(tool, event, self._enter)
+            for event in (ev.PY_RETURN, ev.PY_YIELD, ev.PY_UNWIND):
+                monitoring.register_callback(tool, event, self._leave)
+            monitoring.set_events(
+                tool,
+                ev.PY_START
+                | ev.PY_RESUME
+                | ev.PY_THROW
+                | ev.PY_RETURN
+                | ev.PY_YIELD
+                | ev.PY_UNWIND,
+            )
+        else:
+            sys.setprofile(self._profile)
+
+    def disable(self):
+        """Stop collecting profiling data.
+
+        Functions that are still running are accounted up to this point, but
+        their call is not counted.
+        """
+        if self._use_monitoring:
+            monitoring = sys.monitoring
+            tool = monitoring.PROFILER_ID
+            monitoring.set_events(tool, 0)
+            for event in (
+                monitoring.events.PY_START,
+                monitoring.events.PY_RESUME,
+                monitoring.events.PY_THROW,
+                monitoring.events.PY_RETURN,
+                monitoring.events.PY_YIELD,
+                monitoring.events.PY_UNWIND,
+            ):
+                monitoring.register_callback(tool, event, None)
+            monitoring.free_tool_id(tool)
+        else:
+            sys.setprofile(None)
+        # Forget about the profiler's own frames (disable(), __exit__())
+        own_code = (
+            FunctionProfiler.disable.__code__,
+            FunctionProfiler.__exit__.__code__,
+        )
+        while self._stack and self._stack[-1][0] in own_code:
+            code, _ = self._stack.pop()
+            self._recursion[code] -= 1
+            if not self._stats[code][0]:
+                del self._stats[code]
+        while self._stack:
+            self._leave(self._stack[-1][0], count_call=False)
+        self._thread_id = None
+
+    def runcall(self, func, *args, **kwargs):
+        """Profile a single call of a function.
+
+        :returns: the value returned by ``func``.
+        """
+        self.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.disable()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def get_stats(self):
+        """Returns the collected profiling data.
+
+        :rtype: list(FunctionStats)
+        """
+        return [
+            FunctionStats(
+                getattr(code, "co_qualname", code.co_name),
+                code.co_filename,
+                code.co_firstlineno,
+                calls,
+                list(inclusive),
+                list(exclusive),
+            )
+            for code, (calls, inclusive, exclusive) in self._stats.items()
+        ]
+
+    def print_stats(self, sort=None, limit=None, file=None):
+        """Prints a report of the collected profiling data.
+
+        :param str sort: Name of the event used to sort functions (by
+            exclusive count, decreasing, default: first event).
+        :param int limit: Maximum number of functions to print (default: all).
+        :param file: Where to write the report (default: :py:data:`sys.stdout`).
+        """
+        file = file or sys.stdout
+        index = self.names.index(sort) if sort else 0
+        stats = sorted(self.get_stats(), key=lambda s: s.exclusive[index], reverse=True)
+        header = ["calls"]
+        for name in self.names:
+            header += ["incl %s" % name, "excl %s" % name]
+        print("  ".join("%18s" % h for h in header), " function", file=file)
+        for stat in stats[:limit]:
+            columns = [stat.calls]
+            for inclusive, exclusive in zip(stat.inclusive, stat.exclusive):
+                columns += [inclusive, exclusive]
+            print(
+                "  ".join("%18i" % c for c in columns),
+                " %s (%s:%i)" % (stat.name, stat.filename, stat.lineno),
+                file=file,
+            )
+
+
+class LineProfiler:
+    """Attributes the counters of a running event set to the lines of some
+    selected functions.
+
+    The counter deltas between two line events are accumulated on the first
+    line (calls made from a line are included in its counts). Accumulators are
+    preallocated C arrays and counters are read with
+    :py:meth:`~pypapi.reader.EventSetReader.read_into`, so recording a line
+    costs one PAPI read and no allocation.
+
+    :param int eventSet: An integer handle for a **running** PAPI Event Set
+        (see :py:func:`~pypapi.papi_low.start`).
+    :param list functions: The functions to profile (more can be added later
+        with :py:meth:`add_function`).
+    :param bool use_monitoring: Use :py:mod:`sys.monitoring` (default: only
+        if available, i.e. on Python 3.12+). If ``False``,
+        :py:func:`sys.settrace` is used.
+    """
+
+    def __init__(self, eventSet, functions=(), use_monitoring=None):
+        self._reader = EventSetReader(eventSet)
+        self._read_into = self._reader.read_into
+        if use_monitoring is None:
+            use_monitoring = _HAS_MONITORING
+        self._use_monitoring = use_monitoring
+        self._thread_id = None
+        self._codes = {}
+        self._stack = []
+        self._free = []
+        self._scratch = self._reader.new_values()
+        for function in functions:
+            self.add_function(function)
+
+    @property
+    def names(self):
+        """Names of the events of the event set."""
+        return self._reader.names
+
+    def add_function(self, function):
+        """Add a function to profile.
+
+        :param function: A Python function (or code object).
+        """
+        code = getattr(function, "__code__", function)
+        if code in self._codes:
+            return
+        lines = [code.co_firstlineno]
+        lines += [line for _, line in dis.findlinestarts(code) if line is not None]
+        first = min(lines)
+        size = max(lines) - first + 1
+        self._codes[code] = (
+            first,
+            ffi.new("long long[]", size),
+            self._reader.new_values(rows=size),
+        )
+        if self._thread_id is not None and self._use_monitoring:
+            self._set_local_events(code)
+
+    def _set_local_events(self, code, enabled=True):
+        monitoring = sys.monitoring
+        ev = monitoring.events
+        events = ev.PY_START | ev.PY_RESUME | ev.PY_RETURN | ev.PY_YIELD | ev.LINE
+        monitoring.set_local_events(
+            monitoring.PROFILER_ID, code, events if enabled else 0
+        )
+
+    def _accumulate(self, level, now):
+        first, hits, counts = self._codes[level[0]]
+        index = level[1] - first
+        hits[index] += 1
+        row = counts[index]
+        last = level[2]
+        for i in range(self._reader.count):
+            row[i] += now[i] - last[i]
+
+    def _start(self, code, offset=None, arg=None):
+        if threading.get_ident() != self._thread_id or code not in self._codes:
+            return
+        values = self._free.pop() if self._free else self._reader.new_values()
+        self._read_into(values)
+        self._stack.append([code, None, values])
+
+    def _line(self, code, line):
+        if threading.get_ident() != self._thread_id:
+            return
+        if not self._stack or self._stack[-1][0] is not code:
+            # Frame started before the profiler was enabled
+            self._start(code)
+        level = self._stack[-1]
+        now = self._scratch
+        self._read_into(now)
+        if level[1] is not None:
+            self._accumulate(level, now)
+        level[1] = line
+        self._scratch, level[2] = level[2], now
+
+    def _return(self, code, offset=None, arg=None):
+        if threading.get_ident() != self._thread_id:
+            return
+        if not self._stack or self._stack[-1][0] is not code:
+            return
+        level = self._stack.pop()
+        if level[1] is not None:
+            self._read_into(self._scratch)
+            self._accumulate(level, self._scratch)
+        self._free.append(level[2])
+
+    def _trace(self, frame, event, arg):
+        if event == "call" and frame.f_code in self._codes:
+            self._start(frame.f_code)
+            return self._local_trace
+        return None
+
+    def _local_trace(self, frame, event, arg):
+        if event == "line":
+            self._line(frame.f_code, frame.f_lineno)
+        elif event == "return":
+            self._return(frame.f_code)
+        return self._local_trace
+
+    def enable(self):
+        """Start collecting profiling data.
+
+        :raises ValueError: Another tool already uses the
+            :py:mod:`sys.monitoring` profiler slot.
+        """
+        self._thread_id = threading.get_ident()
+        self._stack = []
+        if self._use_monitoring:
+            monitoring = sys.monitoring
+            tool = monitoring.PROFILER_ID
+            ev = monitoring.events
+            monitoring.use_tool_id(tool, "pypapi")
+            monitoring.register_callback(tool, ev.LINE, self._line)
+            for event in (ev.PY_START, ev.PY_RESUME, ev.PY_THROW):
+                monitoring.register_callback(tool, event, self._start)
+            for event in (ev.PY_RETURN, ev.PY_YIELD, ev.PY_UNWIND):
+                monitoring.register_callback(tool, event, self._return)
+            # Exception related events cannot be enabled per code object
+            monitoring.set_events(tool, ev.PY_THROW | ev.PY_UNWIND)
+            for code in self._codes:
+                self._set_local_events(code)
+        else:
+            sys.settrace(self._trace)
+
+    def disable(self):
+        """Stop collecting profiling data."""
+        if self._use_monitoring:
+            monitoring = sys.monitoring
+            tool = monitoring.PROFILER_ID
+            ev = monitoring.events
+            monitoring.set_events(tool, 0)
+            for code in self._codes:
+                self._set_local_events(code, enabled=False)
+            for event in (
+                ev.LINE,
+                ev.PY_START,
+                ev.PY_RESUME,
+                ev.PY_THROW,
+                ev.PY_RETURN,
+                ev.PY_YIELD,
+                ev.PY_UNWIND,
+            ):
+                monitoring.register_callback(tool, event, None)
+            monitoring.free_tool_id(tool)
+        else:
+            sys.settrace(None)
+        while self._stack:
+            self._return(self._stack[-1][0])
+        self._thread_id = None
+
+    def runcall(self, func, *args, **kwargs):
+        """Profile a single call of a function.
+
+        :returns: the value returned by ``func``.
+        """
+        self.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.disable()
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def get_stats(self):
+        """Returns the collected profiling data of the lines that were
+        executed at least once.
+
+        :rtype: list(LineStats)
+        """
+        stats = []
+        for code, (first, hits, counts) in self._codes.items():
+            for index in range(len(hits)):
+                if hits[index]:
+                    stats.append(
+                        LineStats(
+                            code.co_filename,
+                            first + index,
+                            getattr(code, "co_qualname", code.co_name),
+                            hits[index],
+                            ffi.unpack(counts[index], self._reader.count),
+                        )
+                    )
+        return stats
+
+    def print_stats(self, file=None):
+        """Prints the source of the profiled functions annotated with the
+        collected counts.
+
+        :param file: Where to write the report (default: :py:data:`sys.stdout`).
+        """
+        file = file or sys.stdout
+        header = ["line", "hits"] + self.names
+        for code, (first, hits, counts) in self._codes.items():
+            print(
+                "\n%s (%s:%i)"
+                % (
+                    getattr(code, "co_qualname", code.co_name),
+                    code.co_filename,
+                    code.co_firstlineno,
+                ),
+                file=file,
+            )
+            print("  ".join("%14s" % h for h in header), " source", file=file)
+            for index in range(len(hits)):
+                columns = [first + index, hits[index]]
+                columns += ffi.unpack(counts[index], self._reader.count)
+                source = linecache.getline(code.co_filename, first + index)
+                print(
+                    "  ".join("%14i" % c for c in columns),
+                    " " + source.rstrip(),
+                    file=file,
+                )
+
+
+class _Region:
+    # Reusable context manager of a region name
+
+    __slots__ = ("_profiler", "_name")
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._profiler.enter(self._name)
+
+    def __exit__(self, *exc_info):
+        self._profiler.leave()
+
+
+class RegionProfiler:
+    """Attributes the counters of a running event set to nested code regions.
+
+    The event set keeps running: entering or leaving a region costs one PAPI
+    read (with :py:meth:`~pypapi.reader.EventSetReader.read_into`, into
+    preallocated buffers) and no start/stop, so regions can be nested and
+    entered thousands of times per second. The regions form a call tree (the
+    same region entered from different parents gives different nodes) whose
+    nodes are stored in flat arrays.
+
+    Each node gets *inclusive* counts (everything between entering and leaving
+    the region) and *exclusive* counts (nested regions excluded). Optionally,
+    the inclusive counts of each call are also recorded in bounded-memory
+    histograms (one per node and event, see :py:mod:`pypapi.histogram`), to
+    get their percentiles.
+
+    :param int eventSet: An integer handle for a **running** PAPI Event Set
+        (see :py:func:`~pypapi.papi_low.start`), started by the thread that
+        uses the profiler.
+    :param bool histograms: Record the counts of each call in histograms
+        (see :py:meth:`get_histograms`).
+    :param int precision: The precision of the histograms (see
+        :py:class:`~pypapi.histogram.Histogram`).
+    """
+
+    def __init__(self, eventSet, histograms=False, precision=DEFAULT_PRECISION):
+        self._reader = EventSetReader(eventSet)
+        self._read_into = self._reader.read_into
+        self._count = self._reader.count
+        self._contexts = {}
+        self._record_histograms = histograms
+        self._precision = precision
+        self.reset()
+
+    @property
+    def names(self):
+        """Names of the events of the event set."""
+        return self._reader.names
+
+    def reset(self):
+        """Removes all the regions. Must not be called inside a region."""
+        # Node 0 is the root of the tree (outside of any region)
+        self._node_names = [None]
+        self._parents = array("l", [-1])
+        self._calls = array("q", [0])
+        self._inclusive = array("q", [0] * self._count)
+        self._exclusive = array("q", [0] * self._count)
+        self._children = [{}]
+        self._histograms = [None]
+        self._stack = array("l", [0])
+        self._starts = [self._reader.new_values()]
+        self._last = self._reader.new_values()
+        self._now = self._reader.new_values()
+        self._read_into(self._last)
+
+    def _add_node(self, parent, name):
+        node = len(self._node_names)
+        self._node_names.append(name)
+        self._parents.append(parent)
+        self._calls.append(0)
+        self._inclusive.extend([0] * self._count)
+        self._exclusive.extend([0] * self._count)
+        self._children.append({})
+        self._children[parent][name] = node
+        if self._record_histograms:
+            self._histograms.append(
+                [Histogram(self._precision) for _ in range(self._count)]
+            )
+        else:
+            self._histograms.append(None)
+        return node
+
+    def enter(self, name):
+        """Enters a region.
+
+        :param str name: The name of the region.
+        """
+        now = self._now
+        self._read_into(now)
+        stack = self._stack
+        parent = stack[-1]
+        last = self._last
+        exclusive = self._exclusive
+        offset = parent * self._count
+        for i in range(self._count):
+            exclusive[offset + i] += now[i] - last[i]
+        node = self._children[parent].get(name)
+        if node is None:
+            node = self._add_node(parent, name)
+        depth = len(stack)
+        stack.append(node)
+        if depth == len(self._starts):
+            self._starts.append(self._reader.new_values())
+        start = self._starts[depth]
+        for i in range(self._count):
+            start[i] = now[i]
+        self._now, self._last = last, now
+
+    def leave(self):
+        """Leaves the current region.
+
+        :raises RuntimeError: No region was entered.
+        """
+        stack = self._stack
+        if len(stack) < 2:
+            raise RuntimeError("no region to leave")
+        now = self._now
+        self._read_into(now)
+        node = stack.pop()
+        start = self._starts[len(stack)]
+        last = self._last
+        inclusive = self._inclusive
+        exclusive = self._exclusive
+        offset = node * self._count
+        histograms = self._histograms[node]
+        for i in range(self._count):
+            exclusive[offset + i] += now[i] - last[i]
+            inclusive[offset + i] += now[i] - start[i]
+            if histograms is not None:
+                histograms[i].record(now[i] - start[i])
+        self._calls[node] += 1
+        self._now, self._last = last, now
+
+    def region(self, name):
+        """Returns a context manager that enters and leaves a region.
+
+        :param str name: The name of the region.
+        """
+        context = self._contexts.get(name)
+        if context is None:
+            context = self._contexts[name] = _Region(self, name)
+        return context
+
+    def _path(self, node):
+        path = []
+        while node > 0:
+            path.append(self._node_names[node])
+            node = self._parents[node]
+        return path[::-1]
+
+    def get_stats(self):
+        """Returns the collected profiling data of the regions, in depth-first
+        order (regions that are still running are not accounted yet).
+
+        :rtype: list(RegionStats)
+        """
+        stats = []
+        nodes = sorted(self._children[0].values(), reverse=True)
+        while nodes:
+            node = nodes.pop()
+            offset = node * self._count
+            stats.append(
+                RegionStats(
+                    self._path(node),
+                    self._calls[node],
+                    self._inclusive[offset : offset + self._count].tolist(),
+                    self._exclusive[offset : offset + self._count].tolist(),
+                )
+            )
+            nodes.extend(sorted(self._children[node].values(), reverse=True))
+        return stats
+
+    def get_histograms(self):
+        """Returns the histograms of the per-call inclusive counts of the
+        regions (if the profiler records histograms).
+
+        :returns: one histogram per event (in the order of :py:attr:`names`),
+            indexed by region path (a tuple of region names).
+        :rtype: dict(tuple, list(Histogram))
+        """
+        return {
+            tuple(self._path(node)): histograms
+            for node, histograms in enumerate(self._histograms)
+            if histograms is not None
+        }
+
+    def print_stats(self, file=None):
+        """Prints the call tree of the regions with the collected counts.
+
+        :param file: Where to write the report (default: :py:data:`sys.stdout`).
+        """
+        file = file or sys.stdout
+        header = ["calls"]
+        for name in self.names:
+            header += ["incl %s" % name, "excl %s" % name]
+        print("  ".join("%18s" % h for h in header), " region", file=file)
+        for stat in self.get_stats():
+            columns = [stat.calls]
+            for inclusive, exclusive in zip(stat.inclusive, stat.exclusive):
+                columns += [inclusive, exclusive]
+            print(
+                "  ".join("%18i" % c for c in columns),
+                " " + "  " * (len(stat.path) - 1) + stat.path[-1],
+                file=file,
+            )
@@ -0,0 +1,336 @@
+"""
+Pytest plugin that counts hardware events per test and gates on
+instruction-count regressions.
+
+Instruction counts are far less noisy than wall time on shared CI runners, so
+they make a good signal for performance regression gating. The plugin is
+installed with PyPAPI but does nothing unless the ``--papi`` option is given.
+
+Recording a baseline::
+
+    pytest --papi --papi-save-baseline
+
+Checking for regressions against the baseline (fails the tests whose
+``PAPI_TOT_INS`` count grew by more than 5%)::
+
+    pytest --papi --papi-threshold=0.05
+
+Available options:
+
+* ``--papi``: enable the plugin,
+* ``--papi-events``: comma-separated list of the events to count (default:
+  ``PAPI_TOT_INS,PAPI_TOT_CYC,PAPI_BR_MSP``),
+* ``--papi-baseline``: path of the baseline file (default:
+  ``.papi_baseline.json``),
+* ``--papi-save-baseline``: write the results of the run to the baseline file,
+* ``--papi-threshold``: allowed relative ``PAPI_TOT_INS`` regression (default:
+  ``0.05``),
+* ``--papi-on-regression``: ``fail`` (default) or ``warn``,
+* ``--papi-rounds``: number of measured rounds of the ``papi_benchmark``
+  fixture (default: ``5``).
+
+Each test is measured as a whole (its fixtures excluded), once per run. Each
+``--papi-save-baseline`` run adds its counts to the baseline, which keeps the
+last ``BASELINE_RUNS`` runs of each test: tests are compared to the median of
+these runs, and the allowed regression is widened to ``SPREAD_FACTOR`` times
+their relative standard deviation when it is larger than the threshold. Record
+the baseline a few times to capture the run-to-run variation (and remove the
+baseline file to start again after an intended change).
+
+For repeated-run statistics within a run, use the ``papi_benchmark`` fixture:
+the given function is called once to warm up, then measured ``--papi-rounds``
+times, and the median is compared to the baseline::
+
+    def test_sort(papi_benchmark):
+        result = papi_benchmark(sorted, data)
+        assert result[0] == 0
+
+The threshold of a single test can be overridden with a marker::
+
+    @pytest.mark.papi(threshold=0.2)
+    def test_noisy():
+        ...
+
+With pytest-xdist, the workers send their results to the controller, which
+writes the baseline file.
+"""
+
+import json
+import os
+import statistics
+
+import pytest
+
+
+DEFAULT_EVENTS = "PAPI_TOT_INS,PAPI_TOT_CYC,PAPI_BR_MSP"
+GATED_EVENT = "PAPI_TOT_INS"
+
+#: Number of runs of each test kept in the baseline file
+BASELINE_RUNS = 5
+
+#: The allowed regression is at least this many times the relative standard
+#: deviation of the baseline
+SPREAD_FACTOR = 3
+
+
+class PapiRegressionWarning(pytest.PytestWarning):
+    """Warning emitted when a test regresses with ``--papi-on-regression=warn``."""
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("papi", "hardware counters (PyPAPI)")
+    group.addoption(
+        "--papi",
+        action="store_true",
+        default=False,
+        help="count hardware events for each test",
+    )
+    group.addoption(
+        "--papi-events",
+        default=DEFAULT_EVENTS,
+        help="comma-separated list of events to count (default: %(default)s)",
+    )
+    group.addoption(
+        "--papi-baseline",
+        default=".papi_baseline.json",
+        help="baseline file (default: %(default)s)",
+    )
+    group.addoption(
+        "--papi-save-baseline",
+        action="store_true",
+        default=False,
+        help="write the results of the run to the baseline file",
+    )
+    group.addoption(
+        "--papi-threshold",
+        type=float,
+        default=0.05,
+        help="allowed relative %s regression (default: %%(default)s)" % GATED_EVENT,
+    )
+    group.addoption(
+        "--papi-on-regression",
+        choices=("fail", "warn"),
+        default="fail",
+        help="what to do when a test regresses (default: %(default)s)",
+    )
+    group.addoption(
+        "--papi-rounds",
+        type=int,
+        default=5,
+        help="measured rounds of the papi_benchmark fixture (default: %(default)s)",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "papi(threshold): override the allowed %s regression of a test" % GATED_EVENT,
+    )
+    if config.getoption("papi"):
+        config.pluginmanager.register(PapiPlugin(config), "pypapi-plugin")
+
+
+def _summarize(samples):
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.mean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": len(samples),
+    }
+
+
+def _merge_baseline(previous, stats):
+    # Adds the median of a run to the runs kept in the baseline: the median
+    # and the spread of the baseline are the ones of the kept runs (or of the
+    # rounds of the last run, if larger)
+    if previous is None:
+        runs = []
+    else:
+        runs = previous.get("runs", [previous["median"]])
+    runs = (runs + [stats["median"]])[-BASELINE_RUNS:]
+    merged = dict(stats)
+    merged["runs"] = runs
+    merged["median"] = statistics.median(runs)
+    if len(runs) > 1:
+        merged["stdev"] = max(stats["stdev"], statistics.stdev(runs))
+    return merged
+
+
+class PapiPlugin:
+    """Counts the events of each test and compares them to the baseline."""
+
+    def __init__(self, config):
+        from . import papi_low as papi
+        from .exceptions import PapiError
+
+        self.papi = papi
+        self.config = config
+        self.names = [
+            name.strip()
+            for name in config.getoption("papi_events").split(",")
+            if name.strip()
+        ]
+        self.baseline_path = config.getoption("papi_baseline")
+        self.threshold = config.getoption("papi_threshold")
+        self.on_regression = config.getoption("papi_on_regression")
+        self.rounds = config.getoption("papi_rounds")
+        #: Whether this is a pytest-xdist worker (the controller writes the
+        #: baseline file)
+        self.is_worker = hasattr(config, "workerinput")
+        self.results = {}
+        self.regressions = {}
+        self.baseline = {}
+        if os.path.isfile(self.baseline_path):
+            with open(self.baseline_path, "r") as file_:
+                self.baseline = json.load(file_).get("tests", {})
+
+        papi.library_init()
+        self.eventSet = papi.create_eventset()
+        for name in self.names:
+            try:
+                papi.add_named_event(self.eventSet, name)
+            except PapiError as error:
+                raise pytest.UsageError("--papi-events: %s: %s" % (name, error))
+
+    def measure(self, func, *args, **kwargs):
+        """Calls ``func`` and returns its result and the counted values."""
+        self.papi.start(self.eventSet)
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            values = self.papi.stop(self.eventSet)
+        return result, values
+
+    def record(self, item, samples):
+        """Stores the statistics of the given samples (one list of values per
+        round) and checks them against the baseline."""
+        stats = {
+            name: _summarize([values[i] for values in samples])
+            for i, name in enumerate(self.names)
+        }
+        self.results[item.nodeid] = stats
+        if GATED_EVENT not in stats:
+            return
+        reference = self.baseline.get(item.nodeid, {}).get(GATED_EVENT)
+        if not reference or not reference["median"]:
+            return
+        marker = item.get_closest_marker("papi")
+        threshold = (
+            marker.kwargs.get("threshold", self.threshold) if marker else self.threshold
+        )
+        spread = reference.get("stdev", 0.0) / reference["median"]
+        threshold = max(threshold, SPREAD_FACTOR * spread)
+        ratio = stats[GATED_EVENT]["median"] / reference["median"] - 1
+        if ratio > threshold:
+            self.regressions[item.nodeid] = (
+                "%s regression: %i -> %i (%+.2f%%, threshold: %.2f%%)"
+                % (
+                    GATED_EVENT,
+                    reference["median"],
+                    stats[GATED_EVENT]["median"],
+                    ratio * 100,
+                    threshold * 100,
+                )
+            )
+
+    def check(self, item):
+        """Fails the test (or warns) if it regressed."""
+        message = self.regressions.get(item.nodeid)
+        if message is None:
+            return
+        if self.on_regression == "warn":
+            item.warn(PapiRegressionWarning(message))
+        else:
+            pytest.fail(message, pytrace=False)
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_pyfunc_call(self, pyfuncitem):
+        if "papi_benchmark" in pyfuncitem.fixturenames:
+            # Measured round by round by the fixture
+            result = yield
+        else:
+            self.papi.start(self.eventSet)
+            try:
+                result = yield
+            finally:
+                values = self.papi.stop(self.eventSet)
+            self.record(pyfuncitem, [values])
+        # Not reached if the test failed: only passing tests are gated
+        self.check(pyfuncitem)
+        return result
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        # pytest-xdist controller: collects the results of a worker
+        output = getattr(node, "workeroutput", {}).get("papi")
+        if output:
+            output = json.loads(output)
+            self.results.update(output["results"])
+            self.regressions.update(output["regressions"])
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.section("hardware counters (PyPAPI)")
+        terminalreporter.write_line(
+            "  ".join("%16s" % name for name in self.names) + "  test"
+        )
+        for nodeid, stats in self.results.items():
+            terminalreporter.write_line(
+                "  ".join("%16i" % stats[name]["median"] for name in self.names)
+                + "  "
+                + nodeid
+            )
+        for nodeid, message in self.regressions.items():
+            terminalreporter.write_line("REGRESSION %s: %s" % (nodeid, message))
+
+    def pytest_sessionfinish(self, session):
+        if self.is_worker:
+            self.config.workeroutput["papi"] = json.dumps(
+                {"results": self.results, "regressions": self.regressions}
+            )
+        elif self.config.getoption("papi_save_baseline"):
+            tests = dict(self.baseline)
+            for nodeid, stats in self.results.items():
+                previous = tests.get(nodeid, {})
+                tests[nodeid] = {
+                    name: _merge_baseline(previous.get(name), stats[name])
+                    for name in stats
+                }
+            with open(self.baseline_path, "w") as file_:
+                json.dump({"events": self.names, "tests": tests}, file_, indent=2)
+        self.papi.cleanup_eventset(self.eventSet)
+        self.papi.destroy_eventset(self.eventSet)
+
+
+class PapiBenchmark:
+    """Callable returned by the ``papi_benchmark`` fixture."""
+
+    def __init__(self, plugin, item):
+        self.plugin = plugin
+        self.item = item
+        #: Number of measured rounds
+        self.rounds = plugin.rounds if plugin else 1
+
+    def __call__(self, func, *args, **kwargs):
+        """Calls ``func`` once to warm up then measures it :py:attr:`rounds`
+        times.
+
+        :returns: the value returned by the last call of ``func``.
+        """
+        if self.plugin is None:
+            return func(*args, **kwargs)
+        func(*args, **kwargs)
+        samples = []
+        for _ in range(self.rounds):
+            result, values = self.plugin.measure(func, *args, **kwargs)
+            samples.append(values)
+        self.plugin.record(self.item, samples)
+        return result
+
+
+@pytest.fixture
+def papi_benchmark(request):
+    """Measures a function over several rounds (see the module
+    documentation)."""
+    plugin = request.config.pluginmanager.get_plugin("pypapi-plugin")
+    return PapiBenchmark(plugin, request.node)
@@ -0,0 +1,121 @@
+"""
+Allocation-free reads of a running event set.
+
+:py:func:`pypapi.papi_low.read` is convenient but queries the number of events
+and allocates a new C array on each call. When the counters of a long-running
+event set are sampled thousands of times per second (profilers, region
+timers...), this module provides a cheaper path: the event list is resolved
+once and the values are read into preallocated buffers.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi import events
+    from pypapi.reader import EventSetReader
+
+    papi.library_init()
+
+    evs = papi.create_eventset()
+    papi.add_events(evs, [events.PAPI_TOT_INS, events.PAPI_TOT_CYC])
+    papi.start(evs)
+
+    reader = EventSetReader(evs)
+    before = reader.new_values()
+    after = reader.new_values()
+
+    reader.read_into(before)
+    # Do some computation here
+    reader.read_into(after)
+
+    print(reader.delta(before, after))
+
+.. NOTE::
+
+    When the component supports it (see the ``fast_counter_read`` field of
+    :py:class:`~pypapi.structs.COMPONENT_info`), PAPI reads the counters from
+    user space without any system call, which makes ``read_into()`` the
+    cheapest way to sample counters from Python.
+"""
+
+from ._papi import lib, ffi
+from .exceptions import raise_papi_error
+from .papi_low import (
+    list_events,
+    event_code_to_name,
+    _check_eventset,
+    _forked_eventsets,
+)
+
+
+class EventSetReader:
+    """Reads the counters of an event set into preallocated buffers.
+
+    :param int eventSet: An integer handle for a PAPI Event Set as created by
+        :py:func:`~pypapi.papi_low.create_eventset`. The events must not be
+        changed while the reader is in use.
+    """
+
+    def __init__(self, eventSet):
+        #: The event set handle
+        self.eventSet = eventSet
+        #: The codes of the events of the event set
+        self.events = list_events(eventSet)
+        #: The number of events in the event set
+        self.count = len(self.events)
+        self._names = None
+        self._values = self.new_values()
+
+    @property
+    def names(self):
+        """The names of the events of the event set (resolved on first
+        access)."""
+        if self._names is None:
+            self._names = [event_code_to_name(code) for code in self.events]
+        return self._names
+
+    def new_values(self, rows=None):
+        """Allocate a zeroed C buffer suitable for :py:meth:`read_into`.
+
+        :param int rows: If given, allocate a ``rows`` x ``count`` matrix
+            instead of a single row (each row can be passed to
+            :py:meth:`read_into`).
+
+        :rtype: cdata ``long long[]`` or ``long long[][]``
+        """
+        if rows is None:
+            return ffi.new("long long[]", max(self.count, 1))
+        return ffi.new("long long[%i][%i]" % (rows, max(self.count, 1)))
+
+    def read_into(self, values):
+        """Copies the counters of the event set into the given C buffer,
+        without allocating anything.
+
+        :param values: A buffer allocated with :py:meth:`new_values`.
+
+        :raises PapiInvalidValueError: One or more of the arguments is invalid.
+        :raises PapiSystemError: A system or C library call failed inside PAPI.
+        :raises PapiNoEventSetError: The event set specified does not exist.
+        :raises PapiForkedEventSetError: The event set was created before
+            ``fork()`` in the parent process.
+        """
+        if _forked_eventsets:
+            _check_eventset(self.eventSet)
+        rcode = lib.PAPI_read(self.eventSet, values)
+        if rcode < 0:
+            raise_papi_error(rcode)
+
+    def read(self):
+        """Reads the counters of the event set.
+
+        :rtype: list(int)
+        """
+        self.read_into(self._values)
+        return ffi.unpack(self._values, self.count)
+
+    def delta(self, before, after):
+        """Computes the difference between two buffers filled by
+        :py:meth:`read_into`.
+
+        :rtype: list(int)
+        """
+        return [after[i] - before[i] for i in range(self.count)]
@@ -0,0 +1,289 @@
+"""
+Roofline analysis of kernels.
+
+The roofline model bounds the attainable floating point rate of a kernel by
+``min(peak_flops, intensity * peak_bandwidth)``, where ``intensity`` is the
+arithmetic intensity of the kernel (floating point operations per byte of
+memory traffic). Kernels on the left of the ridge point
+(``peak_flops / peak_bandwidth``) are memory bound, kernels on its right are
+compute bound.
+
+:py:func:`measure_kernel` measures the floating point operations of a callable
+(``PAPI_DP_OPS``, ``PAPI_FP_OPS`` or ``PAPI_SP_OPS``, whichever is available)
+and its memory traffic (last level cache misses multiplied by the cache line
+size reported by PAPI), and :py:class:`Roofline` places the kernels against
+the ceilings of the machine.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.roofline import Roof, Roofline
+
+    papi.library_init()
+
+    # Ceilings of the machine: 100 GFLOP/s and 20 GB/s
+    roofline = Roofline(Roof(100e9, 20e9))
+    roofline.measure("dot", lambda: a @ b)
+    roofline.measure("triad", lambda: numpy.add(a, 3.0 * b, out=c))
+
+    print(roofline.format())
+    roofline.plot()  # requires matplotlib
+
+.. NOTE::
+
+    Cache misses only approximate the memory traffic: hardware prefetches and
+    write-backs are not always counted, so the intensity is an upper bound.
+"""
+
+import statistics
+import time
+from collections import namedtuple
+
+from . import papi_low as papi
+from .exceptions import PapiError
+from .tiling import data_caches
+
+
+#: Ceilings of a machine: peak floating point rate (FLOP/s) and peak memory
+#: bandwidth (bytes/s).
+Roof = namedtuple("Roof", "peak_flops peak_bandwidth")
+
+#: Measurement of a kernel: floating point operations, memory traffic (bytes),
+#: duration (seconds) and cycles of one call (medians), and the events used.
+KernelMeasurement = namedtuple(
+    "KernelMeasurement", "name flops bytes seconds cycles flop_event traffic_event"
+)
+
+#: Placement of a kernel against the ceilings of a machine. ``bound`` is
+#: ``"memory"`` or ``"compute"``, ``attainable`` is the roofline bound at the
+#: intensity of the kernel (FLOP/s) and ``efficiency`` is the ratio between
+#: the attained and the attainable rate.
+RooflinePoint = namedtuple(
+    "RooflinePoint", "name intensity flops_rate bound attainable efficiency"
+)
+
+#: Floating point events, by order of preference
+FLOP_EVENTS = ("PAPI_DP_OPS", "PAPI_FP_OPS", "PAPI_SP_OPS")
+
+#: Last level cache miss events, by order of preference, with their cache level
+TRAFFIC_EVENTS = (("PAPI_L3_TCM", 3), ("PAPI_L3_DCM", 3), ("PAPI_L2_TCM", 2))
+
+#: Cache line size used when PAPI does not report the memory hierarchy
+DEFAULT_LINE_SIZE = 64
+
+
+def _add_first_available(eventSet, names):
+    for name in names:
+        try:
+            papi.add_named_event(eventSet, name)
+        except PapiError:
+            continue
+        return name
+    return None
+
+
+def _line_size(level=None):
+    # Line size of the cache of the given level, or of the last level cache
+    try:
+        caches = [cache for cache in data_caches() if cache.line_size]
+    except PapiError:
+        caches = []
+    for cache in caches:
+        if cache.level == level:
+            return cache.line_size
+    return caches[-1].line_size if caches else DEFAULT_LINE_SIZE
+
+
+def measure_kernel(fn, name=None, repeat=5, flop_event=None, traffic_event=None):
+    """Measures the floating point operations and the memory traffic of a
+    callable.
+
+    :param callable fn: The kernel (called without arguments).
+    :param str name: The name of the kernel (default: the name of ``fn``).
+    :param int repeat: The number of measured calls (the medians are kept).
+    :param str flop_event: The floating point event (default: the first
+        available event of :py:data:`FLOP_EVENTS`).
+    :param str traffic_event: The cache miss event used to estimate the
+        memory traffic (default: the first available event of
+        :py:data:`TRAFFIC_EVENTS`).
+
+    :rtype: KernelMeasurement
+
+    :raises ValueError: ``repeat`` is lower than 1.
+    :raises PapiNoEventError: No floating point or cache miss event is
+        available.
+    """
+    if repeat < 1:
+        raise ValueError("repeat must be at least 1")
+    eventSet = papi.create_eventset()
+    try:
+        flops = [flop_event] if flop_event else FLOP_EVENTS
+        flop_event = _add_first_available(eventSet, flops)
+        if flop_event is None:
+            # Raises the error of PAPI
+            papi.add_named_event(eventSet, flops[0])
+        traffic = [traffic_event] if traffic_event else dict(TRAFFIC_EVENTS)
+        traffic_event = _add_first_available(eventSet, traffic)
+        if traffic_event is None:
+            papi.add_named_event(eventSet, list(traffic)[0])
+        cycles_event = _add_first_available(eventSet, ["PAPI_TOT_CYC"])
+
+        line_size = _line_size(dict(TRAFFIC_EVENTS).get(traffic_event))
+        samples = []
+        for _ in range(repeat):
+            start_time = time.perf_counter()
+            papi.start(eventSet)
+            try:
+                fn()
+            finally:
+                values = papi.stop(eventSet)
+            samples.append((time.perf_counter() - start_time, values))
+    finally:
+        papi.cleanup_eventset(eventSet)
+        papi.destroy_eventset(eventSet)
+
+    return KernelMeasurement(
+        name or getattr(fn, "__name__", "kernel"),
+        statistics.median(values[0] for _, values in samples),
+        statistics.median(values[1] * line_size for _, values in samples),
+        statistics.median(seconds for seconds, _ in samples),
+        statistics.median(values[2] for _, values in samples) if cycles_event else None,
+        flop_event,
+        traffic_event,
+    )
+
+
+def place(measurement, roof):
+    """Places a measured kernel against the ceilings of a machine.
+
+    :param KernelMeasurement measurement: The kernel.
+    :param Roof roof: The ceilings of the machine.
+
+    :rtype: RooflinePoint
+    """
+    intensity = (
+        measurement.flops / measurement.bytes if measurement.bytes else float("inf")
+    )
+    flops_rate = measurement.flops / measurement.seconds if measurement.seconds else 0.0
+    ridge = roof.peak_flops / roof.peak_bandwidth
+    attainable = min(roof.peak_flops, intensity * roof.peak_bandwidth)
+    return RooflinePoint(
+        measurement.name,
+        intensity,
+        flops_rate,
+        "memory" if intensity < ridge else "compute",
+        attainable,
+        flops_rate / attainable if attainable else 0.0,
+    )
+
+
+class Roofline:
+    """Measures kernels and places them against the ceilings of a machine.
+
+    :param Roof roof: The ceilings of the machine.
+    """
+
+    def __init__(self, roof):
+        #: The ceilings of the machine
+        self.roof = roof
+        #: The measured kernels
+        self.measurements = []
+
+    @property
+    def ridge_point(self):
+        """The arithmetic intensity (FLOP/byte) at which kernels become compute
+        bound."""
+        return self.roof.peak_flops / self.roof.peak_bandwidth
+
+    def measure(self, name, fn, **kwargs):
+        """Measures a kernel (see :py:func:`measure_kernel` for the keyword
+        arguments) and adds it to the analysis.
+
+        :rtype: RooflinePoint
+        """
+        measurement = measure_kernel(fn, name, **kwargs)
+        self.measurements.append(measurement)
+        return place(measurement, self.roof)
+
+    def points(self):
+        """Returns the placement of all the measured kernels.
+
+        :rtype: list(RooflinePoint)
+        """
+        return [place(measurement, self.roof) for measurement in self.measurements]
+
+    def to_dict(self):
+        """Returns a JSON-serializable representation of the analysis."""
+        return {
+            "roof": self.roof._asdict(),
+            "ridge_point": self.ridge_point,
+            "kernels": [
+                dict(measurement._asdict(), **point._asdict())
+                for measurement, point in zip(self.measurements, self.points())
+            ],
+        }
+
+    def format(self):
+        """Formats the analysis as a text table.
+
+        :rtype: str
+        """
+        lines = [
+            "peak: %.2f GFLOP/s, %.2f GB/s, ridge point: %.2f FLOP/byte"
+            % (
+                self.roof.peak_flops / 1e9,
+                self.roof.peak_bandwidth / 1e9,
+                self.ridge_point,
+            ),
+            "%-20s %12s %12s %12s %10s %8s"
+            % ("kernel", "FLOP/byte", "GFLOP/s", "roof GFLOP/s", "efficiency", "bound"),
+        ]
+        for point in self.points():
+            lines.append(
+                "%-20s %12.3f %12.3f %12.3f %9.1f%% %8s"
+                % (
+                    point.name,
+                    point.intensity,
+                    point.flops_rate / 1e9,
+                    point.attainable / 1e9,
+                    point.efficiency * 100,
+                    point.bound,
+                )
+            )
+        return "\n".join(lines)
+
+    def plot(self, ax=None):
+        """Plots the roofline and the kernels on a log-log chart. Requires
+        matplotlib.
+
+        :param ax: The matplotlib axes to draw on (default: a new figure).
+
+        :returns: the matplotlib axes.
+        """
+        import matplotlib.pyplot as plt
+
+        if ax is None:
+            _, ax = plt.subplots()
+        points = self.points()
+        intensities = [
+            point.intensity for point in points if 0 < point.intensity < float("inf")
+        ]
+        low = min(intensities + [self.ridge_point]) / 10
+        high = max(intensities + [self.ridge_point]) * 10
+        ax.plot(
+            [low, self.ridge_point, high],
+            [
+                low * self.roof.peak_bandwidth / 1e9,
+                self.roof.peak_flops / 1e9,
+                self.roof.peak_flops / 1e9,
+            ],
+            color="black",
+        )
+        for point in points:
+            ax.scatter([point.intensity], [point.flops_rate / 1e9])
+            ax.annotate(point.name, (point.intensity, point.flops_rate / 1e9))
+        ax.set_xscale("log")
+        ax.set_yscale("log")
+        ax.set_xlabel("arithmetic intensity (FLOP/byte)")
+        ax.set_ylabel("GFLOP/s")
+        return ax
@@ -5,23 +5,131 @@ import ctypes
 from ._papi import ffi
 
 
+_dtypes = {}
+
+
+def struct_dtype(ctype):
+    """Returns the NumPy dtype matching the memory layout of a C type: a
+    structured dtype (with the offsets and the size of the C struct) for
+    structs, ``S<n>`` for ``char[n]``, subarrays for other arrays, and unsigned
+    integers (addresses) for pointers. Bit fields are left out.
+
+    :param ctype: The C type (a cffi type or its name, e.g.
+        ``"PAPI_address_map_t"``).
+
+    :rtype: numpy.dtype
+
+    :raises ImportError: NumPy is not installed.
+    """
+    import numpy
+
+    if isinstance(ctype, str):
+        ctype = ffi.typeof(ctype)
+    if ctype in _dtypes:
+        return _dtypes[ctype]
+    size = ffi.sizeof(ctype)
+    if ctype.kind == "primitive":
+        if ctype.cname == "char":
+            dtype = numpy.dtype("S1")
+        elif ctype.cname in ("float", "double"):
+            dtype = numpy.dtype("f%i" % size)
+        elif int(ffi.cast(ctype, -1)) < 0:
+            dtype = numpy.dtype("i%i" % size)
+        else:
+            dtype = numpy.dtype("u%i" % size)
+    elif ctype.kind == "pointer":
+        dtype = numpy.dtype("u%i" % size)
+    elif ctype.kind == "array":
+        if ctype.item.kind == "primitive" and ctype.item.cname == "char":
+            dtype = numpy.dtype("S%i" % ctype.length)
+        else:
+            dtype = numpy.dtype((struct_dtype(ctype.item), (ctype.length,)))
+    elif ctype.kind == "struct":
+        fields = [(name, field) for name, field in ctype.fields if field.bitsize < 0]
+        dtype = numpy.dtype(
+            {
+                "names": [name for name, _ in fields],
+                "formats": [struct_dtype(field.type) for _, field in fields],
+                "offsets": [field.offset for _, field in fields],
+                "itemsize": size,
+            }
+        )
+    else:
+        dtype = numpy.dtype("V%i" % size)
+    _dtypes[ctype] = dtype
+    return dtype
+
+
+def to_numpy(cdata, count=None):
+    """Copies a C array (of structs, numbers or strings) into a NumPy array,
+    with a single copy of its memory (through :py:meth:`ffi.buffer`) instead
+    of one Python object per element and field. String fields are kept as
+    bytes (see :py:func:`decode_string`), so they are only decoded when they
+    are used.
+
+    :param cdata: The C array, or a pointer to its first element.
+    :param int count: The number of elements (default: the length of the
+        array).
+
+    :returns: the elements (a structured array for structs, see
+        :py:func:`struct_dtype`).
+    :rtype: numpy.ndarray
+
+    :raises ImportError: NumPy is not installed.
+    """
+    import numpy
+
+    item = ffi.typeof(cdata).item
+    dtype = struct_dtype(item)
+    if count is None:
+        count = len(cdata)
+    if count <= 0 or cdata == ffi.NULL:
+        return numpy.zeros(0, dtype=dtype)
+    buffer = ffi.buffer(cdata, count * ffi.sizeof(item))
+    return numpy.frombuffer(buffer, dtype=dtype, count=count).copy()
+
+
+def decode_string(value):
+    """Decodes a string field of an array returned by :py:func:`to_numpy`.
+
+    :param bytes value: The field value.
+
+    :rtype: str
+    """
+    return bytes(value).split(b"\0", 1)[0].decode("ascii", "replace")
+
+
 class PAPI_Base:
-    """Base class for PAPI structs."""
+    """Base class for PAPI structs.
+
+    :param cdata: The C struct.
+    :param bool numpy: Convert the arrays (e.g. ``SHARED_LIB_info.map`` or
+        ``EVENT_info.name``) into NumPy arrays with :py:func:`to_numpy`
+        instead of lists of Python objects.
+    """
 
     fields = {}
     """Fields of the struct (refer to PAPI's documentation for each field's meaning)"""
     s_fields = {}
     """Special Fields of the struct (refer to PAPI's documentation for each field's meaning)"""
+    lengths = {}
+    """Fixed-size array fields whose used length is given by another field
+    (the NumPy arrays are truncated to it)"""
 
-    def __init__(self, cdata):
+    def __init__(self, cdata, numpy=False):
         for field, f_type in self.fields.items():
+            if numpy and f_type.startswith("arr:"):
+                length = self.lengths.get(field)
+                count = getattr(self, length) if length else None
+                setattr(self, field, to_numpy(getattr(cdata, field), count))
+                continue
             setattr(self, field, self.cdata_to_python(getattr(cdata, field), f_type))
         for field, f_tuple in self.s_fields.items():
             setattr(
                 self,
                 field,
                 self.special_cdata_to_python(
-                    getattr(cdata, field), f_tuple[1], f_tuple[0]
+                    getattr(cdata, field), f_tuple[1], f_tuple[0], numpy
                 ),
             )
 
@@ -47,12 +155,17 @@ class PAPI_Base:
             ]
         return None
 
-    def special_cdata_to_python(self, cdata, level, data_type):
-        """Converts special C data, such as structs, to Python objects."""
+    def special_cdata_to_python(self, cdata, level, data_type, numpy=False):
+        """Converts special C data, such as structs, to Python objects (or
+        arrays of structs to NumPy arrays if ``numpy`` is ``True``)."""
         if isinstance(level, str):  # dynamic array
+            if numpy:
+                return to_numpy(cdata, getattr(self, level))
             return [data_type(cdata[i]) for i in range(getattr(self, level))]
         if level == 0:
-            return data_type(cdata)
+            return data_type(cdata, numpy)
+        if numpy:
+            return to_numpy(cdata)
 
         return [
             self.special_cdata_to_python(nested_cdata, level - 1, data_type)
@@ -108,6 +221,7 @@ class EVENT_info(PAPI_Base):
         "name": "arr:str:",
         "note": "str:",
     }
+    lengths = {"code": "count", "name": "count"}
 
     @classmethod
     def alloc_empty(cls):
@@ -149,7 +263,7 @@ class MH_info(PAPI_Base):
 
     fields = {"levels": "num:c_int"}
 
-    s_fields = {"level": (MH_level, 1)}
+    s_fields = {"level": (MH_level, "levels")}
 
 
 class HARDWARE_info(PAPI_Base):
@@ -177,13 +291,13 @@ class HARDWARE_info(PAPI_Base):
         "virtual_vendor_version": "str:",
     }
 
-    s_field = {"mem_hierarchy": (MH_info, 1)}
+    s_fields = {"mem_hierarchy": (MH_info, 0)}
 
 
 class ADDR_p(PAPI_Base):
     """Address pointer class."""
 
-    def __init__(self, cdata):
+    def __init__(self, cdata, numpy=False):
         if cdata == ffi.NULL:
             self.addr = None
         else:
@@ -214,7 +328,7 @@ class EXECUTABLE_info(PAPI_Base):
         "fullname": "str:",
     }
 
-    s_field = {"address_info": (ADDR_map, 0)}
+    s_fields = {"address_info": (ADDR_map, 0)}
 
 
 class COMPONENT_info(PAPI_Base):
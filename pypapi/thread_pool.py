@@ -0,0 +1,262 @@
+"""
+Hardware counters in thread pools.
+
+:py:class:`CountingThreadPoolExecutor` is a
+:py:class:`concurrent.futures.ThreadPoolExecutor` whose workers are registered
+to PAPI (see :py:func:`~pypapi.papi_low.register_thread`) and keep their own
+event set running. The counter deltas of each submitted task are attributed to
+the task and to the thread that ran it, which gives per-task and per-thread
+counts, and the load imbalance between threads.
+
+This is useful with tasks that release the GIL (NumPy, BLAS, I/O...), to see
+which threads do the work (e.g. saturate the memory bandwidth).
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi.thread_pool import CountingThreadPoolExecutor
+
+    papi.library_init()
+
+    with CountingThreadPoolExecutor(4, events=["PAPI_TOT_INS", "PAPI_L3_TCM"]) as executor:
+        for block in blocks:
+            executor.submit(numpy.dot, block, matrix)
+
+    print(executor.per_thread())
+    print(executor.imbalance())
+
+.. NOTE::
+
+    All the worker threads are started with the executor (so that idle threads
+    appear in the load imbalance), and the event sets are released and the
+    threads unregistered by :py:meth:`~CountingThreadPoolExecutor.shutdown`
+    (called when leaving the ``with`` block).
+
+.. NOTE::
+
+    PAPI thread support is initialized with :py:func:`~pypapi.papi_low.thread_init`
+    when the first executor is created.
+"""
+
+import concurrent.futures
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from threading import BrokenBarrierError
+
+from . import papi_low as papi
+from .reader import EventSetReader
+
+
+#: Counts of a finished task: the index of the task (in submission order), the
+#: name of the thread that ran it, whether it raised an exception, and one
+#: value per event.
+TaskCounts = namedtuple("TaskCounts", "index thread failed values")
+
+DEFAULT_EVENTS = ("PAPI_TOT_INS", "PAPI_TOT_CYC")
+
+#: Maximum time (in seconds) the worker threads wait for each other when they
+#: are started or when their event sets are released
+BARRIER_TIMEOUT = 60.0
+
+
+def _check_events(eventCodes):
+    # Trial event set on the calling thread, so that unavailable or
+    # conflicting events are reported before any worker is started
+    eventSet = papi.create_eventset()
+    try:
+        papi.add_events(eventSet, eventCodes)
+    finally:
+        papi.cleanup_eventset(eventSet)
+        papi.destroy_eventset(eventSet)
+
+
+class _WorkerState:
+    def __init__(self, eventCodes):
+        papi.register_thread()
+        self.eventSet = papi.create_eventset()
+        papi.add_events(self.eventSet, list(eventCodes))
+        papi.start(self.eventSet)
+        self.reader = EventSetReader(self.eventSet)
+        self.before = self.reader.new_values()
+        self.after = self.reader.new_values()
+        self.thread = threading.current_thread().name
+        self.tasks = []
+        self.totals = [0] * len(eventCodes)
+
+    def close(self):
+        papi.stop(self.eventSet)
+        papi.cleanup_eventset(self.eventSet)
+        papi.destroy_eventset(self.eventSet)
+        papi.unregister_thread()
+
+
+class CountingThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool executor that counts the events of each task.
+
+    :param int max_workers: The number of worker threads (see
+        :py:class:`~concurrent.futures.ThreadPoolExecutor`).
+    :param list events: The events to count (event names or codes).
+    :param str thread_name_prefix: The prefix of the names of the threads.
+    :param callable initializer: A callable called at the start of each worker
+        thread.
+    :param tuple initargs: The arguments of ``initializer``.
+
+    :raises PapiError: The events cannot be counted together (checked on the
+        calling thread before the workers are started), or the event set of a
+        worker could not be started.
+    """
+
+    def __init__(
+        self,
+        max_workers=None,
+        events=DEFAULT_EVENTS,
+        thread_name_prefix="",
+        initializer=None,
+        initargs=(),
+    ):
+        papi.init_thread_support()
+        self.eventCodes = [
+            papi.event_name_to_code(event) if isinstance(event, str) else event
+            for event in events
+        ]
+        _check_events(self.eventCodes)
+        #: The names of the events
+        self.names = [papi.event_code_to_name(code) for code in self.eventCodes]
+        self._local = threading.local()
+        self._states = []
+        self._states_lock = threading.Lock()
+        self._next = 0
+        self._closed = False
+        ThreadPoolExecutor.__init__(
+            self,
+            max_workers,
+            thread_name_prefix,
+            initializer=self._init_worker,
+            initargs=(initializer, initargs),
+        )
+        # Start all the workers: the barrier blocks each thread until all of
+        # them are running, so the executor cannot reuse an idle one
+        try:
+            self._run_on_each_thread(lambda: None)
+        except BaseException:
+            self._closed = True
+            ThreadPoolExecutor.shutdown(self, wait=False)
+            raise
+
+    def _init_worker(self, initializer, initargs):
+        state = _WorkerState(self.eventCodes)
+        self._local.state = state
+        with self._states_lock:
+            self._states.append(state)
+        if initializer is not None:
+            initializer(*initargs)
+
+    def _run_on_each_thread(self, fn):
+        barrier = threading.Barrier(self._max_workers, timeout=BARRIER_TIMEOUT)
+
+        def task():
+            barrier.wait()
+            fn()
+
+        futures = [
+            ThreadPoolExecutor.submit(self, task) for _ in range(self._max_workers)
+        ]
+        # If a worker fails (e.g. its initializer), the others would wait for
+        # it at the barrier until the timeout: release them at once
+        concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_EXCEPTION)
+        if any(future.done() and future.exception() for future in futures):
+            barrier.abort()
+            concurrent.futures.wait(futures)
+            errors = [future.exception() for future in futures if future.exception()]
+            # Raise the original error rather than the broken barrier ones
+            errors.sort(key=lambda error: isinstance(error, BrokenBarrierError))
+            raise errors[0]
+
+    def _run_task(self, index, fn, args, kwargs):
+        state = self._local.state
+        reader = state.reader
+        failed = True
+        reader.read_into(state.before)
+        try:
+            result = fn(*args, **kwargs)
+            failed = False
+        finally:
+            reader.read_into(state.after)
+            values = reader.delta(state.before, state.after)
+            state.tasks.append(TaskCounts(index, state.thread, failed, values))
+            state.totals = [total + value for total, value in zip(state.totals, values)]
+        return result
+
+    def submit(self, fn, *args, **kwargs):
+        """Submits a callable, like
+        :py:meth:`concurrent.futures.Executor.submit`, and counts its events.
+
+        :rtype: concurrent.futures.Future
+        """
+        with self._states_lock:
+            index = self._next
+            self._next += 1
+        return ThreadPoolExecutor.submit(self, self._run_task, index, fn, args, kwargs)
+
+    def shutdown(self, wait=True, **kwargs):
+        """Waits for the pending tasks, then releases the event sets and
+        unregisters the worker threads (see
+        :py:meth:`concurrent.futures.Executor.shutdown`).
+
+        :param bool wait: Wait for the threads to exit. The pending tasks are
+            always waited for, as the event sets must be released by their
+            threads.
+        """
+        if not self._closed:
+            self._closed = True
+            try:
+                self._run_on_each_thread(lambda: self._local.state.close())
+            finally:
+                ThreadPoolExecutor.shutdown(self, wait, **kwargs)
+        else:
+            ThreadPoolExecutor.shutdown(self, wait, **kwargs)
+
+    def tasks(self):
+        """Returns the counts of the finished tasks, in submission order.
+
+        :rtype: list(TaskCounts)
+        """
+        with self._states_lock:
+            tasks = [task for state in self._states for task in state.tasks]
+        return sorted(tasks, key=lambda task: task.index)
+
+    def per_thread(self):
+        """Returns the sum of the counts of the tasks of each thread.
+
+        :returns: the counts, indexed by thread name.
+        :rtype: dict
+        """
+        with self._states_lock:
+            return {state.thread: list(state.totals) for state in self._states}
+
+    def totals(self):
+        """Returns the sum of the counts of all the finished tasks (one value
+        per event).
+
+        :rtype: list(int)
+        """
+        totals = [0] * len(self.eventCodes)
+        for values in self.per_thread().values():
+            totals = [total + value for total, value in zip(totals, values)]
+        return totals
+
+    def imbalance(self):
+        """Returns the load imbalance between threads of each event: the ratio
+        between the maximum and the mean of the per-thread counts, minus one
+        (``0.0`` when the load is perfectly balanced).
+
+        :rtype: list(float)
+        """
+        per_thread = list(self.per_thread().values())
+        imbalance = []
+        for i in range(len(self.eventCodes)):
+            counts = [values[i] for values in per_thread]
+            mean = sum(counts) / len(counts) if counts else 0
+            imbalance.append(max(counts) / mean - 1 if mean else 0.0)
+        return imbalance
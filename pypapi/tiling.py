@@ -0,0 +1,179 @@
+"""
+Cache-aware blocking and tile size suggestions.
+
+These helpers derive block and tile sizes from the data caches of the memory
+hierarchy reported by PAPI (see :py:mod:`pypapi.capabilities`), instead of
+hard-coding them per machine type.
+
+Example::
+
+    from pypapi import papi_low as papi
+    from pypapi import tiling
+
+    papi.library_init()
+
+    # Edge of square float64 tiles so that 3 tiles (A, B and C of a matrix
+    # product) fit in the L2 cache
+    edge = tiling.tile_size(level=2, itemsize=8, arrays=3)
+
+    # Number of float32 elements per chunk when streaming 2 arrays through
+    # the L1 cache
+    chunk = tiling.block_size(level=1, itemsize=4, arrays=2)
+
+    # Leading dimension (in elements) of a 1000-column float64 matrix that
+    # avoids cache set aliasing when walking its columns
+    ld = tiling.padded_leading_dimension(1000, itemsize=8)
+
+The suggestions only use a fraction of each cache (one way is left to the other
+data of the program, see :py:func:`usable_size`), and sizes are rounded to
+whole cache lines.
+"""
+
+from .capabilities import get_capabilities
+from .consts import PAPI_MH_TYPE_DATA, PAPI_MH_TYPE_UNIFIED
+
+
+# Same as the PAPI_MH_CACHE_TYPE() macro
+_CACHE_TYPE_MASK = 0xF
+
+
+def data_caches(capabilities=None):
+    """Returns the data (or unified) caches, one per level, sorted by level.
+
+    :param Capabilities capabilities: The capability snapshot (default:
+        :py:func:`~pypapi.capabilities.get_capabilities`).
+
+    :rtype: list(CacheInfo)
+    """
+    capabilities = capabilities or get_capabilities()
+    caches = {}
+    for cache in capabilities.caches:
+        cacheType = cache.type & _CACHE_TYPE_MASK
+        if cacheType in (PAPI_MH_TYPE_DATA, PAPI_MH_TYPE_UNIFIED):
+            caches.setdefault(cache.level, cache)
+    return [caches[level] for level in sorted(caches)]
+
+
+def data_cache(level, capabilities=None):
+    """Returns the data (or unified) cache of a level.
+
+    :param int level: The cache level (``1`` for L1).
+    :param Capabilities capabilities: The capability snapshot (default:
+        :py:func:`~pypapi.capabilities.get_capabilities`).
+
+    :rtype: CacheInfo
+
+    :raises ValueError: There is no data cache at this level.
+    """
+    for cache in data_caches(capabilities):
+        if cache.level == level:
+            return cache
+    raise ValueError("no level %i data cache reported by PAPI" % level)
+
+
+def usable_size(cache):
+    """Returns the number of bytes of a cache that a blocked kernel should use:
+    one way is left to the other data of the program (stack, indices...) to
+    limit conflict misses, and half of the cache is used if it is direct
+    mapped.
+
+    :param CacheInfo cache: The cache.
+
+    :rtype: int
+    """
+    if cache.associativity > 1:
+        return cache.size * (cache.associativity - 1) // cache.associativity
+    return cache.size // 2
+
+
+def _line_elements(cache, itemsize):
+    return max(cache.line_size // itemsize, 1) if cache.line_size else 1
+
+
+def block_size(level=1, itemsize=8, arrays=1, capabilities=None):
+    """Suggests the number of elements per array of a one-dimensional block, so
+    that the blocks of all the arrays fit together in a cache.
+
+    :param int level: The cache level (``1`` for L1).
+    :param int itemsize: The size of an element in bytes.
+    :param int arrays: The number of arrays accessed by block.
+    :param Capabilities capabilities: The capability snapshot (default:
+        :py:func:`~pypapi.capabilities.get_capabilities`).
+
+    :returns: a number of elements (a multiple of the cache line size).
+    :rtype: int
+
+    :raises ValueError: There is no data cache at this level.
+    """
+    cache = data_cache(level, capabilities)
+    lineElements = _line_elements(cache, itemsize)
+    elements = usable_size(cache) // (arrays * itemsize)
+    return max(elements // lineElements * lineElements, lineElements)
+
+
+def tile_size(level=1, itemsize=8, arrays=3, ndim=2, capabilities=None):
+    """Suggests the edge length of square (or cubic...) tiles, so that one tile
+    of each array fits together in a cache.
+
+    :param int level: The cache level (``1`` for L1).
+    :param int itemsize: The size of an element in bytes.
+    :param int arrays: The number of arrays accessed by tile (e.g. ``3`` for
+        a matrix product).
+    :param int ndim: The number of dimensions of the tiles.
+    :param Capabilities capabilities: The capability snapshot (default:
+        :py:func:`~pypapi.capabilities.get_capabilities`).
+
+    :returns: a number of elements (rounded down to a multiple of the cache
+        line size when possible).
+    :rtype: int
+
+    :raises ValueError: There is no data cache at this level.
+    """
+    cache = data_cache(level, capabilities)
+    lineElements = _line_elements(cache, itemsize)
+    elements = usable_size(cache) // (arrays * itemsize)
+    edge = int(elements ** (1.0 / ndim))
+    while (edge + 1) ** ndim <= elements:
+        edge += 1
+    if edge >= lineElements:
+        edge = edge // lineElements * lineElements
+    return max(edge, 1)
+
+
+def tile_sizes(itemsize=8, arrays=3, ndim=2, capabilities=None):
+    """Suggests tile edge lengths for each data cache level (see
+    :py:func:`tile_size`), e.g. for multi-level blocking.
+
+    :returns: the edge lengths, indexed by cache level.
+    :rtype: dict
+    """
+    return {
+        cache.level: tile_size(cache.level, itemsize, arrays, ndim, capabilities)
+        for cache in data_caches(capabilities)
+    }
+
+
+def padded_leading_dimension(n, itemsize=8, level=1, capabilities=None):
+    """Suggests a leading dimension for a matrix with ``n`` elements per row.
+
+    When the size of a row is a multiple of a large power of two, walking a
+    column hits the same few cache sets and causes conflict misses. The
+    returned leading dimension is a whole number of cache lines, odd, so that
+    the rows of a column are spread over all the sets.
+
+    :param int n: The number of elements per row.
+    :param int itemsize: The size of an element in bytes.
+    :param int level: The cache level (``1`` for L1).
+    :param Capabilities capabilities: The capability snapshot (default:
+        :py:func:`~pypapi.capabilities.get_capabilities`).
+
+    :returns: a number of elements greater than or equal to ``n``.
+    :rtype: int
+
+    :raises ValueError: There is no data cache at this level.
+    """
+    lineElements = _line_elements(data_cache(level, capabilities), itemsize)
+    lines = -(-n // lineElements)
+    if lines % 2 == 0:
+        lines += 1
+    return lines * lineElements
@@ -45,16 +45,23 @@ setup(
     author="Fabien LOISON, Mathilde BOUTIGNY",
     # author_email="",
     packages=find_packages(),
+    package_data={"pypapi": ["metric_aliases.json"]},
     setup_requires=["cffi>=1.0.0"],
     install_requires=["cffi>=1.0.0"],
     extras_require={
+        "numpy": ["numpy"],
         "dev": [
             "nox",
             "flake8",
             "black",
             "sphinx",
             "sphinx-rtd-theme",
-        ]
+        ],
+    },
+    entry_points={
+        "pytest11": [
+            "pypapi = pypapi.pytest_plugin",
+        ],
     },
     cffi_modules=["pypapi/papi_build.py:ffibuilder"],
     cmdclass={
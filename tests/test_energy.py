@@ -0,0 +1,57 @@
+import pytest
+
+from pypapi.energy import EnergyMeter, SysfsEnergySource
+from pypapi.exceptions import PapiNoComponentError
+
+
+def _zone(root, entry, name, energy, max_range=None):
+    zone = root / entry
+    zone.mkdir()
+    (zone / "name").write_text("%s\n" % name)
+    (zone / "energy_uj").write_text("%i\n" % energy)
+    if max_range is not None:
+        (zone / "max_energy_range_uj").write_text("%i\n" % max_range)
+    return zone
+
+
+@pytest.fixture
+def powercap(tmp_path):
+    _zone(tmp_path, "intel-rapl:0", "package-0", 1000, 10000)
+    _zone(tmp_path, "intel-rapl:0:0", "core", 500)
+    return tmp_path
+
+
+def test_sysfs_domains(powercap):
+    source = SysfsEnergySource(str(powercap))
+    try:
+        assert [domain.name for domain in source.domains] == [
+            "package-0",
+            "package-0/core",
+        ]
+        assert [domain.max_range for domain in source.domains] == [10000, 0]
+        assert source.read() == [1000, 500]
+    finally:
+        source.close()
+
+
+def test_sysfs_no_zone(tmp_path):
+    with pytest.raises(PapiNoComponentError):
+        SysfsEnergySource(str(tmp_path))
+
+
+def test_region_energy(powercap):
+    with EnergyMeter(events=[], root=str(powercap)) as meter:
+        with meter.region("work") as region:
+            (powercap / "intel-rapl:0" / "energy_uj").write_text("3000\n")
+            (powercap / "intel-rapl:0:0" / "energy_uj").write_text("1500\n")
+    assert region.result.joules["package-0"] == pytest.approx(2000e-6)
+    assert region.result.joules["package-0/core"] == pytest.approx(1000e-6)
+
+
+def test_region_wraparound(powercap):
+    (powercap / "intel-rapl:0" / "energy_uj").write_text("9000\n")
+    with EnergyMeter(events=[], root=str(powercap)) as meter:
+        with meter.region("work") as region:
+            (powercap / "intel-rapl:0" / "energy_uj").write_text("500\n")
+    assert region.result.joules["package-0"] == pytest.approx(1500e-6)
+    assert meter.totals()["work"].joules["package-0"] == pytest.approx(1500e-6)
@@ -65,6 +65,97 @@ def _resolve_defines(defines, enum):
     return defines
 
 
+def _preset_events(defines):
+    preset_regexp = re.compile(r"^0x([0-9A-F]+) \| PAPI_PRESET_MASK$")
+    result = []
+    for name, value, doc in defines:
+        if name == "PAPI_END":  # Not an event
+            continue
+        if preset_regexp.match(value):
+            index = int(preset_regexp.match(value).group(1), 16)
+            result.append([name, index, doc])
+    return result
+
+
+_PRESETS_PYTHON = '''
+def preset_name(code):
+    """Returns the name of a preset event from its code, without calling PAPI.
+
+    :param int code: The event code.
+
+    :returns: the name, or ``None`` if the code is not a known preset event.
+    :rtype: str
+    """
+    code &= 0xFFFFFFFF
+    if code & 0xC0000000 != 0x80000000:
+        return None
+    index = code & PAPI_PRESET_AND_MASK
+    return _PRESET_NAMES[index] if index < len(_PRESET_NAMES) else None
+
+
+def preset_description(code):
+    """Returns the description of a preset event from its code, without
+    calling PAPI.
+
+    :param int code: The event code.
+
+    :returns: the description, or ``None`` if the code is not a known preset
+        event.
+    :rtype: str
+    """
+    code &= 0xFFFFFFFF
+    if code & 0xC0000000 != 0x80000000:
+        return None
+    index = code & PAPI_PRESET_AND_MASK
+    return _PRESET_DESCRIPTIONS[index] if index < len(_PRESET_DESCRIPTIONS) else None
+
+
+def _preset_event_enum():
+    import enum
+
+    class _PresetEvent(enum.IntEnum):
+        @property
+        def description(self):
+            """The description of the preset event."""
+            return preset_description(self)
+
+    return _PresetEvent(
+        "PresetEvent",
+        [(name, globals()[name]) for name in _PRESET_NAMES if name],
+        module=__name__,
+    )
+
+
+def __getattr__(name):
+    # The PresetEvent IntEnum (members with a description attribute) is only
+    # built when it is first used
+    if name == "PresetEvent":
+        global PresetEvent
+        PresetEvent = _preset_event_enum()
+        return PresetEvent
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+'''
+
+
+def _presets_to_python(presets):
+    size = max(index for _, index, _ in presets) + 1
+    names = [None] * size
+    descriptions = [None] * size
+    for name, index, doc in presets:
+        names[index] = name
+        descriptions[index] = doc
+    result = "# Names of the preset events, indexed by ``code & PAPI_PRESET_AND_MASK``\n"
+    result += "_PRESET_NAMES = (\n"
+    result += "".join("    %r,\n" % name for name in names)
+    result += ")\n\n"
+    result += "# Descriptions of the preset events, indexed by ``code & PAPI_PRESET_AND_MASK``\n"
+    result += "_PRESET_DESCRIPTIONS = (\n"
+    result += "".join("    %r,\n" % doc for doc in descriptions)
+    result += ")\n\n"
+    result += _PRESETS_PYTHON
+    return result
+
+
 def _defines_to_python(defines):
     result = ""
     for name, value, doc in defines:
@@ -80,6 +171,7 @@ if __name__ == "__main__":
     enum = _parse_enum(code)
     _resolve_defines(defines, enum)
     python = _defines_to_python(defines)
+    python += "\n" + _presets_to_python(_preset_events(defines))
     print("# This file is automatically generated by the")
     print("# 'tools/generate_papi_events.py' script.")
     print("# DO NOT EDIT!\n")